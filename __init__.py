@@ -1,3 +1,104 @@
-from .match import *
-from .gather import *
-from ._tin import *
\ No newline at end of file
+"""
+TIN = Todo's, Ideas, Notes
+
+Submodules are only imported when something from them is first used,
+so that importing tin (eg, to run the command line) stays quick.
+"""
+import typing
+import sys
+
+
+# {submodule:names it provides} in dependency order
+# (where a name is in more than one, the last one wins)
+_SUBMODULES:typing.Dict[str,typing.Tuple[str,...]]={
+    'stats':('StatsHook','Histogram','ScanStats','activeStats',
+        'enableStats','disableStats'),
+    'match':('IsMatchable','IsMatchParam','asMatch','MatchBase','Match',
+        'CompiledMatch'),
+    'keywords':('KeywordMatch',),
+    'contents':('DEFAULT_CHUNK_SIZE','DEFAULT_OVERLAP','readData',
+        'decodeText','readText','contentsMatch'),
+    'fingerprint':('FileKey','fileKey','contentHash','Fingerprints'),
+    'cache':('DEFAULT_MAX_BYTES','CacheKey','ContentCache',
+        'DEFAULT_CONTENT_CACHE'),
+    'parse':('normalizeHeading','headingLines','findHeadingLine','TinItem',
+        'TinSection','TinDocument','parseTin'),
+    'fulltext':('TOKEN_RE','FIELDS','Postings','tokenize','FullTextIndex'),
+    'aio':('DEFAULT_AIO_WORKERS','T','getExecutor','setExecutorSize',
+        'runBlocking','iterateBlocking','SharedCall'),
+    'ignore':('IGNORE_FILENAME','MAX_DEPTH_RULE','SYMLINK_RULE',
+        'globToRegex','IgnoreRule','parseIgnoreRules','IgnoreMatcher'),
+    'compact':('PathTable','PackedListings','CompactResults'),
+    'gather':('DirectoriesSet','matchingJsonObj','matchingFromJsonObj',
+        'DirectoriesSearch','cmdline'),
+    'cursor':('SCAN_BFS','SCAN_DFS','SCAN_RECENT','SCAN_ORDERS',
+        'STOP_COMPLETE','STOP_DIRECTORIES','STOP_TIME','STOP_DEPTH',
+        'ScanPriority',
+        'recentFirst','ScanCursor'),
+    'multisearch':('MultiSearch',),
+    'parallel':('CleanMatches','ParallelScanner'),
+    'index':('IndexRow','RACY_NS','ScanIndex'),
+    'watch':('WatchEvent','WatchCallback','Watcher'),
+    'snapshot':('SNAPSHOT_VERSION','isSnapshot','Snapshot','saveSnapshot',
+        'loadSnapshot'),
+    'summary':('COUNTED_KINDS','DONE_HEADINGS','itemDate','FileSummary',
+        'summarizeDocument','ProjectSummary','summarizeProject',
+        'ProjectSummaries','summaryTable'),
+    '_tin':('ACCEPTABLE_EXTENSIONS','openInEditor','pathName','Tin',
+        'ProjectMap','TinFinder','cmdline'),
+    'daemon':('DEFAULT_CLIENT_TIMEOUT','CLIENT_OPTIONS',
+        'defaultSocketPath','TinDaemon','TinClient','clientCmdline'),
+    'bulk':('PARSE_CHUNK_SIZE','BulkLoader'),
+    }
+
+# {name:submodule it comes from}
+_LOCATIONS:typing.Dict[str,str]={name:submodule
+    for submodule,names in _SUBMODULES.items() for name in names}
+
+__all__=list(_LOCATIONS.keys())
+
+
+def __getattr__(name:str)->typing.Any:
+    """
+    Import the submodule a name comes from, the first time it is used
+    """
+    submodule=_LOCATIONS.get(name)
+    if submodule is None:
+        raise AttributeError("module 'tin' has no attribute '%s'"%name)
+    # (not importlib.import_module, so that -X importtime sees it)
+    __import__('%s.%s'%(__name__,submodule))
+    module=sys.modules['%s.%s'%(__name__,submodule)]
+    # keep everything it provides, so this is only called once per module
+    for n in _SUBMODULES[submodule]:
+        if _LOCATIONS[n]==submodule:
+            globals()[n]=getattr(module,n)
+    return globals()[name]
+
+
+def __dir__()->typing.List[str]:
+    return sorted(set(globals().keys())|set(__all__))
+
+
+if typing.TYPE_CHECKING:
+    from .stats import *
+    from .match import *
+    from .keywords import *
+    from .contents import *
+    from .fingerprint import *
+    from .cache import *
+    from .parse import *
+    from .fulltext import *
+    from .aio import *
+    from .ignore import *
+    from .compact import *
+    from .gather import *
+    from .cursor import *
+    from .multisearch import *
+    from .parallel import *
+    from .index import *
+    from .watch import *
+    from .snapshot import *
+    from .summary import *
+    from ._tin import *
+    from .daemon import *
+    from .bulk import *
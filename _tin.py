@@ -6,8 +6,8 @@ There is an expansion called TINS which adds Shopping
 import os
 import typing
 import re
-import subprocess
-from paths import URLCompatible,Url
+import threading
+from paths import URLCompatible,Url,URL,asURL
 import tin
 
 
@@ -16,6 +16,25 @@ import tin
 ACCEPTABLE_EXTENSIONS=['txt','htm','html','md']
 
 
+def openInEditor(filename:str)->None:
+    """
+    Open a file in the system editor
+    """
+    import subprocess
+    cmd='start /b '
+    ccmd='%s "%s"'%(cmd,filename)
+    print(ccmd)
+    subprocess.Popen(ccmd,shell=True).communicate()
+
+
+def pathName(path:str)->str:
+    """
+    The last part of a path (the same as Url(path)[-1] without
+    having to make a Url)
+    """
+    return path.replace('\\','/').rstrip('/').rsplit('/',1)[-1]
+
+
 class Tin:
     """
     TIN means Todos, Ideas, and Notes files.
@@ -23,76 +42,201 @@ class Tin:
     There is an expansion called TINS which adds Shopping
     """
 
-    def __init__(self,directory:URLCompatible):
+    # there can be a great many of these, so keep them small
+    __slots__=('name','_path','_directory','_filenames','_tinFiles',
+        '_listingMtime')
+
+    # file contents are cached here, shared between all Tin objects
+    cache:'tin.ContentCache'=tin.DEFAULT_CONTENT_CACHE
+    # the name parsed documents are cached under (see documentView())
+    DOCUMENT_VIEW:str='document'
+
+    def __init__(self,
+        directory:URLCompatible,
+        filenames:typing.Optional[typing.Iterable[str]]=None,
+        listingMtime:typing.Optional[int]=None):
         """
         represents a single Tin directory
+
+        :param directory: a plain path is kept as-is, and
+            only made into a Url if something asks for one
+        :param filenames: the names of the files in the directory,
+            if already known (eg, from the scan that found it)
+        :param listingMtime: the directory's mtime when filenames was
+            listed, if it could be out of date (eg, from a snapshot),
+            so it is listed again if that has changed
+            (0 means it is not known, so it is always listed again)
+        """
+        self._directory:typing.Optional[Url]=None
+        if isinstance(directory,str):
+            self._path:str=directory
+            self.name:str=pathName(directory)
+        else:
+            self._directory=Url(directory)
+            self._path=self._directory.filePath
+            self.name=self._directory[-1]
+        # the scan's listing, until tinFiles() first needs it
+        self._filenames:typing.Optional[typing.Iterable[str]]=filenames
+        # {lowercase name without extension:filename}
+        self._tinFiles:typing.Optional[typing.Dict[str,str]]=None
+        self._listingMtime:typing.Optional[int]=None
+        if filenames is not None:
+            self._listingMtime=listingMtime
+
+    @property
+    def directory(self)->Url:
+        """
+        The directory this is
+        """
+        if self._directory is None:
+            self._directory=Url(self._path)
+        return self._directory
+
+    @property
+    def path(self)->str:
+        """
+        The directory as a plain path
+        """
+        return self._path
+
+    @staticmethod
+    def _mapTinFiles(filenames:typing.Iterable[str])->typing.Dict[str,str]:
+        """
+        Create a {lowercase name without extension:filename} lookup
+        for all files with acceptable extensions
+
+        Where there are several with the same name, the one whose
+        extension comes first in ACCEPTABLE_EXTENSIONS wins.
+        """
+        ret:typing.Dict[str,str]={}
+        rank:typing.Dict[str,int]={}
+        for filename in filenames:
+            nameExt=filename.rsplit('.',1)
+            if len(nameExt)<2:
+                continue
+            ext=nameExt[1].lower()
+            if ext not in ACCEPTABLE_EXTENSIONS:
+                continue
+            name=nameExt[0].lower()
+            r=ACCEPTABLE_EXTENSIONS.index(ext)
+            if name not in rank or r<rank[name]:
+                rank[name]=r
+                ret[name]=filename
+        return ret
+
+    def tinFiles(self)->typing.Dict[str,str]:
+        """
+        Get a {lowercase name without extension:filename} lookup
+        of all files in the directory with acceptable extensions
+
+        The directory is only listed again if its mtime changed.
         """
-        directory=Url(directory)
-        self.name:str=directory[-1]
-        self.directory:Url=directory
-        self._fileContents:typing.Dict[Url,str]={}
+        if self._filenames is not None:
+            self._tinFiles=self._mapTinFiles(self._filenames)
+            self._filenames=None
+        stats=tin.activeStats()
+        if stats is not None:
+            stats.count('stats')
+        try:
+            mtime:typing.Optional[int]= \
+                os.stat(self._path).st_mtime_ns
+        except OSError:
+            mtime=None
+        if self._tinFiles is None or mtime!=self._listingMtime:
+            if self._tinFiles is None or self._listingMtime is not None:
+                try:
+                    filenames=os.listdir(self._path)
+                except OSError:
+                    filenames=[]
+                self._tinFiles=self._mapTinFiles(filenames)
+            # otherwise it came from the scanner, and we are
+            # seeing the directory for the first time
+            self._listingMtime=mtime
+        return self._tinFiles
+
+    def invalidate(self)->None:
+        """
+        Forget anything cached about this directory
+        """
+        if self._tinFiles is not None:
+            for filename in self._tinFiles.values():
+                self.cache.invalidate(os.path.join(self._path,filename))
+        self._filenames=None
+        self._tinFiles=None
+        self._listingMtime=None
 
     def _findFileInDir(self,
-        filenamesWithoutExt:typing.Union[str,typing.Iterable[str]]
+        filenamesWithoutExt:typing.Union[str,typing.Iterable[str]],
+        tinFiles:typing.Optional[typing.Dict[str,str]]=None
         )->typing.Optional[Url]:
         """
         Find a file of a given name in the directory
+
+        :param tinFiles: the result of tinFiles(), if already known
         """
         if isinstance(filenamesWithoutExt,str):
             filenamesWithoutExt=[filenamesWithoutExt]
-        filenames=os.listdir(self.directory.filePath)
+        if tinFiles is None:
+            tinFiles=self.tinFiles()
         for filenameWithoutExt in filenamesWithoutExt:
-            for ext in ACCEPTABLE_EXTENSIONS:
-                filename='%s.%s'%(filenameWithoutExt,ext)
-                if filename in filenames:
-                    return Url(filename)
+            filename=tinFiles.get(filenameWithoutExt.lower())
+            if filename is not None:
+                return Url(filename)
         return None
 
     def _findHeading(self,text:typing.Optional[str],heading:str)->int:
         """
         returns the line number where the heading is located,
         or -1 if not found
+
+        NOTE: findHeading() does the same with the cached text
         """
         if text is None:
             return -1
-        lastLine=''
-        heading=heading.strip().lower()
-        for i,line in enumerate(text.split('\n')):
-            line=line.strip()
-            if line:
-                if line[-1]==':':
-                    if line.lower()==heading:
-                        return i
-                if line.startswith('---') or line.startswith('==='):
-                    # it's a separator, so the previous line could be a heading
-                    if lastLine.lower()==heading:
-                        return i
-            lastLine=line
-        return -1
-
-    def tinFilename(self,tinName:str)->typing.Optional[Url]:
+        return tin.findHeadingLine(text,heading)
+
+    def findHeading(self,tinName:str,heading:str)->int:
+        """
+        returns the line number in a tin file where the heading
+        is located, or -1 if not found
+        """
+        doc=self.getTinDocument(tinName)
+        if doc is None:
+            return -1
+        return doc.findHeading(heading)
+
+    def tinFilename(self,
+        tinName:str,
+        tinFiles:typing.Optional[typing.Dict[str,str]]=None
+        )->typing.Optional[Url]:
         """
         get a filname for the base file
+
+        (also tries the singular/plural, eg todos for todo)
+
+        :param tinFiles: the result of tinFiles(), if already known
         """
         tinName=tinName.split('.',1)[0]
         if tinName.endswith('s'):
-            alt=tinName+'s'
-        else:
             alt=tinName[0:-1]
-        return self._findFileInDir([tinName,alt])
+        else:
+            alt=tinName+'s'
+        return self._findFileInDir([tinName,alt],tinFiles)
 
-    def openTin(self,tinName:str):
+    def editFilename(self,tinName:str)->str:
         """
-        open current file or create a new one
+        The file to edit for a tin type (which may not exist yet)
         """
         filename:typing.Optional[Url]=self.tinFilename(tinName)
         if filename is None:
             filename=Url(tinName+'.txt')
-        cmd='start /b '
-        filename=self.directory+filename
-        ccmd='%s "%s"'%(cmd,filename)
-        print(ccmd)
-        subprocess.Popen(ccmd,shell=True).communicate()
+        return str(self.directory+filename)
+
+    def openTin(self,tinName:str):
+        """
+        open current file or create a new one
+        """
+        openInEditor(self.editFilename(tinName))
 
     @property
     def todoFilename(self)->typing.Optional[Url]:
@@ -143,18 +287,91 @@ class Tin:
         """
         self.openTin('shopping')
 
+    def tinPath(self,tinName:str)->typing.Optional[str]:
+        """
+        get the full path of the base file
+        """
+        filename=self.tinFilename(tinName)
+        if filename is None:
+            return None
+        return os.path.join(self._path,str(filename))
+
     def getTinData(self,tinName:str)->typing.Optional[str]:
         """
         also caches.
+
+        (in the shared cache, so it does not go stale
+        and does not grow without bound)
         """
-        filename=self.tinFilename(tinName)
+        stats=tin.activeStats()
+        if stats is not None:
+            start=stats.start('read')
+            stats.count('tinReads')
+        filename=self.tinPath(tinName)
+        if filename is None:
+            ret=None
+        else:
+            ret=self.cache.get(filename)
+        if stats is not None:
+            stats.end('read',start)
+        return ret
+
+    async def agetTinData(self,
+        tinName:str,
+        timeout:typing.Optional[float]=None
+        )->typing.Optional[str]:
+        """
+        asyncio version of getTinData()
+        """
+        return await tin.runBlocking(self.getTinData,tinName,timeout=timeout)
+
+    def getTinView(self,
+        tinName:str,
+        viewName:str,
+        create:typing.Callable[[str],typing.Any],
+        sizeOf:typing.Optional[typing.Callable[[typing.Any],int]]=None
+        )->typing.Any:
+        """
+        Get something derived from the contents of a tin file,
+        creating it with create(contents) if necessary
+
+        It is cached alongside the contents, and goes away if
+        the file changes.
+
+        :param viewName: a name that identifies what create() does
+        :param sizeOf: how big the view is in bytes
+            (if None, it is assumed to be as big as the contents)
+        """
+        filename=self.tinPath(tinName)
+        if filename is None:
+            return None
+        return self.cache.getView(filename,viewName,create,sizeOf)
+
+    @classmethod
+    def documentView(cls,filename:str)->str:
+        """
+        The name a file's parsed document is cached under
+
+        (it includes the format, since files with the same contents can
+        share a cache entry, but are parsed differently as, eg, txt and html)
+        """
+        return '%s.%s'%(cls.DOCUMENT_VIEW,filename.rsplit('.',1)[-1].lower())
+
+    def getTinDocument(self,tinName:str)->typing.Optional['tin.TinDocument']:
+        """
+        Get a tin file parsed into sections and items
+
+        It is cached alongside the contents, and when the file changes,
+        only the part that changed is re-parsed.
+        """
+        filename=self.tinPath(tinName)
         if filename is None:
             return None
-        if filename in self._fileContents:
-            return self._fileContents[filename]
-        data=filename.read()
-        self._fileContents[filename]=data
-        return data
+        fileFormat=filename.rsplit('.',1)[-1].lower()
+        return self.cache.getView(filename,self.documentView(filename),
+            lambda text:tin.parseTin(text,fileFormat),
+            lambda doc:doc.approximateSize,
+            lambda doc,text:doc.update(text))
 
     @property
     def todo(self)->typing.Optional[str]:
@@ -183,13 +400,77 @@ class Tin:
 
     def __str__(self):
         ret=[self.name]
+        tinFiles=self.tinFiles()
         for tinName in ('todo','ideas','notes'):
-            filename=self.tinFilename(tinName)
+            filename=self.tinFilename(tinName,tinFiles)
             if filename is not None:
                 ret.append('%s: %s'%(tinName,filename))
         return '\n   '.join(ret)
 
 
+class ProjectMap(typing.MutableMapping[str,Tin]):
+    """
+    {name:Tin} for the results of a scan, where each Tin is only
+    made the first time it is asked for
+    """
+
+    def __init__(self,
+        results:'tin.CompactResults',
+        existing:typing.Optional[typing.Dict[str,Tin]]=None):
+        """
+        :param results: what the scan found
+        :param existing: projects that have already been made
+            (eg, while the scan was streaming)
+        """
+        self.results:tin.CompactResults=results
+        # {name:Tin, or the index of the result to make it from}
+        self._entries:typing.Dict[str,typing.Union[int,Tin]]=dict(
+            zip(results.names(),range(len(results))))
+        if existing:
+            self._entries.update(existing)
+
+    def directoryOf(self,name:str)->str:
+        """
+        The directory of a project, without making its Tin
+        """
+        entry=self._entries[name]
+        if isinstance(entry,int):
+            return self.results.path(entry)
+        return entry.path
+
+    def copy(self)->'ProjectMap':
+        """
+        A shallow copy (that shares the Tins made so far)
+        """
+        ret=ProjectMap.__new__(ProjectMap)
+        ret.results=self.results
+        ret._entries=dict(self._entries)
+        return ret
+
+    def __getitem__(self,name:str)->Tin:
+        entry=self._entries[name]
+        if isinstance(entry,int):
+            entry=Tin(self.results.path(entry),self.results.listingAt(entry),
+                self.results.listingMtime(entry))
+            self._entries[name]=entry
+        return entry
+
+    def __setitem__(self,name:str,project:Tin)->None:
+        self._entries[name]=project
+
+    def __delitem__(self,name:str)->None:
+        del self._entries[name]
+
+    def __contains__(self,name:object)->bool:
+        return name in self._entries
+
+    def __iter__(self)->typing.Iterator[str]:
+        return iter(self._entries)
+
+    def __len__(self)->int:
+        return len(self._entries)
+
+
 class TinFinder:
     """
     TIN = Todo's, Ideas, Notes
@@ -199,8 +480,15 @@ class TinFinder:
     """
 
     def __init__(self,
-        searchDirectories:typing.Union[str,typing.Iterable[str]]):
-        """ """
+        searchDirectories:typing.Union[str,typing.Iterable[str]],
+        workers:int=1,
+        indexFilename:typing.Optional[URLCompatible]=None):
+        """
+        :param workers: number of threads to scan directories with
+        :param indexFilename: keep a persistent index of scanned
+            directories in this file, so that reloads only need to
+            list directories that have changed
+        """
         if isinstance(searchDirectories,str):
             searchDirectories=[searchDirectories]
         extensions:typing.Set[str]=set(ACCEPTABLE_EXTENSIONS)
@@ -211,21 +499,409 @@ class TinFinder:
             filenamesRe+extensionsRe,re.IGNORECASE)
         self._directorySearch:tin.DirectoriesSearch= \
             tin.DirectoriesSearch('TIN',matching,searchDirectories,True,None)
-        self._projects:typing.Optional[typing.Dict[str,Tin]]=None
+        self._directorySearch.workers=workers
+        self._directorySearch.useIndex(indexFilename)
+        self._projects:typing.Optional[ProjectMap]=None
+        # a scan that has been started by iterProjects() but not finished,
+        # and what it has found so far (in the order it was found)
+        self._scan:typing.Optional[typing.Generator[
+            typing.Tuple[URL,typing.List[str]],None,None]]=None
+        self._found:typing.Dict[str,Tin]={}
+        self._foundOrder:typing.List[Tin]=[]
+        self._scanLock=threading.Lock()
+        self._searchIndex:typing.Optional[tin.FullTextIndex]=None
+        self._summaries:typing.Optional[tin.ProjectSummaries]=None
+        self._areload:tin.SharedCall=tin.SharedCall(self.reload)
 
-    def reload(self)->typing.Dict[str,Tin]:
+    def reload(self)->ProjectMap:
         """
         Reload all projects and return the list
 
+        (the Tins are only made as they are used)
+
         :return: all known projects
-        :rtype: typing.Dict[str,Tin]
         """
-        self._projects={}
-        for r in self._directorySearch.reload():
-            tin=Tin(r)
-            self._projects[tin.name]=tin
+        with self._scanLock:
+            # anything still streaming is superseded by this
+            self._stopScan()
+            self._found={}
+            self._foundOrder=[]
+        projects=ProjectMap(self._directorySearch.reload())
+        self._projects=projects
+        return projects
+
+    def iterReload(self,
+        limit:typing.Optional[int]=None,
+        predicate:typing.Optional[typing.Callable[[Tin],bool]]=None
+        )->typing.Generator[Tin,None,None]:
+        """
+        Start a new scan, yielding projects as soon as they are found
+
+        (see iterProjects())
+        """
+        with self._scanLock:
+            self._stopScan()
+            self._scan=self._directorySearch.iterReload()
+            self._found={}
+            self._foundOrder=[]
+        return self.iterProjects(limit,predicate)
+
+    def _stopScan(self)->None:
+        """
+        Abandon the unfinished scan, if there is one
+
+        (closing it, so that it lets go of anything it is using,
+        eg, the scan index)
+
+        NOTE: must be called with self._scanLock held
+        """
+        scan=self._scan
+        self._scan=None
+        if scan is not None:
+            scan.close()
+
+    def _advanceScan(self)->bool:
+        """
+        Find the next project in the unfinished scan, if there is one
+
+        NOTE: must be called with self._scanLock held
+
+        :return: False if there is no more to find
+        """
+        if self._scan is None:
+            return False
+        try:
+            d,names=next(self._scan)
+        except StopIteration:
+            # it is complete, so now it can be seen
+            self._projects=ProjectMap(self._directorySearch.results,
+                self._found)
+            self._scan=None
+            return False
+        project=Tin(d,names)
+        self._found[project.name]=project
+        self._foundOrder.append(project)
+        return True
+
+    def iterProjects(self,
+        limit:typing.Optional[int]=None,
+        predicate:typing.Optional[typing.Callable[[Tin],bool]]=None
+        )->typing.Generator[Tin,None,None]:
+        """
+        Yield projects as soon as they are found, rather than
+        waiting for the whole scan like the projects property does.
+
+        If the projects are already known, no scan is needed.
+        Otherwise, stopping early (by reaching the limit or by no
+        longer iterating) abandons the scan, so the next
+        iterProjects() (or the projects property) starts a new one.
+
+        :param limit: stop after yielding this many projects
+        :param predicate: only yield projects this returns True for
+            (the rest still count as found)
+        """
+        if limit is not None and limit<=0:
+            return
+        yielded=0
+        with self._scanLock:
+            if self._scan is None and self._projects is None:
+                self._scan=self._directorySearch.iterReload()
+                self._found={}
+                self._foundOrder=[]
+            if self._scan is None:
+                found:typing.List[Tin]=list(
+                    self._projects.values()) # type: ignore
+                scanning=False
+            else:
+                found=self._foundOrder
+                scanning=True
+        i=0
+        finished=False
+        try:
+            while True:
+                with self._scanLock:
+                    if i>=len(found):
+                        # (if a new scan was started, this one is over)
+                        current=scanning and self._foundOrder is found
+                        if not current or not self._advanceScan():
+                            finished=True
+                            break
+                    project=found[i]
+                i+=1
+                if predicate is not None and not predicate(project):
+                    continue
+                yield project
+                yielded+=1
+                if limit is not None and yielded>=limit:
+                    break
+        finally:
+            if scanning and not finished:
+                with self._scanLock:
+                    if self._foundOrder is found:
+                        self._stopScan()
+                        self._found={}
+                        self._foundOrder=[]
+
+    async def areload(self,
+        timeout:typing.Optional[float]=None
+        )->ProjectMap:
+        """
+        asyncio version of reload()
+
+        If a reload is already in flight, this waits for that one
+        rather than starting another.
+
+        :param timeout: stop waiting after this many seconds
+            (the reload carries on for anyone else waiting)
+        """
+        return await self._areload(timeout)
+
+    async def aprojects(self,
+        timeout:typing.Optional[float]=None
+        )->ProjectMap:
+        """
+        asyncio version of the projects property
+        (only reloads if necessary)
+        """
+        if self._projects is None or self._areload.running:
+            return await self.areload(timeout)
         return self._projects
 
+    def watch(self,
+        callback:typing.Optional['tin.WatchCallback']=None,
+        debounce:float=0.5,
+        interval:float=2.0,
+        polling:typing.Optional[bool]=None
+        )->'tin.Watcher':
+        """
+        Keep the projects up to date as files change, without rescanning
+
+        Projects are added and dropped as their TIN files come and go,
+        and cached file contents are forgotten when the files change.
+
+        :param callback: called with each debounced batch of WatchEvents,
+            after the projects have been updated
+        :param debounce: wait for this many seconds of quiet before
+            applying a batch of changes
+        :param interval: how often to check when polling
+        :param polling: True=always poll, False=always use inotify,
+            None=use inotify if possible
+        :return: the running watcher (call stop() when done)
+        """
+        search=self._directorySearch
+        cleanMatches=search._cleanMatches(search.matching)
+        def isTinFile(filename:str)->bool:
+            for m in cleanMatches:
+                if isinstance(m,tuple):
+                    m=m[0]
+                if m.matches(filename):
+                    return True
+            return False
+        _=self.projects
+        watcher=search.watch(self._onWatchEvents,debounce,interval,
+            polling,isTinFile)
+        if callback is not None:
+            watcher.subscribe(callback)
+        return watcher
+
+    def _onWatchEvents(self,events:typing.List['tin.WatchEvent'])->None:
+        """
+        Update projects given a batch of filesystem changes
+        """
+        if self._projects is None:
+            return
+        search=self._directorySearch
+        cleanMatches=search._cleanMatches(search.matching)
+        # modify a copy and swap it in at the end so that anyone
+        # iterating over the projects in the meantime is unaffected
+        projects=self._projects.copy()
+        byDirectory={projects.directoryOf(name):name for name in projects}
+        recheck:typing.Set[str]=set()
+        for event in events:
+            if event.isDir:
+                if event.kind==tin.WatchEvent.DELETED:
+                    prefix=event.path+os.sep
+                    for d,name in list(byDirectory.items()):
+                        if d==event.path or d.startswith(prefix):
+                            projects.pop(name,None)
+                            del byDirectory[d]
+                else:
+                    recheck.add(event.path)
+                continue
+            d=event.directory
+            recheck.add(d)
+            name=byDirectory.get(d)
+            if name is not None and name in projects:
+                projects[name].invalidate()
+        for d in recheck:
+            names,_=search._scanDirectory(d)
+            matched=bool(names) and \
+                search._checkDirectory(asURL(d),cleanMatches,names)
+            name=byDirectory.get(d)
+            if matched and name is None:
+                project=Tin(d,names)
+                projects[project.name]=project
+                byDirectory[d]=project.name
+            elif not matched and name is not None:
+                projects.pop(name,None)
+                del byDirectory[d]
+        self._projects=projects
+
+    def useSearchIndex(self,filename:typing.Optional[URLCompatible])->None:
+        """
+        Keep the full-text search index in the given file,
+        so that it does not need to be rebuilt every time
+
+        :param filename: the index file, or None to keep it in memory only
+        """
+        self._searchIndex=tin.FullTextIndex(filename)
+
+    @property
+    def searchIndex(self)->'tin.FullTextIndex':
+        """
+        The full-text index of all tin files
+
+        NOTE: may be out of date.  Call updateSearchIndex() to fix that.
+        """
+        if self._searchIndex is None:
+            self._searchIndex=tin.FullTextIndex()
+        return self._searchIndex
+
+    def updateSearchIndex(self)->None:
+        """
+        Bring the full-text index up to date, only re-reading
+        files that have changed (and saving it, if it has a file)
+        """
+        index=self.searchIndex
+        projects=self.projects
+        for name in list(index.documents):
+            if name not in projects:
+                index.remove(name)
+        for name,project in projects.items():
+            tinFiles=project.tinFiles()
+            for field in tin.FIELDS:
+                filename=project.tinFilename(field,tinFiles)
+                stamp:typing.Optional[typing.Tuple[int,int]]=None
+                if filename is not None:
+                    try:
+                        st=os.stat(os.path.join(project.path,str(filename)))
+                        stamp=(st.st_mtime_ns,st.st_size)
+                    except OSError:
+                        pass
+                if index.isCurrent(name,field,stamp):
+                    continue
+                text=None
+                if stamp is not None:
+                    text=project.getTinData(field)
+                index.update(name,field,text,stamp)
+        if index.dirty:
+            index.save()
+
+    @property
+    def summaries(self)->'tin.ProjectSummaries':
+        """
+        The summary of each project, by directory
+        (kept in the scan index, if there is one)
+
+        NOTE: may be out of date.  Call updateSummaries() to fix that.
+        """
+        if self._summaries is None:
+            self._summaries=tin.ProjectSummaries(self._directorySearch.index)
+        return self._summaries
+
+    def updateSummaries(self)->typing.List['tin.ProjectSummary']:
+        """
+        Bring the project summaries up to date, only re-reading
+        tin files that have changed
+
+        :return: the summary of every project (in the same order
+            as results)
+        """
+        summaries=self.summaries
+        projects=list(self.results)
+        summaries.update(projects)
+        return [summaries[project.path] for project in projects]
+
+    def search(self,query:str)->typing.List[Tin]:
+        """
+        Find projects whose tin files match a query
+
+        eg:
+            finder.search('todo:"release notes" OR (bug -fixed)')
+
+        (see tin.fulltext for the query syntax)
+        """
+        self.updateSearchIndex()
+        projects=self.projects
+        return [projects[name] for name in self.searchIndex.query(query)
+            if name in projects]
+
+    def loadAll(self,
+        kinds:typing.Optional[typing.Iterable[str]]=None,
+        threads:int=8,
+        processes:typing.Optional[int]=None,
+        progress:typing.Optional[typing.Callable[[int,int],None]]=None
+        )->int:
+        """
+        Read and parse every tin file of every project in parallel,
+        filling the caches so later access is instant
+
+        :param kinds: which tin files to load (default=tin.FIELDS)
+        :param threads: how many files to read at once
+        :param processes: how many processes to parse with
+            (None=one per cpu, 0=parse in this process)
+        :param progress: called with (done,total) as files are finished
+        :return: the number of files loaded
+        """
+        if kinds is None:
+            kinds=tin.FIELDS
+        loader=tin.BulkLoader(threads,processes,progress)
+        return loader.load(self.results,kinds)
+
+    def useFingerprints(self,enable:bool=True)->None:
+        """
+        Have tin files with the same contents (eg, copied or linked
+        between projects) share one cache entry, so they are only kept
+        and parsed once, and files whose (dev,inode,size,mtime) has not
+        changed are never read again
+
+        NOTE: this is done to the content cache shared by all Tin objects
+        """
+        if not enable:
+            Tin.cache.fingerprints=None
+        elif Tin.cache.fingerprints is None:
+            Tin.cache.fingerprints=tin.Fingerprints()
+
+    def duplicates(self,
+        kinds:typing.Optional[typing.Iterable[str]]=None
+        )->typing.List[typing.List[str]]:
+        """
+        Find tin files with the same contents as one another
+        (eg, copied or linked between projects)
+
+        Uses the content cache's fingerprints if it has them, so that
+        files that have not changed are not read again.
+
+        :param kinds: which tin files to look at (default=tin.FIELDS)
+        :return: groups of filenames with the same contents
+        """
+        if kinds is None:
+            kinds=tin.FIELDS
+        fingerprints=Tin.cache.fingerprints
+        if fingerprints is None:
+            fingerprints=tin.Fingerprints()
+        filenames:typing.List[str]=[]
+        for project in self.results:
+            tinFiles=project.tinFiles()
+            for kind in kinds:
+                filename=project.tinFilename(kind,tinFiles)
+                if filename is None:
+                    continue
+                filename=os.path.join(project.path,str(filename))
+                if fingerprints.fingerprint(filename) is not None:
+                    filenames.append(filename)
+        return fingerprints.duplicates(filenames)
+
     def edit(self,project:str,tinName:str):
         """
         Open the file type in the system editor
@@ -238,8 +914,21 @@ class TinFinder:
     def load(self,filename:typing.Optional[URLCompatible]=None)->None:
         """
         load a series of projects
+
+        (from a snapshot, the projects themselves come back too,
+        without having to scan for them)
         """
-        self._directorySearch.load(filename)
+        search=self._directorySearch
+        search.load(filename)
+        with self._scanLock:
+            self._stopScan()
+            self._found={}
+            self._foundOrder=[]
+            self._projects=None
+            if search._results is not None:
+                self._projects=ProjectMap(search._results)
+        # (a snapshot can come with an index of its own)
+        self._summaries=None
 
     def save(self,filename:typing.Optional[URLCompatible]=None)->None:
         """
@@ -247,6 +936,41 @@ class TinFinder:
         """
         self._directorySearch.save(filename)
 
+    def saveSnapshot(self,filename:URLCompatible)->None:
+        """
+        save the search, the projects found and the scan index
+        in a binary snapshot that load() can read back quickly
+        """
+        _=self.projects
+        self._directorySearch.saveSnapshot(filename)
+
+    def useIndex(self,filename:typing.Optional[URLCompatible])->None:
+        """
+        Keep a persistent index of scanned directories in the given file
+        so that reloads only need to list directories that changed
+
+        :param filename: the index file, or None to stop using an index
+        """
+        self._directorySearch.useIndex(filename)
+        self._summaries=None
+
+    @property
+    def directorySearch(self)->'tin.DirectoriesSearch':
+        """
+        What finds the projects (eg, to change what gets ignored)
+        """
+        return self._directorySearch
+
+    @property
+    def workers(self)->int:
+        """
+        Number of threads to scan directories with
+        """
+        return self._directorySearch.workers
+    @workers.setter
+    def workers(self,workers:int):
+        self._directorySearch.workers=workers
+
     @property
     def results(self)->typing.Iterable[Tin]:
         """
@@ -255,16 +979,21 @@ class TinFinder:
         return self.projects.values()
 
     @property
-    def projects(self)->typing.Dict[str,Tin]:
+    def projects(self)->ProjectMap:
         """
         All of the current projects
         """
         if self._projects is None:
-            self._projects=self.reload()
-        return self._projects
+            if self._scan is None:
+                self.reload()
+            else:
+                # finish the one that is streaming
+                for _ in self.iterProjects():
+                    pass
+        return self._projects # type: ignore
 
     def __iter__(self):
-        return self.projects.__iter__
+        return self.projects.__iter__()
 
     def __getitem__(self,idx):
         if isinstance(idx,str):
@@ -284,11 +1013,18 @@ def cmdline(args:typing.Iterable[str])->int:
 
     :param args: command line arguments (WITHOUT the filename)
     """
+    args=list(args)
     printhelp=False
-    if not args:
+    if not args or '-h' in args or '--help' in args:
+        # without loading anything else, so that it is quick
         printhelp=True
     else:
+        # answer from a running daemon if there is one
+        ret=tin.clientCmdline(args)
+        if ret is not None:
+            return ret
         t=TinFinder('c:\\backed_up')
+        socketPath:typing.Optional[str]=None
         didSomething=False
         for arg in args:
             if arg.startswith('-'):
@@ -297,7 +1033,9 @@ def cmdline(args:typing.Iterable[str])->int:
                     printhelp=True
                 elif av[0]=='--all':
                     didSomething=True
-                    print(t)
+                    # print each as soon as it is found
+                    for project in t.iterProjects():
+                        print(project)
                 elif av[0]=='--edit':
                     didSomething=True
                     nameTin=av[1].split('/')
@@ -307,6 +1045,56 @@ def cmdline(args:typing.Iterable[str])->int:
                     t.save(av[1])
                 elif av[0]=='--load':
                     t.load(av[1])
+                elif av[0]=='--snapshot':
+                    didSomething=True
+                    t.saveSnapshot(av[1])
+                elif av[0]=='--workers':
+                    t.workers=int(av[1])
+                elif av[0]=='--index':
+                    t.useIndex(av[1])
+                elif av[0]=='--ignore':
+                    t.directorySearch.addIgnoreRule(av[1])
+                elif av[0]=='--maxdepth':
+                    t.directorySearch.maxDepth=int(av[1])
+                elif av[0]=='--nosymlinks':
+                    t.directorySearch.followSymlinks=False
+                elif av[0]=='--prunestats':
+                    didSomething=True
+                    t.reload()
+                    stats=t.directorySearch.pruneStats
+                    for rule in sorted(stats,key=lambda r:-stats[r]):
+                        print('%d\t%s'%(stats[rule],rule))
+                elif av[0]=='--stats':
+                    tin.enableStats()
+                elif av[0]=='--socket':
+                    socketPath=av[1]
+                elif av[0]=='--daemon':
+                    didSomething=True
+                    tin.TinDaemon(t,socketPath).serveForever()
+                elif av[0]=='--stopdaemon':
+                    didSomething=True
+                    client=tin.TinClient.connect(socketPath)
+                    if client is None:
+                        print('ERR: no daemon is running')
+                    else:
+                        with client:
+                            client.request('shutdown')
+                elif av[0]=='--textindex':
+                    t.useSearchIndex(av[1])
+                elif av[0]=='--search':
+                    didSomething=True
+                    for project in t.search(av[1]):
+                        print(project.name)
+                elif av[0]=='--summary':
+                    didSomething=True
+                    print(tin.summaryTable(t.updateSummaries()))
+                elif av[0]=='--dedupe':
+                    t.useFingerprints()
+                elif av[0]=='--duplicates':
+                    didSomething=True
+                    for group in t.duplicates():
+                        print('\n'.join(group))
+                        print()
                 else:
                     print('ERR: unknown argument "'+av[0]+'"')
             else:
@@ -314,15 +1102,44 @@ def cmdline(args:typing.Iterable[str])->int:
         if not didSomething:
             print('WARN: Did not do anything.')
             printhelp=True
+        stats=tin.activeStats()
+        if stats is not None:
+            print(stats.report())
     if printhelp:
         print('Usage:')
         print('   tin.py [options] [filename.json]')
         print('Options:')
         print('   --help ............ this help')
         print('   --all ............. print all items')
-        print('   --edit[=name/tin] . edit the particular file eg --edit=myproj/todo')
+        print('   --summary ......... '
+            'print open/closed items, staleness and size of each project')
+        print('   --edit[=name/tin] . '
+            'edit the particular file eg --edit=myproj/todo')
         print('   --save[=filename] . save the config file')
-        print('   --load[=filename] . load the config file')
+        print('   --load[=filename] . load the config file (or a snapshot)')
+        print('   --snapshot=filename '
+            'save the config, projects and index to load quickly')
+        print('   --workers=n ....... scan using n threads')
+        print('   --index=filename .. keep a scan index to speed up rescans')
+        print('   --search=query .... list projects whose files match a query')
+        print('   --textindex=filename keep the search index in a file')
+        print('   --dedupe .......... '
+            'read and parse files with the same contents only once')
+        print('   --duplicates ...... '
+            'list tin files that have the same contents')
+        print('   --ignore=rule ..... '
+            'skip directories matching a gitignore-style rule')
+        print('   --maxdepth=n ...... scan no more than n levels deep')
+        print('   --nosymlinks ...... do not scan into symlinked directories')
+        print('   --prunestats ...... '
+            'show how many directories each ignore rule skipped')
+        print('   --stats ........... '
+            'show counters and timings at the end (put it first)')
+        print('   --daemon .......... '
+            'keep running, answering --all/--edit/--search quickly')
+        print('   --stopdaemon ...... stop a running daemon')
+        print('   --socket=path ..... '
+            'the daemon\'s socket (default is per-user)')
         return 1
     return 0
 
@@ -0,0 +1,147 @@
+"""
+Helpers for using tin from asyncio without blocking the event loop
+
+All filesystem work is run in a shared, bounded thread pool.
+
+NOTE: asyncio is only imported when something here is actually used,
+    since it is slow to import and most uses of tin never need it
+"""
+import typing
+import threading
+if typing.TYPE_CHECKING:
+    import asyncio
+    import concurrent.futures
+
+
+# how many threads the shared executor may use
+DEFAULT_AIO_WORKERS=4
+
+_executor:typing.Optional['concurrent.futures.ThreadPoolExecutor']=None
+_executorLock=threading.Lock()
+
+T=typing.TypeVar('T')
+
+
+def getExecutor()->'concurrent.futures.ThreadPoolExecutor':
+    """
+    The shared executor for blocking filesystem calls
+    """
+    global _executor
+    with _executorLock:
+        if _executor is None:
+            import concurrent.futures
+            _executor=concurrent.futures.ThreadPoolExecutor(
+                DEFAULT_AIO_WORKERS,thread_name_prefix='tin-aio')
+        return _executor
+
+
+def setExecutorSize(workers:int)->None:
+    """
+    Change how many threads the shared executor may use
+
+    (calls already running are allowed to finish)
+    """
+    global _executor,DEFAULT_AIO_WORKERS
+    with _executorLock:
+        DEFAULT_AIO_WORKERS=workers
+        old=_executor
+        _executor=None
+    if old is not None:
+        old.shutdown(wait=False)
+
+
+async def runBlocking(fn:typing.Callable[...,T],
+    *args:typing.Any,
+    timeout:typing.Optional[float]=None
+    )->T:
+    """
+    Run a blocking call in the shared executor
+
+    NOTE: if this is cancelled or times out, the call itself keeps
+        running in its thread until it finishes, but its result
+        is thrown away
+    """
+    import asyncio
+    loop=asyncio.get_running_loop()
+    future=loop.run_in_executor(getExecutor(),fn,*args)
+    return await asyncio.wait_for(future,timeout)
+
+
+async def iterateBlocking(iterable:typing.Iterable[T],
+    batchSize:int=64,
+    timeout:typing.Optional[float]=None
+    )->typing.AsyncGenerator[T,None]:
+    """
+    Iterate a blocking iterable (eg, a scanning generator) in the
+    shared executor, a batch at a time
+
+    Cancelling, or stopping iterating, stops the underlying iterable
+    after its current batch.
+
+    :param timeout: give up if a single batch takes longer than this
+    """
+    import asyncio
+    loop=asyncio.get_running_loop()
+    executor=getExecutor()
+    iterator=iter(iterable)
+    def nextBatch()->typing.List[T]:
+        batch=[]
+        for item in iterator:
+            batch.append(item)
+            if len(batch)>=batchSize:
+                break
+        return batch
+    pending:typing.Optional['asyncio.Future']=None
+    try:
+        while True:
+            pending=loop.run_in_executor(executor,nextBatch)
+            batch=await asyncio.wait_for(asyncio.shield(pending),timeout)
+            pending=None
+            if not batch:
+                return
+            for item in batch:
+                yield item
+    finally:
+        close=getattr(iterator,'close',None)
+        if close is not None:
+            if pending is not None:
+                # cannot close a generator while it is still running
+                pending.add_done_callback(
+                    lambda _:executor.submit(close))
+            else:
+                await loop.run_in_executor(executor,close)
+
+
+class SharedCall(typing.Generic[T]):
+    """
+    Runs a blocking call in the shared executor, such that anyone
+    who asks while it is already running waits for that same call
+    rather than starting another one.
+    """
+
+    def __init__(self,fn:typing.Callable[[],T]):
+        """ """
+        self.fn:typing.Callable[[],T]=fn
+        self._future:typing.Optional['asyncio.Future']=None
+
+    @property
+    def running(self)->bool:
+        """
+        Whether a call is in flight
+        """
+        return self._future is not None and not self._future.done()
+
+    async def __call__(self,timeout:typing.Optional[float]=None)->T:
+        """
+        Run the call, or join the one in flight
+
+        NOTE: a caller being cancelled or timing out does not
+        stop the call for anyone else
+        """
+        import asyncio
+        loop=asyncio.get_running_loop()
+        future=self._future
+        if future is None or future.done() or future.get_loop() is not loop:
+            future=loop.run_in_executor(getExecutor(),self.fn)
+            self._future=future
+        return await asyncio.wait_for(asyncio.shield(future),timeout)
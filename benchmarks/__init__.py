@@ -0,0 +1,15 @@
+"""
+Benchmarks for measuring tin performance
+
+Each module can be run directly, eg:
+    python -m tin.benchmarks.walk c:\\backed_up
+
+suite runs all of the main operations over a synthetic tree
+(see tree.py) and saves json results to compare between versions:
+    python -m tin.benchmarks.suite --out=results.json
+
+startup does the same for how long it takes to import tin
+and run the command line.
+
+memory measures how much memory large numbers of results take.
+"""
@@ -0,0 +1,115 @@
+"""
+Microbenchmark of filenames matched per second,
+using Match.matches vs a compiled Match
+"""
+import typing
+import time
+import random
+import re
+from tin import Match, MatchBase
+
+
+def sampleFilenames(count:int=100000,seed:int=1)->typing.List[str]:
+    """
+    Create a reproducible list of plausible filenames
+    """
+    rand=random.Random(seed)
+    stems=['todo','todos','ideas','notes','readme','main','index','setup',
+        'project','data','config','test','utils','shopping','changelog']
+    exts=['txt','md','html','htm','py','json','c','h','js','png','xhtml']
+    ret=[]
+    for _ in range(count):
+        stem=rand.choice(stems)
+        if rand.random()<0.7:
+            stem='%s_%d'%(stem,rand.randint(0,999))
+        ret.append('%s.%s'%(stem,rand.choice(exts)))
+    return ret
+
+
+def sampleMatches()->typing.Dict[str,Match]:
+    """
+    Some representative matchers
+    """
+    extensions=['txt','htm','html','md']
+    filenames=['todo','todos','ideas','notes']
+    tinRe=re.compile('(%s)(\\.(%s))'%(
+        '|'.join(filenames),'|'.join(extensions)),re.IGNORECASE)
+    literals=['%s.%s'%(f,e) for f in filenames for e in extensions]
+    return {
+        'tin regex':Match(tinRe),
+        'literals':Match(literals),
+        'mixed':Match(
+            anyOf=literals+[re.compile(r'project\.[x]?htm[l]?'),
+                re.compile(r'.*\.py$'),Match(['.git','.hg'])],
+            noneOf=[re.compile(r'.*_0\.'),'setup.py']),
+        }
+
+
+def rate(m:MatchBase,filenames:typing.List[str],repeat:int=3)->float:
+    """
+    :return: best filenames matched per second
+    """
+    best=0.0
+    matches=m.matches
+    for _ in range(repeat):
+        start=time.perf_counter()
+        for f in filenames:
+            matches(f)
+        elapsed=time.perf_counter()-start
+        best=max(best,len(filenames)/elapsed)
+    return best
+
+
+def run(count:int=100000,repeat:int=3
+    )->typing.Dict[str,typing.Dict[str,float]]:
+    """
+    :return: {matcherName:{'match':rate,'compiled':rate}}
+    """
+    filenames=sampleFilenames(count)
+    ret={}
+    for name,m in sampleMatches().items():
+        compiled=m.compile()
+        for f in filenames:
+            if m.matches(f)!=compiled.matches(f):
+                raise Exception('compiled %s disagrees on "%s"'%(name,f))
+        ret[name]={
+            'match':rate(m,filenames,repeat),
+            'compiled':rate(compiled,filenames,repeat)}
+    return ret
+
+
+def cmdline(args:typing.Iterable[str])->int:
+    """
+    Run the command line
+
+    :param args: command line arguments (WITHOUT the filename)
+    """
+    count=100000
+    repeat=3
+    for arg in args:
+        av=[a.strip() for a in arg.split('=',1)]
+        if av[0] in ['-h','--help']:
+            print('Usage:')
+            print('   match.py [options]')
+            print('Options:')
+            print('   --help ............ this help')
+            print('   --count=n ......... number of filenames to match')
+            print('   --repeat=n ........ number of timed runs (best is kept)')
+            return 1
+        elif av[0]=='--count':
+            count=int(av[1])
+        elif av[0]=='--repeat':
+            repeat=int(av[1])
+        else:
+            print('ERR: unknown argument "'+av[0]+'"')
+    for name,result in run(count,repeat).items():
+        print('%s:'%name)
+        print('   Match:         %12.0f filenames/s'%result['match'])
+        print('   CompiledMatch: %12.0f filenames/s (%0.1fx)'%(
+            result['compiled'],result['compiled']/result['match']))
+    return 0
+
+
+if __name__=='__main__':
+    import sys
+    cmdline(sys.argv[1:])
@@ -0,0 +1,175 @@
+"""
+Measure how much memory scan results take, using tracemalloc
+
+Results are made up rather than scanned (there is no need for a
+million real directories to see what it costs to hold on to them),
+then kept in each of these forms:
+    list          a list of URLs and a {path:names} dict of listings
+                  (how DirectoriesSearch used to keep them)
+    compact       CompactResults
+    projects      a ProjectMap over the CompactResults
+                  (where no Tin has been made yet)
+    projectsUsed  the same, after every Tin has been made
+
+eg:
+    python -m tin.benchmarks.memory --sizes=100000,1000000
+"""
+import typing
+import sys
+import json
+import gc
+import tracemalloc
+from paths import asURL
+import tin
+
+
+DEFAULT_SIZES=(100000,1000000)
+
+# subdirectories in each generated directory
+FANOUT=10
+
+# children of each result (as though listed from the disk)
+LISTING_FILES=('todo.txt','notes.md','file0.dat','file1.dat','file2.dat')
+
+
+def syntheticResults(count:int,
+    root:str='/home/user/projects'
+    )->typing.Generator[typing.Tuple[str,typing.List[str]],None,None]:
+    """
+    Make up count (path,names of its children) results
+
+    They are the directories of a tree with FANOUT subdirectories
+    in each, numbered breadth first, and each named after its number
+    (since projects are known by directory name).
+    """
+    for n in range(count):
+        parts:typing.List[str]=[]
+        i=n
+        while i>=0:
+            parts.append('d%d'%i)
+            i=i//FANOUT-1
+        parts.append(root)
+        parts.reverse()
+        # new strings each time, the same as a real listing would give
+        names=[''.join(name) for name in LISTING_FILES]
+        yield '/'.join(parts),names
+
+
+def _listForm(count:int)->typing.Any:
+    results=[]
+    listings={}
+    for path,names in syntheticResults(count):
+        results.append(asURL(path))
+        listings[path]=names
+    return results,listings
+
+
+def _compactForm(count:int)->typing.Any:
+    results=tin.CompactResults()
+    for path,names in syntheticResults(count):
+        results.append(path,names)
+    return results
+
+
+def _projectsForm(count:int)->typing.Any:
+    return tin.ProjectMap(_compactForm(count))
+
+
+def _projectsUsedForm(count:int)->typing.Any:
+    projects=_projectsForm(count)
+    for _ in projects.values():
+        pass
+    return projects
+
+
+FORMS:typing.Dict[str,typing.Callable[[int],typing.Any]]={
+    'list':_listForm,
+    'compact':_compactForm,
+    'projects':_projectsForm,
+    'projectsUsed':_projectsUsedForm,
+    }
+
+
+def measure(build:typing.Callable[[int],typing.Any],
+    count:int
+    )->typing.Dict[str,int]:
+    """
+    How much memory something holds on to
+
+    :return: {'bytes':kept afterwards,'peak':most at any one time}
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        kept=build(count)
+        gc.collect()
+        current,peak=tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del kept
+    return {'bytes':current,'peak':peak}
+
+
+def run(sizes:typing.Iterable[int]=DEFAULT_SIZES,
+    forms:typing.Optional[typing.Iterable[str]]=None
+    )->typing.Dict[str,typing.Any]:
+    """
+    Measure every form at every size
+
+    :return: a json-compatible report
+    """
+    if forms is None:
+        forms=FORMS.keys()
+    results:typing.Dict[str,typing.Any]={}
+    for count in sizes:
+        for form in forms:
+            result=measure(FORMS[form],count)
+            result['count']=count
+            result['bytesPerResult']=result['bytes']/count
+            results['%s.%d'%(form,count)]=result
+    return {'python':sys.version.split()[0],'results':results}
+
+
+def cmdline(args:typing.Iterable[str])->int:
+    """
+    Run the command line
+
+    :param args: command line arguments (WITHOUT the filename)
+    """
+    sizes:typing.List[int]=list(DEFAULT_SIZES)
+    forms:typing.Optional[typing.List[str]]=None
+    out:typing.Optional[str]=None
+    for arg in args:
+        av=[a.strip() for a in arg.split('=',1)]
+        if av[0] in ['-h','--help']:
+            print('Usage:')
+            print('   memory.py [options]')
+            print('Options:')
+            print('   --help ............ this help')
+            print('   --sizes=n,n ....... numbers of results (default %s)'%(
+                ','.join(str(n) for n in DEFAULT_SIZES)))
+            print('   --forms=f,f ....... only measure these (%s)'%(
+                ','.join(FORMS.keys())))
+            print('   --out=filename .... save the results as json')
+            return 1
+        elif av[0]=='--sizes':
+            sizes=[int(n) for n in av[1].split(',')]
+        elif av[0]=='--forms':
+            forms=[f.strip() for f in av[1].split(',')]
+        elif av[0]=='--out':
+            out=av[1]
+        else:
+            print('ERR: unknown argument "'+av[0]+'"')
+    report=run(sizes,forms)
+    for name,result in report['results'].items():
+        print('   %-22s %10.1fMB (peak %10.1fMB) %8.1f bytes/result'%(
+            name,result['bytes']/1048576.0,result['peak']/1048576.0,
+            result['bytesPerResult']))
+    if out is not None:
+        with open(out,'w',encoding='utf-8') as f:
+            json.dump(report,f,indent=2)
+    return 0
+
+
+if __name__=='__main__':
+    sys.exit(cmdline(sys.argv[1:]))
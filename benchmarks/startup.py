@@ -0,0 +1,173 @@
+"""
+Measure how long tin takes to start, using python -X importtime
+
+Each scenario is run in a fresh interpreter, since imports only
+cost anything the first time.
+
+eg:
+    python -m tin.benchmarks.startup --out=before.json
+    (make changes)
+    python -m tin.benchmarks.startup --compare=before.json
+"""
+import typing
+import os
+import sys
+import json
+import time
+import platform
+import statistics
+import subprocess
+from tin.benchmarks.suite import VERSION,DEFAULT_THRESHOLD,compare
+
+
+# {name:python arguments}
+SCENARIOS:typing.Dict[str,typing.List[str]]={
+    'import tin':['-c','import tin'],
+    'tin --help':['-m','tin','--help'],
+    'import everything':['-c','from tin import *'],
+    }
+
+
+def packageParent()->str:
+    """
+    The directory tin is imported from
+    """
+    import tin
+    return os.path.dirname(os.path.dirname(os.path.abspath(tin.__file__)))
+
+
+def importTimes(args:typing.List[str]
+    )->typing.Tuple[float,typing.Dict[str,typing.Tuple[int,int]]]:
+    """
+    Run python with -X importtime
+
+    :return: (wall time in seconds,
+        {module:(self microseconds,cumulative microseconds)})
+        where only top-level imports have their cumulative time
+        counted in the total
+    """
+    env=dict(os.environ)
+    parent=packageParent()
+    env['PYTHONPATH']=os.pathsep.join(
+        [parent]+[p for p in [env.get('PYTHONPATH')] if p])
+    start=time.perf_counter()
+    result=subprocess.run([sys.executable,'-X','importtime']+args,
+        env=env,cwd=parent,stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,check=False)
+    elapsed=time.perf_counter()-start
+    modules:typing.Dict[str,typing.Tuple[int,int]]={}
+    for line in result.stderr.decode('utf-8',errors='replace').split('\n'):
+        if not line.startswith('import time:'):
+            continue
+        parts=line[len('import time:'):].split('|')
+        if len(parts)!=3 or not parts[0].strip().isdigit():
+            # the header line
+            continue
+        modules[parts[2].strip()]=(int(parts[0]),int(parts[1]))
+    return elapsed,modules
+
+
+def run(repeat:int=5,
+    scenarios:typing.Optional[typing.Dict[str,typing.List[str]]]=None
+    )->typing.Dict[str,typing.Any]:
+    """
+    Run each scenario several times
+
+    :return: a json-compatible report, in the same form as suite.run()
+        with the addition of the import times
+    """
+    if scenarios is None:
+        scenarios=SCENARIOS
+    results:typing.Dict[str,typing.Any]={}
+    for name,args in scenarios.items():
+        times:typing.List[float]=[]
+        imports:typing.List[float]=[]
+        modules:typing.Dict[str,typing.Tuple[int,int]]={}
+        for _ in range(repeat):
+            elapsed,modules=importTimes(args)
+            times.append(elapsed)
+            imports.append(sum(s for s,_ in modules.values())/1000000.0)
+        tinModules=sorted(m for m in modules
+            if m=='tin' or m.startswith('tin.'))
+        slowest=sorted(modules.items(),key=lambda kv:-kv[1][0])[:10]
+        results[name]={
+            'best':min(times),
+            'median':statistics.median(times),
+            'importSeconds':min(imports),
+            'count':len(modules),
+            'tinModules':tinModules,
+            'slowest':[[m,s] for m,(s,_) in slowest]}
+    return {
+        'version':VERSION,
+        'python':platform.python_version(),
+        'platform':platform.platform(),
+        'results':results}
+
+
+def cmdline(args:typing.Iterable[str])->int:
+    """
+    Run the command line
+
+    :param args: command line arguments (WITHOUT the filename)
+    """
+    repeat=5
+    out:typing.Optional[str]=None
+    baseline:typing.Optional[str]=None
+    threshold=DEFAULT_THRESHOLD
+    verbose=False
+    for arg in args:
+        av=[a.strip() for a in arg.split('=',1)]
+        if av[0] in ['-h','--help']:
+            print('Usage:')
+            print('   startup.py [options]')
+            print('Options:')
+            print('   --help ............ this help')
+            print('   --repeat=n ........ '
+                'number of runs of each (best is kept)')
+            print('   --verbose ......... '
+                'show which modules are imported and the slowest')
+            print('   --out=filename .... save the results as json')
+            print('   --compare=filename  compare against earlier results')
+            print('   --threshold=f ..... '
+                'slowdown that counts as a regression (default %s)'%threshold)
+            return 1
+        elif av[0]=='--repeat':
+            repeat=int(av[1])
+        elif av[0]=='--verbose':
+            verbose=True
+        elif av[0]=='--out':
+            out=av[1]
+        elif av[0]=='--compare':
+            baseline=av[1]
+        elif av[0]=='--threshold':
+            threshold=float(av[1])
+        else:
+            print('ERR: unknown argument "'+av[0]+'"')
+    report=run(repeat)
+    for name,result in report['results'].items():
+        print('   %-20s %9.2fms (imports %7.2fms, %d modules)'%(
+            name,result['best']*1000,result['importSeconds']*1000,
+            result['count']))
+        if verbose:
+            print('      tin modules: %s'%', '.join(result['tinModules']))
+            for module,us in result['slowest']:
+                print('      %8.2fms %s'%(us/1000.0,module))
+    if out is not None:
+        with open(out,'w',encoding='utf-8') as f:
+            json.dump(report,f,indent=2)
+    ret=0
+    if baseline is not None:
+        with open(baseline,encoding='utf-8') as f:
+            ratios=compare(json.load(f),report)
+        print('compared to %s:'%baseline)
+        for name,ratio in ratios.items():
+            flag=''
+            if ratio>1.0+threshold:
+                flag=' REGRESSION'
+                ret=2
+            print('   %-20s %6.2fx%s'%(name,ratio,flag))
+    return ret
+
+
+if __name__=='__main__':
+    sys.exit(cmdline(sys.argv[1:]))
@@ -0,0 +1,272 @@
+"""
+Benchmark scanning, matching and reading over a synthetic tree,
+with json output that can be compared between versions
+
+eg:
+    python -m tin.benchmarks.suite --out=before.json
+    (make changes)
+    python -m tin.benchmarks.suite --compare=before.json
+"""
+import typing
+import os
+import re
+import json
+import time
+import shutil
+import platform
+import tempfile
+import statistics
+import tin
+from tin import DirectoriesSet,TinFinder
+from tin.benchmarks.tree import TreeSpec,generateTree
+
+
+# bump this when results stop being comparable with older versions
+VERSION=1
+
+# how much slower something must get to count as a regression
+DEFAULT_THRESHOLD=0.1
+
+
+def timeIt(fn:typing.Callable[[],typing.Any],
+    repeat:int=5,
+    setup:typing.Optional[typing.Callable[[],typing.Any]]=None
+    )->typing.Dict[str,typing.Any]:
+    """
+    Time a function several times
+
+    :param setup: run before each timing (but not timed), eg to
+        clear caches
+    :return: {'best':seconds,'median':seconds,'count':what fn returned}
+    """
+    times:typing.List[float]=[]
+    count=None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start=time.perf_counter()
+        count=fn()
+        times.append(time.perf_counter()-start)
+    return {'best':min(times),'median':statistics.median(times),
+        'count':count}
+
+
+def benchmarks(root:str
+    )->typing.Dict[str,typing.Tuple[
+        typing.Callable[[],typing.Any],
+        typing.Optional[typing.Callable[[],typing.Any]]]]:
+    """
+    All of the benchmarks
+
+    :return: {name:(fn,setup)}
+    """
+    ignore=DirectoriesSet.DEFAULT_IGNORE
+    ds=DirectoriesSet(root,True,ignore)
+    tinRe=re.compile(r'(todo|ideas|notes)\.(txt|md|html)')
+    finder=TinFinder(root)
+    finder.directorySearch.ignore=ignore # type: ignore
+    projects=list(finder.projects.values())
+    cache=tin.DEFAULT_CONTENT_CACHE
+
+    def allDirectories()->int:
+        return sum(1 for _ in ds.allDirectories)
+
+    def containingName()->int:
+        return sum(1 for _ in ds.directoriesContaining(tinRe))
+
+    def containingContent()->int:
+        return sum(1 for _ in ds.directoriesContaining(
+            (tinRe,re.compile('release notes'))))
+
+    def reload()->int:
+        return len(finder.reload())
+
+    def tinStr()->int:
+        return sum(len(str(p)) for p in projects)
+
+    def getTinData()->int:
+        total=0
+        for p in projects:
+            for field in tin.FIELDS:
+                data=p.getTinData(field)
+                if data is not None:
+                    total+=len(data)
+        return total
+
+    def cold()->None:
+        cache.clear()
+        for p in projects:
+            p.invalidate()
+
+    return {
+        'allDirectories':(allDirectories,None),
+        'directoriesContaining.name':(containingName,None),
+        'directoriesContaining.content':(containingContent,cold),
+        'TinFinder.reload':(reload,None),
+        'Tin.__str__.cold':(tinStr,cold),
+        'Tin.__str__.warm':(tinStr,None),
+        'getTinData.cold':(getTinData,cold),
+        'getTinData.warm':(getTinData,None),
+        }
+
+
+def run(root:str,
+    spec:typing.Optional[TreeSpec]=None,
+    repeat:int=5,
+    only:typing.Optional[typing.Pattern]=None
+    )->typing.Dict[str,typing.Any]:
+    """
+    Generate the tree (if need be) and run the benchmarks
+
+    NOTE: the os caches the tree once it has been read, so these
+    measure the warm filesystem case
+
+    :param only: only run benchmarks whose names match this
+    :return: a json-compatible report
+    """
+    if spec is None:
+        spec=TreeSpec()
+    treeStats=generateTree(root,spec)
+    results:typing.Dict[str,typing.Any]={}
+    for name,(fn,setup) in benchmarks(root).items():
+        if only is not None and not only.search(name):
+            continue
+        fn() # once to warm up
+        results[name]=timeIt(fn,repeat,setup)
+    return {
+        'version':VERSION,
+        'python':platform.python_version(),
+        'platform':platform.platform(),
+        'spec':spec.jsonObj,
+        'tree':treeStats,
+        'results':results}
+
+
+def compare(baseline:typing.Dict[str,typing.Any],
+    current:typing.Dict[str,typing.Any]
+    )->typing.Dict[str,float]:
+    """
+    Compare two reports
+
+    :return: {benchmarkName:ratio of best times (current/baseline)}
+        for every benchmark in both
+    """
+    if baseline.get('spec')!=current.get('spec'):
+        print('WARN: the reports were run on different trees')
+    ret:typing.Dict[str,float]={}
+    for name,result in current['results'].items():
+        old=baseline.get('results',{}).get(name)
+        if old is None or not old['best']:
+            continue
+        ret[name]=result['best']/old['best']
+    return ret
+
+
+def cmdline(args:typing.Iterable[str])->int:
+    """
+    Run the command line
+
+    :param args: command line arguments (WITHOUT the filename)
+    """
+    spec=TreeSpec()
+    root:typing.Optional[str]=None
+    out:typing.Optional[str]=None
+    baseline:typing.Optional[str]=None
+    threshold=DEFAULT_THRESHOLD
+    repeat=5
+    only:typing.Optional[typing.Pattern]=None
+    for arg in args:
+        av=[a.strip() for a in arg.split('=',1)]
+        if av[0] in ['-h','--help']:
+            print('Usage:')
+            print('   suite.py [options]')
+            print('Options:')
+            print('   --help ............ this help')
+            print('   --tree=directory .. '
+                'where to build the tree (kept for next time)')
+            print('   --depth=n ......... '
+                'levels of directories (default %d)'%spec.depth)
+            print('   --fanout=n ........ '
+                'subdirectories per directory (default %d)'%spec.fanout)
+            print('   --ignore=f ........ '
+                'chance of an ignored subtree (default %s)'%spec.ignoreDensity)
+            print('   --tins=f .......... '
+                'chance of a directory being a project (default %s)'%
+                spec.tinDensity)
+            print('   --files=n ......... '
+                'other files per directory (default %d)'%spec.filesPerDir)
+            print('   --size=n .......... '
+                'average tin file size (default %d)'%spec.contentSize)
+            print('   --seed=n .......... random seed (default %d)'%spec.seed)
+            print('   --repeat=n ........ number of timed runs')
+            print('   --only=regex ...... only run matching benchmarks')
+            print('   --out=filename .... save the results as json')
+            print('   --compare=filename  compare against earlier results')
+            print('   --threshold=f ..... '
+                'slowdown that counts as a regression (default %s)'%threshold)
+            return 1
+        elif av[0]=='--tree':
+            root=av[1]
+        elif av[0]=='--depth':
+            spec.depth=int(av[1])
+        elif av[0]=='--fanout':
+            spec.fanout=int(av[1])
+        elif av[0]=='--ignore':
+            spec.ignoreDensity=float(av[1])
+        elif av[0]=='--tins':
+            spec.tinDensity=float(av[1])
+        elif av[0]=='--files':
+            spec.filesPerDir=int(av[1])
+        elif av[0]=='--size':
+            spec.contentSize=int(av[1])
+        elif av[0]=='--seed':
+            spec.seed=int(av[1])
+        elif av[0]=='--repeat':
+            repeat=int(av[1])
+        elif av[0]=='--only':
+            only=re.compile(av[1])
+        elif av[0]=='--out':
+            out=av[1]
+        elif av[0]=='--compare':
+            baseline=av[1]
+        elif av[0]=='--threshold':
+            threshold=float(av[1])
+        else:
+            print('ERR: unknown argument "'+av[0]+'"')
+    temporary=root is None
+    if root is None:
+        root=tempfile.mkdtemp(prefix='tinbench')
+    try:
+        report=run(os.path.join(root,'tree') if temporary else root,
+            spec,repeat,only)
+    finally:
+        if temporary:
+            shutil.rmtree(root,ignore_errors=True)
+    tree=report['tree']
+    print('tree: %d directories (%d ignored), %d projects, '
+        '%d files, %d bytes'%(tree['directories'],
+            tree['ignoredDirectories'],tree['projects'],
+            tree['files'],tree['bytes']))
+    for name,result in report['results'].items():
+        print('   %-32s %9.2fms (median %9.2fms)'%(
+            name,result['best']*1000,result['median']*1000))
+    if out is not None:
+        with open(out,'w',encoding='utf-8') as f:
+            json.dump(report,f,indent=2)
+    ret=0
+    if baseline is not None:
+        with open(baseline,encoding='utf-8') as f:
+            ratios=compare(json.load(f),report)
+        print('compared to %s:'%baseline)
+        for name,ratio in ratios.items():
+            flag=''
+            if ratio>1.0+threshold:
+                flag=' REGRESSION'
+                ret=2
+            print('   %-32s %6.2fx%s'%(name,ratio,flag))
+    return ret
+
+
+if __name__=='__main__':
+    import sys
+    sys.exit(cmdline(sys.argv[1:]))
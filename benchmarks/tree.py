@@ -0,0 +1,176 @@
+"""
+Generate reproducible synthetic directory trees to benchmark against
+
+The same settings (including the seed) always produce the same tree.
+"""
+import typing
+import os
+import json
+import random
+import shutil
+
+
+# names of directories that DirectoriesSet ignores by default
+IGNORED_NAMES=['node_modules','.mypy_cache','cache','bin','lib']
+
+# (filename,format) of tin files that can be generated
+TIN_FILES=[('todo.txt','txt'),('ideas.txt','txt'),('notes.md','md'),
+    ('todo.md','md'),('notes.html','html'),('shopping.txt','txt')]
+
+WORDS=['fix','the','parser','bug','release','notes','update','docs',
+    'refactor','scanner','cache','test','index','speed','up','walk',
+    'remove','old','config','add','support','for','html','markdown',
+    'daemon','socket','query','search','rename','project','check']
+
+# the file that records what settings a tree was made with
+MANIFEST='.tinbench.json'
+
+
+class TreeSpec:
+    """
+    Describes a synthetic tree
+    """
+
+    def __init__(self,
+        depth:int=4,
+        fanout:int=6,
+        ignoreDensity:float=0.1,
+        tinDensity:float=0.2,
+        filesPerDir:int=4,
+        contentSize:int=2000,
+        seed:int=1):
+        """
+        :param depth: levels of directories below the root
+        :param fanout: subdirectories in each directory
+        :param ignoreDensity: chance of a directory also having an
+            ignored directory (eg node_modules) with its own subtree
+        :param tinDensity: chance of a directory being a project
+            (ie, having tin files)
+        :param filesPerDir: ordinary files in each directory
+        :param contentSize: average size of a tin file, in bytes
+        :param seed: random seed
+        """
+        self.depth=depth
+        self.fanout=fanout
+        self.ignoreDensity=ignoreDensity
+        self.tinDensity=tinDensity
+        self.filesPerDir=filesPerDir
+        self.contentSize=contentSize
+        self.seed=seed
+
+    @property
+    def jsonObj(self)->typing.Dict[str,typing.Any]:
+        """
+        The settings as a json object
+        """
+        return dict(self.__dict__)
+    @jsonObj.setter
+    def jsonObj(self,obj:typing.Dict[str,typing.Any]):
+        for k,v in obj.items():
+            if k in self.__dict__:
+                setattr(self,k,v)
+
+    def __repr__(self)->str:
+        return 'TreeSpec(%s)'%(','.join(
+            ['%s=%r'%(k,v) for k,v in self.__dict__.items()]))
+
+
+def tinText(rand:random.Random,fileFormat:str,size:int)->str:
+    """
+    Make up the contents of a tin file of roughly the given size
+    """
+    lines:typing.List[str]=[]
+    total=0
+    while total<size:
+        if rand.random()<0.1:
+            heading=' '.join(rand.choice(WORDS) for _ in range(2)).title()
+            if fileFormat=='md':
+                line='## '+heading
+            elif fileFormat=='html':
+                line='<h2>%s</h2>'%heading
+            else:
+                line=heading+':'
+        else:
+            text=' '.join(rand.choice(WORDS) for _ in range(rand.randint(3,9)))
+            checked='x' if rand.random()<0.3 else ' '
+            if fileFormat=='html':
+                line='<li>[%s] %s</li>'%(checked,text)
+            else:
+                line='[%s] %s'%(checked,text)
+        lines.append(line)
+        total+=len(line)+1
+    if fileFormat=='html':
+        return '<html><body><ul>\n%s\n</ul></body></html>'%'\n'.join(lines)
+    return '\n'.join(lines)
+
+
+def generateTree(root:str,
+    spec:typing.Optional[TreeSpec]=None
+    )->typing.Dict[str,int]:
+    """
+    Build a synthetic tree under root
+
+    If root already holds a tree made with the same settings, it is
+    reused as-is.  Otherwise it is deleted and regenerated.
+
+    :return: {'directories':n,'ignoredDirectories':n,'projects':n,
+        'tinFiles':n,'files':n,'bytes':n}
+    """
+    if spec is None:
+        spec=TreeSpec()
+    manifest=os.path.join(root,MANIFEST)
+    try:
+        with open(manifest,encoding='utf-8') as f:
+            existing=json.load(f)
+        if existing.get('spec')==spec.jsonObj:
+            return existing['stats']
+    except (OSError,ValueError):
+        pass
+    if os.path.exists(root):
+        shutil.rmtree(root)
+    os.makedirs(root)
+    rand=random.Random(spec.seed)
+    stats={'directories':0,'ignoredDirectories':0,'projects':0,
+        'tinFiles':0,'files':0,'bytes':0}
+    numbered=[0]
+
+    def writeFile(filename:str,text:str)->None:
+        with open(filename,'w',encoding='utf-8') as f:
+            f.write(text)
+        stats['files']+=1
+        stats['bytes']+=len(text)
+
+    def fill(directory:str,level:int,ignored:bool)->None:
+        if ignored:
+            stats['ignoredDirectories']+=1
+        else:
+            stats['directories']+=1
+        for i in range(spec.filesPerDir):
+            writeFile(os.path.join(directory,'file%d.dat'%i),
+                'x'*rand.randint(0,200))
+        if not ignored and rand.random()<spec.tinDensity:
+            stats['projects']+=1
+            for filename,fileFormat in rand.sample(TIN_FILES,
+                rand.randint(1,3)):
+                size=int(spec.contentSize*rand.uniform(0.5,1.5))
+                writeFile(os.path.join(directory,filename),
+                    tinText(rand,fileFormat,size))
+                stats['tinFiles']+=1
+        if level>=spec.depth:
+            return
+        if not ignored and rand.random()<spec.ignoreDensity:
+            d=os.path.join(directory,rand.choice(IGNORED_NAMES))
+            os.mkdir(d)
+            # a smaller tree, since it should never be visited anyway
+            fill(d,max(level,spec.depth-2),True)
+        for _ in range(spec.fanout):
+            # unique names, since projects are known by directory name
+            numbered[0]+=1
+            d=os.path.join(directory,'d%d'%numbered[0])
+            os.mkdir(d)
+            fill(d,level+1,ignored)
+
+    fill(root,0,False)
+    with open(manifest,'w',encoding='utf-8') as f:
+        json.dump({'spec':spec.jsonObj,'stats':stats},f)
+    return stats
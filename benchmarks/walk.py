@@ -0,0 +1,157 @@
+"""
+Compare the scandir-based directory walker against
+the original listdir/isdir walker.
+
+Reports wall time and the number of filesystem calls
+(listdir, scandir, stat, lstat) each one makes.
+"""
+import typing
+import os
+import time
+from tin import DirectoriesSet
+
+
+class CallCounter:
+    """
+    Temporarily wraps filesystem functions in the os module
+    so that calls to them can be counted.
+    """
+
+    FUNCTIONS=['listdir','scandir','stat','lstat']
+
+    def __init__(self):
+        """ """
+        self.counts:typing.Dict[str,int]={}
+        self._originals:typing.Dict[str,typing.Callable]={}
+
+    def _wrap(self,name:str,fn:typing.Callable)->typing.Callable:
+        def wrapper(*args,**kwargs):
+            self.counts[name]=self.counts.get(name,0)+1
+            return fn(*args,**kwargs)
+        return wrapper
+
+    def __enter__(self)->'CallCounter':
+        self.counts={}
+        for name in self.FUNCTIONS:
+            fn=getattr(os,name)
+            self._originals[name]=fn
+            setattr(os,name,self._wrap(name,fn))
+        return self
+
+    def __exit__(self,*args)->None:
+        for name,fn in self._originals.items():
+            setattr(os,name,fn)
+        self._originals={}
+
+    @property
+    def total(self)->int:
+        """
+        Total number of calls of all kinds
+        """
+        return sum(self.counts.values())
+
+
+def legacyWalk(ds:DirectoriesSet)->typing.Generator[
+    typing.Tuple[str,typing.List[str]],None,None]:
+    """
+    The original walker, followed by a second listing
+    of each directory (which is what URL.children used to do
+    in _checkDirectory)
+    """
+    ignore=set()
+    def r(dd:str)->typing.Generator[str,None,None]:
+        if dd in ignore:
+            return
+        ignore.add(dd)
+        yield dd
+        for d in os.listdir(dd):
+            if d in ds.ignore:
+                continue
+            d='%s%s%s'%(dd,os.sep,d)
+            if os.path.isdir(d):
+                yield from r(d)
+    for d in ds._recursiveDirectories:
+        for dd in r(os.path.abspath(d)):
+            yield dd,os.listdir(dd)
+
+
+def scandirWalk(ds:DirectoriesSet)->typing.Generator[
+    typing.Tuple[str,typing.List[str]],None,None]:
+    """
+    The current walker
+    """
+    for d,names in ds.walk():
+        yield str(d),names
+
+
+def run(directories:typing.Iterable[str],
+    repeat:int=3
+    )->typing.Dict[str,typing.Dict[str,typing.Any]]:
+    """
+    Run both walkers over the directories
+
+    :return: {walkerName:{'directories':n,'seconds':best time,
+        'calls':{fnName:count},'totalCalls':n}}
+    """
+    ds=DirectoriesSet(directories,True)
+    ret:typing.Dict[str,typing.Dict[str,typing.Any]]={}
+    walkers={'listdir+isdir':legacyWalk,'scandir':scandirWalk}
+    for name,walker in walkers.items():
+        with CallCounter() as counter:
+            numDirs=sum(1 for _ in walker(ds))
+        best=None
+        for _ in range(repeat):
+            start=time.perf_counter()
+            for _ in walker(ds):
+                pass
+            elapsed=time.perf_counter()-start
+            if best is None or elapsed<best:
+                best=elapsed
+        ret[name]={
+            'directories':numDirs,
+            'seconds':best,
+            'calls':dict(counter.counts),
+            'totalCalls':counter.total}
+    return ret
+
+
+def cmdline(args:typing.Iterable[str])->int:
+    """
+    Run the command line
+
+    :param args: command line arguments (WITHOUT the filename)
+    """
+    printhelp=False
+    directories:typing.List[str]=[]
+    repeat=3
+    for arg in args:
+        if arg.startswith('-'):
+            av=[a.strip() for a in arg.split('=',1)]
+            if av[0] in ['-h','--help']:
+                printhelp=True
+            elif av[0]=='--repeat':
+                repeat=int(av[1])
+            else:
+                print('ERR: unknown argument "'+av[0]+'"')
+        else:
+            directories.append(arg)
+    if not directories:
+        printhelp=True
+    if printhelp:
+        print('Usage:')
+        print('   walk.py [options] directory [directory ...]')
+        print('Options:')
+        print('   --help ............ this help')
+        print('   --repeat=n ........ number of timed runs (best is kept)')
+        return 1
+    for name,result in run(directories,repeat).items():
+        print('%s:'%name)
+        print('   directories: %d'%result['directories'])
+        print('   best time:   %0.4fs'%result['seconds'])
+        print('   fs calls:    %d %s'%(result['totalCalls'],result['calls']))
+    return 0
+
+
+if __name__=='__main__':
+    import sys
+    cmdline(sys.argv[1:])
@@ -0,0 +1,135 @@
+"""
+Load many tin files at once
+
+Reading is handed to a pool of threads (it is mostly waiting on
+the disk) and parsing to a pool of processes (it is pure python,
+so threads would be held back by the GIL).
+"""
+import typing
+import os
+import concurrent.futures
+import tin
+
+
+# batch this many files per message to the parsing processes
+PARSE_CHUNK_SIZE=16
+
+
+def _parseCompact(
+    jobs:typing.List[typing.Tuple[str,str]]
+    )->typing.List[typing.Tuple[typing.Any,...]]:
+    """
+    Parse a batch of (text,fileFormat) in a worker process
+
+    :return: the compact form of each document
+    """
+    return [tin.parseTin(text,fileFormat).compact()
+        for text,fileFormat in jobs]
+
+
+class BulkLoader:
+    """
+    Reads and parses the tin files of many projects in parallel,
+    filling the shared content cache with the contents and
+    the parsed documents.
+    """
+
+    def __init__(self,
+        threads:int=8,
+        processes:typing.Optional[int]=None,
+        progress:typing.Optional[typing.Callable[[int,int],None]]=None):
+        """
+        :param threads: how many files to read at once
+        :param processes: how many processes to parse with
+            (None=one per cpu, 0=parse in this process)
+        :param progress: called with (done,total) as files are finished
+        """
+        self.threads:int=max(1,threads)
+        self.processes:typing.Optional[int]=processes
+        self.progress:typing.Optional[
+            typing.Callable[[int,int],None]]=progress
+
+    def _jobs(self,
+        projects:typing.Iterable['tin.Tin'],
+        kinds:typing.Iterable[str]
+        )->typing.List[typing.Tuple['tin.Tin',str]]:
+        """
+        :return: [(project,full path)] for every file that exists
+        """
+        kinds=list(kinds)
+        ret=[]
+        for project in projects:
+            tinFiles=project.tinFiles()
+            found=set()
+            for kind in kinds:
+                filename=project.tinFilename(kind,tinFiles)
+                if filename is None:
+                    continue
+                path=os.path.join(project.path,str(filename))
+                if path not in found:
+                    found.add(path)
+                    ret.append((project,path))
+        return ret
+
+    def load(self,
+        projects:typing.Iterable['tin.Tin'],
+        kinds:typing.Iterable[str]=tin.FIELDS
+        )->int:
+        """
+        Load the tin files of the given kinds for all projects
+
+        :return: the number of files loaded
+        """
+        jobs=self._jobs(projects,kinds)
+        total=len(jobs)
+        done=0
+        # read everything with threads
+        toParse:typing.List[typing.Tuple['tin.Tin',str,str]]=[]
+        with concurrent.futures.ThreadPoolExecutor(self.threads) as pool:
+            futures={pool.submit(project.cache.get,path):(project,path)
+                for project,path in jobs}
+            for future in concurrent.futures.as_completed(futures):
+                project,path=futures[future]
+                text=future.result()
+                if text is None or project.cache.hasView(
+                    path,project.documentView(path)):
+                    # nothing to do, or already parsed
+                    done+=1
+                    if self.progress is not None:
+                        self.progress(done,total)
+                    continue
+                toParse.append((project,path,text))
+        # then parse with processes
+        def fileFormat(path:str)->str:
+            return path.rsplit('.',1)[-1].lower()
+        def finished(project:'tin.Tin',path:str,text:str,
+            compact:typing.Tuple[typing.Any,...])->None:
+            def create(current:str)->'tin.TinDocument':
+                if current!=text:
+                    # the file changed since it was read
+                    return tin.parseTin(current,fileFormat(path))
+                return tin.TinDocument.fromCompact(text,compact)
+            project.cache.getView(path,project.documentView(path),create,
+                lambda doc:doc.approximateSize)
+        if self.processes==0 or len(toParse)<=PARSE_CHUNK_SIZE:
+            for project,path,text in toParse:
+                finished(project,path,text,
+                    tin.parseTin(text,fileFormat(path)).compact())
+                done+=1
+                if self.progress is not None:
+                    self.progress(done,total)
+            return total
+        batches=[toParse[i:i+PARSE_CHUNK_SIZE]
+            for i in range(0,len(toParse),PARSE_CHUNK_SIZE)]
+        with concurrent.futures.ProcessPoolExecutor(self.processes) as pool:
+            parseFutures={pool.submit(_parseCompact,
+                [(text,fileFormat(path)) for _,path,text in batch]):batch
+                for batch in batches}
+            for future in concurrent.futures.as_completed(parseFutures):
+                batch=parseFutures[future]
+                for (project,path,text),compact in zip(batch,future.result()):
+                    finished(project,path,text,compact)
+                    done+=1
+                if self.progress is not None:
+                    self.progress(done,total)
+        return total
@@ -0,0 +1,344 @@
+"""
+A shared, size-bounded cache of file contents (and things
+derived from them) that notices when files change.
+
+Given some Fingerprints, files with the same contents (copies, or
+links to the same file) share a single entry, so they are only kept
+and parsed once.
+"""
+import typing
+import os
+import sys
+import threading
+import collections
+from paths import URLCompatible
+import tin
+
+
+# the default ceiling for ContentCache.maxBytes
+DEFAULT_MAX_BYTES=64*1024*1024
+
+# what entries are kept under
+# (a filename, or a fingerprint when the cache has Fingerprints)
+CacheKey=typing.Union[str,bytes]
+
+
+class _CacheEntry:
+    """
+    The cached contents of a single file
+    """
+    __slots__=('key','stamp','text','size','views','previousViews')
+
+    def __init__(self,
+        key:CacheKey,
+        stamp:typing.Optional[typing.Tuple[int,int]],
+        text:str):
+        """
+        :param stamp: (mtime,size) or None if the key is a fingerprint
+            (since that cannot go out of date)
+        """
+        self.key:CacheKey=key
+        self.stamp:typing.Optional[typing.Tuple[int,int]]=stamp
+        self.text:str=text
+        self.size:int=sys.getsizeof(text)
+        # {viewName:(view,size)}
+        self.views:typing.Dict[str,typing.Tuple[typing.Any,int]]={}
+        # views of the previous version of the file, kept until
+        # they have had a chance to be updated rather than recreated
+        self.previousViews:typing.Dict[str,typing.Tuple[typing.Any,int]]={}
+
+
+class ContentCache:
+    """
+    A least-recently-used cache of file contents, limited to maxBytes.
+
+    Every entry is checked against the file's (mtime,size) when it is
+    used, so edits are always noticed.  Views derived from the contents
+    (eg, parsed versions) are kept in the same entry, so they go
+    away along with it.
+
+    With fingerprints, entries are kept by content rather than by
+    filename, and a file is only read again when its (dev,inode,
+    size,mtime) changes.
+    """
+
+    def __init__(self,
+        maxBytes:int=DEFAULT_MAX_BYTES,
+        fingerprints:typing.Optional['tin.Fingerprints']=None):
+        """
+        :param fingerprints: share entries between files with the
+            same contents (default=keep every file separately)
+        """
+        self._maxBytes:int=maxBytes
+        self._fingerprints:typing.Optional['tin.Fingerprints']=fingerprints
+        self._entries:typing.OrderedDict[CacheKey,_CacheEntry]= \
+            collections.OrderedDict()
+        self._lock=threading.RLock()
+        self.currentBytes:int=0
+        self.hits:int=0
+        self.misses:int=0
+        self.evictions:int=0
+        # files that turned out to have the same contents as another
+        self.shared:int=0
+
+    @property
+    def maxBytes(self)->int:
+        """
+        The most memory the cache is allowed to use
+        """
+        return self._maxBytes
+    @maxBytes.setter
+    def maxBytes(self,maxBytes:int):
+        with self._lock:
+            self._maxBytes=maxBytes
+            self._evict()
+
+    @property
+    def fingerprints(self)->typing.Optional['tin.Fingerprints']:
+        """
+        What recognises files with the same contents
+        (None to keep every file separately)
+
+        NOTE: changing this empties the cache
+        """
+        return self._fingerprints
+    @fingerprints.setter
+    def fingerprints(self,fingerprints:typing.Optional['tin.Fingerprints']):
+        with self._lock:
+            self._fingerprints=fingerprints
+            self.clear()
+
+    @property
+    def stats(self)->typing.Dict[str,int]:
+        """
+        Counters describing how well the cache is working
+        """
+        return {
+            'hits':self.hits,
+            'misses':self.misses,
+            'evictions':self.evictions,
+            'shared':self.shared,
+            'entries':len(self._entries),
+            'currentBytes':self.currentBytes,
+            'maxBytes':self._maxBytes}
+
+    @staticmethod
+    def _stamp(filename:str)->typing.Optional[typing.Tuple[int,int]]:
+        """
+        :return: (mtime,size) or None if the file is not there
+        """
+        stats=tin.activeStats()
+        if stats is not None:
+            stats.count('stats')
+        try:
+            st=os.stat(filename)
+        except OSError:
+            return None
+        return (st.st_mtime_ns,st.st_size)
+
+    def _evict(self)->None:
+        """
+        Drop least recently used entries until we are under maxBytes
+        """
+        while self.currentBytes>self._maxBytes and self._entries:
+            _,entry=self._entries.popitem(last=False)
+            self.currentBytes-=entry.size
+            self.evictions+=1
+
+    def _entry(self,filename:str)->typing.Optional[_CacheEntry]:
+        """
+        Get an up to date entry, loading the file if necessary
+        """
+        if self._fingerprints is not None:
+            return self._sharedEntry(filename,self._fingerprints)
+        stamp=self._stamp(filename)
+        previousViews:typing.Dict[str,typing.Tuple[typing.Any,int]]={}
+        with self._lock:
+            entry=self._entries.get(filename)
+            if entry is not None:
+                if entry.stamp==stamp:
+                    self.hits+=1
+                    self._entries.move_to_end(filename)
+                    return entry
+                previousViews=entry.views
+                self._remove(filename)
+            self.misses+=1
+        if stamp is None:
+            return None
+        text=tin.readText(filename)
+        if text is None:
+            return None
+        entry=_CacheEntry(filename,stamp,text)
+        self._add(entry,previousViews)
+        return entry
+
+    def _sharedEntry(self,
+        filename:str,
+        fingerprints:'tin.Fingerprints'
+        )->typing.Optional[_CacheEntry]:
+        """
+        Get an up to date entry, kept by fingerprint, loading the file
+        only if this version of it has not been seen before
+        """
+        key=tin.fileKey(filename)
+        if key is None:
+            fingerprints.forget(filename)
+            return None
+        digest=fingerprints.known(key)
+        if digest is not None:
+            with self._lock:
+                entry=self._entries.get(digest)
+                if entry is not None:
+                    self.hits+=1
+                    self._entries.move_to_end(digest)
+                    fingerprints.note(filename,key,digest)
+                    return entry
+        with self._lock:
+            self.misses+=1
+        data=tin.readData(filename)
+        if data is None:
+            fingerprints.forget(filename)
+            return None
+        digest,previousDigest=fingerprints.add(filename,key,data)
+        previousViews:typing.Dict[str,typing.Tuple[typing.Any,int]]={}
+        with self._lock:
+            entry=self._entries.get(digest)
+            if entry is not None:
+                # a copy of something already here
+                self.shared+=1
+                self._entries.move_to_end(digest)
+                return entry
+            if previousDigest is not None:
+                previous=self._entries.get(previousDigest)
+                if previous is not None:
+                    # (other files may still use them, so copy, not take)
+                    previousViews=dict(previous.views)
+        entry=_CacheEntry(digest,None,tin.decodeText(data))
+        self._add(entry,previousViews)
+        return entry
+
+    def _add(self,
+        entry:_CacheEntry,
+        previousViews:typing.Dict[str,typing.Tuple[typing.Any,int]]
+        )->None:
+        """
+        Keep a newly loaded entry (if it fits)
+        """
+        entry.previousViews=previousViews
+        entry.size+=sum([size for _,size in previousViews.values()])
+        with self._lock:
+            if entry.size<=self._maxBytes:
+                self._remove(entry.key)
+                self._entries[entry.key]=entry
+                self.currentBytes+=entry.size
+                self._evict()
+
+    def _remove(self,key:CacheKey)->None:
+        entry=self._entries.pop(key,None)
+        if entry is not None:
+            self.currentBytes-=entry.size
+
+    def get(self,filename:URLCompatible)->typing.Optional[str]:
+        """
+        Get the contents of a file
+
+        :return: None if the file cannot be read
+        """
+        entry=self._entry(str(filename))
+        if entry is None:
+            return None
+        return entry.text
+
+    def getView(self,
+        filename:URLCompatible,
+        viewName:str,
+        create:typing.Callable[[str],typing.Any],
+        sizeOf:typing.Optional[typing.Callable[[typing.Any],int]]=None,
+        update:typing.Optional[
+            typing.Callable[[typing.Any,str],typing.Any]]=None
+        )->typing.Any:
+        """
+        Get something derived from the contents of a file,
+        creating it with create(contents) if necessary
+
+        :param viewName: a name that identifies what create() does
+        :param sizeOf: how big the view is in bytes
+            (if None, it is assumed to be as big as the contents)
+        :param update: if the file changed since the view was last
+            created, update(oldView,contents) is used instead of create()
+            (eg, to re-parse only what changed)
+        :return: None if the file cannot be read
+        """
+        filename=str(filename)
+        entry=self._entry(filename)
+        if entry is None:
+            return None
+        with self._lock:
+            existing=entry.views.get(viewName)
+            previous=entry.previousViews.pop(viewName,None)
+            if previous is not None:
+                entry.size-=previous[1]
+                if self._entries.get(entry.key) is entry:
+                    self.currentBytes-=previous[1]
+        if existing is not None:
+            return existing[0]
+        if previous is not None and update is not None:
+            view=update(previous[0],entry.text)
+        else:
+            view=create(entry.text)
+        textSize=sys.getsizeof(entry.text)
+        size=textSize if sizeOf is None else sizeOf(view)
+        with self._lock:
+            if self._entries.get(entry.key) is entry:
+                entry.views[viewName]=(view,size)
+                entry.size+=size
+                self.currentBytes+=size
+                self._evict()
+        return view
+
+    def hasView(self,filename:URLCompatible,viewName:str)->bool:
+        """
+        Whether an up to date view is already cached
+        (does not count as a hit or miss)
+        """
+        filename=str(filename)
+        fingerprints=self._fingerprints
+        if fingerprints is not None:
+            key=tin.fileKey(filename)
+            digest=None if key is None else fingerprints.known(key)
+            if digest is None:
+                return False
+            with self._lock:
+                entry=self._entries.get(digest)
+                return entry is not None and viewName in entry.views
+        stamp=self._stamp(filename)
+        with self._lock:
+            entry=self._entries.get(filename)
+            return entry is not None and entry.stamp==stamp \
+                and viewName in entry.views
+
+    def invalidate(self,filename:URLCompatible)->None:
+        """
+        Forget a single file
+
+        (with fingerprints, this also forgets any copies of it)
+        """
+        with self._lock:
+            if self._fingerprints is not None:
+                digest=self._fingerprints.forget(filename)
+                if digest is not None:
+                    self._remove(digest)
+            else:
+                self._remove(str(filename))
+
+    def clear(self)->None:
+        """
+        Forget everything
+        """
+        with self._lock:
+            self._entries.clear()
+            self.currentBytes=0
+
+
+# shared by all Tin objects
+DEFAULT_CONTENT_CACHE=ContentCache()
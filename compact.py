@@ -0,0 +1,331 @@
+"""
+Compact storage for large numbers of scan results
+
+Each path is kept as (parent id,name) in a PathTable, so a directory
+name is only stored once however many paths go through it, and the
+names in listings are interned so that (eg) every "todo.txt" is the
+same string.  URL objects are only made when something asks for one.
+"""
+import typing
+import os
+import sys
+import array
+from paths import URLCompatible, URL, asURL
+
+
+class PathTable:
+    """
+    Interned paths, as a tree of (parent id,name)
+    """
+    __slots__=('_parents','_names','_children')
+
+    def __init__(self):
+        self._parents:array.array=array.array('q')
+        self._names:typing.List[str]=[]
+        # {parent id:{name:id}} where the top has a parent id of -1
+        # (most paths are never a parent, so they cost nothing here)
+        self._children:typing.Optional[
+            typing.Dict[int,typing.Dict[str,int]]]={}
+
+    @classmethod
+    def fromArrays(cls,
+        parents:array.array,
+        names:typing.List[str]
+        )->'PathTable':
+        """
+        Make a table from what was saved (eg, in a snapshot)
+
+        NOTE: the lookup of children is only rebuilt if something
+            needs it, since just turning ids into paths does not
+
+        :param parents: the parent id of each path ('q' array)
+        :param names: the name of each path
+        """
+        ret=cls.__new__(cls)
+        ret._parents=parents
+        ret._names=names
+        ret._children=None
+        return ret
+
+    def _childMap(self)->typing.Dict[int,typing.Dict[str,int]]:
+        """
+        The {parent id:{name:id}} lookup (rebuilt if need be)
+        """
+        children=self._children
+        if children is None:
+            children={}
+            for i,(parent,name) in enumerate(zip(self._parents,self._names)):
+                ids=children.get(parent)
+                if ids is None:
+                    ids={}
+                    children[parent]=ids
+                ids[name]=i
+            self._children=children
+        return children
+
+    def add(self,path:str)->int:
+        """
+        Add a path (if it is not already here)
+
+        :return: its id
+        """
+        parent=-1
+        children=self._childMap()
+        for name in path.split(os.sep):
+            ids=children.get(parent)
+            if ids is None:
+                ids={}
+                children[parent]=ids
+            found=ids.get(name)
+            if found is None:
+                name=sys.intern(name)
+                found=len(self._names)
+                self._parents.append(parent)
+                self._names.append(name)
+                ids[name]=found
+            parent=found
+        return parent
+
+    def find(self,path:str)->typing.Optional[int]:
+        """
+        The id of a path
+
+        :return: None if it has never been added
+        """
+        parent=-1
+        children=self._childMap()
+        for name in path.split(os.sep):
+            ids=children.get(parent)
+            if ids is None:
+                return None
+            found=ids.get(name)
+            if found is None:
+                return None
+            parent=found
+        return parent
+
+    def path(self,pathId:int)->str:
+        """
+        The path with a given id
+        """
+        names:typing.List[str]=[]
+        parents=self._parents
+        while pathId>=0:
+            names.append(self._names[pathId])
+            pathId=parents[pathId]
+        names.reverse()
+        return os.sep.join(names)
+
+    def name(self,pathId:int)->str:
+        """
+        The last part of the path with a given id
+        """
+        return self._names[pathId]
+
+    def __len__(self)->int:
+        return len(self._names)
+
+
+class PackedListings(typing.Sequence[typing.Tuple[str,...]]):
+    """
+    Listings kept as one flat array of indexes into a table of names,
+    which are only made into tuples as they are asked for
+    """
+
+    def __init__(self,
+        offsets:array.array,
+        flat:array.array,
+        names:typing.Callable[[],typing.List[str]]):
+        """
+        :param offsets: where each listing starts in flat
+            (plus where the last one ends)
+        :param flat: indexes into the names
+        :param names: gets the table of names (only called when the
+            first listing is asked for)
+        """
+        self._offsets:array.array=offsets
+        self._flat:array.array=flat
+        self._getNames:typing.Callable[[],typing.List[str]]=names
+        self._names:typing.Optional[typing.List[str]]=None
+        # any appended afterwards
+        self._more:typing.List[typing.Optional[typing.Tuple[str,...]]]=[]
+
+    def append(self,listing:typing.Optional[typing.Tuple[str,...]])->None:
+        """
+        Add another listing
+        """
+        self._more.append(listing)
+
+    def __getitem__(self,idx):
+        if isinstance(idx,slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        count=len(self._offsets)-1
+        if idx<0:
+            idx+=len(self)
+        if idx>=count:
+            return self._more[idx-count]
+        names=self._names
+        if names is None:
+            names=self._getNames()
+            self._names=names
+        flat=self._flat
+        return tuple([names[flat[i]]
+            for i in range(self._offsets[idx],self._offsets[idx+1])])
+
+    def __len__(self)->int:
+        return len(self._offsets)-1+len(self._more)
+
+
+class CompactResults(typing.Sequence[URL]):
+    """
+    A list of result directories (and the listing each was found with)
+    that only makes URL objects as they are asked for
+    """
+
+    def __init__(self,table:typing.Optional[PathTable]=None):
+        """
+        :param table: where to keep the paths
+            (can be shared, eg, by results of searches of the same tree)
+        """
+        if table is None:
+            table=PathTable()
+        self.table:PathTable=table
+        self._ids:array.array=array.array('q')
+        # names of the children of each result (or None if not kept)
+        self._listings:typing.Union[
+            typing.List[typing.Optional[typing.Tuple[str,...]]],
+            PackedListings]=[]
+        # {path id:index} only made if listing() is used
+        self._indices:typing.Optional[typing.Dict[int,int]]=None
+        # the mtime (in ns) of each result when its listing was taken,
+        # where the listings may be out of date (eg, from a snapshot),
+        # with 0 where it is not known
+        self.listingMtimes:typing.Optional[array.array]=None
+
+    @classmethod
+    def fromArrays(cls,
+        table:PathTable,
+        ids:array.array,
+        listings:typing.Union[
+            typing.List[typing.Optional[typing.Tuple[str,...]]],
+            PackedListings]
+        )->'CompactResults':
+        """
+        Make results from what was saved (eg, in a snapshot)
+
+        :param ids: the path id of each result ('q' array)
+        :param listings: the listing of each result
+        """
+        ret=cls(table)
+        ret._ids=ids
+        ret._listings=listings
+        return ret
+
+    def append(self,
+        directory:URLCompatible,
+        names:typing.Optional[typing.Iterable[str]]=None
+        )->None:
+        """
+        Add a result
+
+        :param names: the names of its children, if they are to be kept
+        """
+        pathId=self.table.add(str(directory))
+        if self._indices is not None:
+            self._indices[pathId]=len(self._ids)
+        self._ids.append(pathId)
+        if names is None:
+            self._listings.append(None)
+        else:
+            intern=sys.intern
+            self._listings.append(tuple([intern(n) for n in names]))
+
+    def path(self,idx:int)->str:
+        """
+        A result as a plain path (without making a URL)
+        """
+        return self.table.path(self._ids[idx])
+
+    def name(self,idx:int)->str:
+        """
+        The last part of a result's path
+        """
+        return self.table.name(self._ids[idx])
+
+    def names(self)->typing.List[str]:
+        """
+        The last part of every result's path
+        """
+        return list(map(self.table._names.__getitem__,self._ids))
+
+    def paths(self)->typing.Generator[str,None,None]:
+        """
+        All of the results as plain paths
+        """
+        path=self.table.path
+        for pathId in self._ids:
+            yield path(pathId)
+
+    def listingAt(self,idx:int)->typing.Optional[typing.Tuple[str,...]]:
+        """
+        The names of the children of a result, as of when it was found
+        """
+        return self._listings[idx]
+
+    def listingMtime(self,idx:int)->typing.Optional[int]:
+        """
+        The mtime of a result when its listing was taken
+
+        :return: None if the listing was taken just now (by a scan),
+            or 0 if it is not known how old it is
+        """
+        mtimes=self.listingMtimes
+        if mtimes is None:
+            return None
+        if idx<len(mtimes):
+            return mtimes[idx]
+        return None
+
+    def listing(self,
+        directory:URLCompatible
+        )->typing.Optional[typing.List[str]]:
+        """
+        The names of the children of a result directory,
+        as of when it was found
+
+        :return: None if it is not known
+        """
+        pathId=self.table.find(str(directory))
+        if pathId is None:
+            return None
+        indices=self._indices
+        if indices is None:
+            indices={p:i for i,p in enumerate(self._ids)}
+            self._indices=indices
+        idx=indices.get(pathId)
+        if idx is None:
+            return None
+        names=self._listings[idx]
+        if names is None:
+            return None
+        return list(names)
+
+    @typing.overload
+    def __getitem__(self,idx:int)->URL:
+        ...
+    @typing.overload
+    def __getitem__(self,idx:slice)->typing.List[URL]:
+        ...
+    def __getitem__(self,idx):
+        if isinstance(idx,slice):
+            path=self.table.path
+            return [asURL(path(pathId)) for pathId in self._ids[idx]]
+        return asURL(self.table.path(self._ids[idx]))
+
+    def __iter__(self)->typing.Iterator[URL]:
+        path=self.table.path
+        for pathId in self._ids:
+            yield asURL(path(pathId))
+
+    def __len__(self)->int:
+        return len(self._ids)
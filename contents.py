@@ -0,0 +1,129 @@
+"""
+Match against the contents of files without loading
+the whole file into memory
+"""
+import typing
+import codecs
+from paths import URLCompatible
+import tin
+from tin import MatchBase
+
+
+DEFAULT_CHUNK_SIZE=64*1024
+# how much of the previous chunk to keep when the matcher
+# cannot say how long its matches could be
+DEFAULT_OVERLAP=1024
+
+
+def readData(filename:URLCompatible,
+    byteBudget:typing.Optional[int]=None
+    )->typing.Optional[bytes]:
+    """
+    Read the raw bytes of a file
+
+    :param byteBudget: read no more than this many bytes
+    :return: None if the file cannot be read
+    """
+    try:
+        with open(str(filename),'rb') as f:
+            if byteBudget is None:
+                data=f.read()
+            else:
+                data=f.read(byteBudget)
+    except OSError:
+        return None
+    stats=tin.activeStats()
+    if stats is not None:
+        stats.count('filesOpened')
+        stats.count('bytesRead',len(data))
+    return data
+
+
+def decodeText(data:bytes)->str:
+    """
+    Decode utf-8 text, replacing anything that is not valid
+    """
+    return data.decode('utf-8',errors='replace')
+
+
+def readText(filename:URLCompatible,
+    byteBudget:typing.Optional[int]=None
+    )->typing.Optional[str]:
+    """
+    Read a file as utf-8 text, replacing anything that is not valid
+
+    :param byteBudget: read no more than this many bytes
+    :return: None if the file cannot be read
+    """
+    data=readData(filename,byteBudget)
+    if data is None:
+        return None
+    return decodeText(data)
+
+
+def contentsMatch(filename:URLCompatible,
+    matcher:MatchBase,
+    byteBudget:typing.Optional[int]=None,
+    chunkSize:int=DEFAULT_CHUNK_SIZE
+    )->bool:
+    """
+    Check to see if anything in a file's contents matches
+    (using matcher.search())
+
+    If the matcher is streamable, the file is read in overlapping
+    chunks, stopping as soon as there is a hit.  Otherwise, it is
+    read in one go.  Either way, invalid utf-8 is tolerated.
+
+    NOTE: when streaming a matcher that does not know its
+        maxMatchLength (eg, a regex), a match spanning two chunks is
+        only found if it is no longer than DEFAULT_OVERLAP.  Also, ^ and
+        \\A will match at the start of every chunk.
+
+    :param byteBudget: look at no more than this many bytes of the file,
+        so a huge file cannot stall a scan
+    :param chunkSize: how many bytes to read at a time
+    """
+    if not matcher.streamable:
+        data=readText(filename,byteBudget)
+        return data is not None and matcher.search(data)
+    overlap=matcher.maxMatchLength
+    if overlap is None:
+        overlap=DEFAULT_OVERLAP
+    else:
+        overlap=max(0,overlap-1)
+    search=matcher.search
+    decoder=codecs.getincrementaldecoder('utf-8')(errors='replace')
+    tail=''
+    remaining=byteBudget
+    opened=False
+    bytesRead=0
+    try:
+        with open(str(filename),'rb') as f:
+            opened=True
+            while True:
+                size=chunkSize
+                if remaining is not None:
+                    if remaining<=0:
+                        break
+                    size=min(size,remaining)
+                chunk=f.read(size)
+                bytesRead+=len(chunk)
+                if remaining is not None:
+                    remaining-=len(chunk)
+                final=not chunk
+                text=decoder.decode(chunk,final)
+                if text:
+                    window=tail+text
+                    if search(window):
+                        return True
+                    tail=window[-overlap:] if overlap else ''
+                if final:
+                    break
+    except OSError:
+        return False
+    finally:
+        stats=tin.activeStats()
+        if stats is not None and opened:
+            stats.count('filesOpened')
+            stats.count('bytesRead',bytesRead)
+    return False
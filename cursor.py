@@ -0,0 +1,212 @@
+"""
+Iterative scanning in a chosen order, within budgets, and able
+to carry on later from where it stopped
+
+eg, to get whatever can be found in a tenth of a second, most
+recently modified directories first:
+    cursor=ds.scanCursor(SCAN_RECENT,matching='todo.txt')
+    found=list(cursor.scan(maxSeconds=0.1))
+    ...
+    found.extend(cursor.scan(maxSeconds=0.1)) # carry on
+"""
+import typing
+import os
+import time
+import heapq
+import collections
+from paths import URL, asURL
+if typing.TYPE_CHECKING:
+    from tin import DirectoriesSet,IsMatchParam
+
+
+# orders to scan in
+SCAN_BFS='bfs' # breadth first (shallowest first)
+SCAN_DFS='dfs' # depth first (the same order as DirectoriesSet.walk)
+SCAN_RECENT='recent' # most recently modified first
+SCAN_ORDERS=(SCAN_BFS,SCAN_DFS,SCAN_RECENT)
+
+# why a scan() stopped
+STOP_COMPLETE='complete'
+STOP_DIRECTORIES='directories'
+STOP_TIME='time'
+# everything that could be scanned was, apart from what is beyond maxDepth
+STOP_DEPTH='depth'
+
+# given a directory, lower numbers are scanned first
+ScanPriority=typing.Callable[[str],float]
+
+
+def recentFirst(directory:str)->float:
+    """
+    Priority for scanning the most recently modified directories first
+    """
+    try:
+        return -os.stat(directory).st_mtime
+    except OSError:
+        return 0.0
+
+
+class ScanCursor:
+    """
+    A scan that can be run a piece at a time
+
+    Nothing is recursive, so there is no limit to how deep
+    the directories can go.
+    """
+
+    def __init__(self,
+        directoriesSet:'DirectoriesSet',
+        order:str=SCAN_BFS,
+        priority:typing.Optional[ScanPriority]=None,
+        matching:typing.Optional['IsMatchParam']=None):
+        """
+        :param order: SCAN_BFS, SCAN_DFS or SCAN_RECENT
+            (ignored if there is a priority)
+        :param priority: given a directory, lower numbers are
+            scanned first (NOTE: this is called once per directory)
+        :param matching: only yield directories that match this
+            (the same as directoriesContaining()), or None for all
+        """
+        if order not in SCAN_ORDERS:
+            raise Exception('unknown scan order "%s"'%order)
+        if priority is None and order==SCAN_RECENT:
+            priority=recentFirst
+        self.directoriesSet:'DirectoriesSet'=directoriesSet
+        self.order:str=order
+        self.priority:typing.Optional[ScanPriority]=priority
+        self._cleanMatches:typing.Optional[typing.List[typing.Any]]=None
+        if matching is not None:
+            self._cleanMatches=directoriesSet._cleanMatches(matching)
+        # directories to scan as (path,depth)
+        self._queue:typing.Deque[typing.Tuple[str,int]]=collections.deque()
+        self._stack:typing.List[typing.Tuple[str,int]]=[]
+        self._heap:typing.List[typing.Tuple[float,int,str,int]]=[]
+        self._pushed=0
+        # found, but deeper than the maxDepth of an earlier scan()
+        self._tooDeep:typing.List[typing.Tuple[str,int]]=[]
+        # not recursive, so done at the very end (in case recursion
+        # gets to them first)
+        self._simple:typing.List[str]=[]
+        self._visited:typing.Set[str]=set()
+        self.scanned:int=0
+        self.stopReason:typing.Optional[str]=None
+        directoriesSet.reloadIgnoreRules()
+        self._pushChildren([os.path.abspath(d)
+            for d in directoriesSet._recursiveDirectories],0)
+        for d in directoriesSet._directories:
+            if d not in directoriesSet.ignore:
+                self._simple.append(os.path.abspath(d))
+        self._simple.reverse()
+
+    def _push(self,path:str,depth:int)->None:
+        if self.priority is not None:
+            self._pushed+=1
+            heapq.heappush(self._heap,
+                (self.priority(path),self._pushed,path,depth))
+        elif self.order==SCAN_DFS:
+            self._stack.append((path,depth))
+        else:
+            self._queue.append((path,depth))
+
+    def _pushChildren(self,subdirs:typing.List[str],depth:int)->None:
+        if self.priority is None and self.order==SCAN_DFS:
+            # so that the first one comes off the stack first
+            subdirs=subdirs[::-1]
+        for d in subdirs:
+            self._push(d,depth)
+
+    def _pop(self)->typing.Optional[typing.Tuple[str,int]]:
+        if self._heap:
+            _,_,path,depth=heapq.heappop(self._heap)
+            return path,depth
+        if self._stack:
+            return self._stack.pop()
+        if self._queue:
+            return self._queue.popleft()
+        return None
+
+    @property
+    def pending(self)->int:
+        """
+        How many directories are known about but not scanned yet
+        (the number still to come is likely more)
+        """
+        return len(self._heap)+len(self._stack)+len(self._queue) \
+            +len(self._tooDeep)+len(self._simple)
+
+    @property
+    def done(self)->bool:
+        """
+        Whether everything has been scanned
+        """
+        return self.pending==0
+
+    def scan(self,
+        maxDirectories:typing.Optional[int]=None,
+        maxSeconds:typing.Optional[float]=None,
+        maxDepth:typing.Optional[int]=None
+        )->typing.Generator[typing.Tuple[URL,typing.List[str]],None,None]:
+        """
+        Carry on scanning until finished or out of budget,
+        yielding (directory,names of its children)
+
+        Afterwards, stopReason says why it stopped, and calling
+        scan() again continues from there.
+
+        :param maxDirectories: list no more than this many directories
+        :param maxSeconds: stop after this long (including time spent
+            by the caller between results)
+        :param maxDepth: do not go more than this many levels below
+            the starting directories (the rest are kept for a later
+            scan() with a bigger maxDepth)
+        """
+        ds=self.directoriesSet
+        cleanMatches=self._cleanMatches
+        deadline:typing.Optional[float]=None
+        if maxSeconds is not None:
+            deadline=time.monotonic()+maxSeconds
+        if self._tooDeep:
+            # things that were too deep before might not be now
+            tooDeep=self._tooDeep
+            self._tooDeep=[]
+            for path,depth in tooDeep:
+                if maxDepth is None or depth<=maxDepth:
+                    self._push(path,depth)
+                else:
+                    self._tooDeep.append((path,depth))
+        count=0
+        self.stopReason=None
+        while True:
+            if maxDirectories is not None and count>=maxDirectories:
+                self.stopReason=STOP_DIRECTORIES
+                return
+            if deadline is not None and time.monotonic()>=deadline:
+                self.stopReason=STOP_TIME
+                return
+            recursive=True
+            item=self._pop()
+            if item is None:
+                if not self._simple:
+                    if self._tooDeep:
+                        self.stopReason=STOP_DEPTH
+                    else:
+                        self.stopReason=STOP_COMPLETE
+                    return
+                item=(self._simple.pop(),0)
+                recursive=False
+            path,depth=item
+            if path in self._visited:
+                continue
+            self._visited.add(path)
+            names,subdirs=ds._scanDirectory(path)
+            count+=1
+            self.scanned+=1
+            if recursive and subdirs:
+                if maxDepth is not None and depth>=maxDepth:
+                    self._tooDeep.extend([(d,depth+1) for d in subdirs])
+                else:
+                    self._pushChildren(subdirs,depth+1)
+            url=asURL(path)
+            if cleanMatches is None \
+                or ds._checkDirectory(url,cleanMatches,names):
+                yield url,names
@@ -0,0 +1,376 @@
+"""
+A long-running process that keeps a TinFinder (and its caches) warm
+and answers queries over a unix domain socket, so that the command
+line does not have to rescan everything every time it runs.
+
+The protocol is one json object per line in each direction:
+    request:  {"cmd":"all"} (plus any arguments the command takes)
+    reply:    {"ok":true,"result":...} or {"ok":false,"error":"..."}
+
+Commands:
+    ping                        the daemon's process id
+    all                         the text of every project (like --all)
+    summary                     a table of project summaries (like --summary)
+    projects                    project names
+    editFilename project,tin    the file to edit for a project
+    search query                names of projects matching a query
+    reload                      rescan, returning the number of projects
+    shutdown                    stop the daemon
+"""
+import typing
+import os
+import json
+import stat
+import socket
+import threading
+import tin
+if typing.TYPE_CHECKING:
+    import socketserver
+
+
+# how long the client waits for a reply
+DEFAULT_CLIENT_TIMEOUT=10.0
+
+# commands a client can use on its own (anything else means the
+# command line has to run in-process)
+CLIENT_OPTIONS=('--all','--summary','--edit','--search','--socket')
+
+
+def defaultSocketPath()->str:
+    """
+    Where the daemon listens unless told otherwise
+    (one per user)
+
+    NOTE: without XDG_RUNTIME_DIR, this is in a directory of its own
+    in the temp directory that only the user can get into, since
+    anyone can create files in the temp directory itself
+    """
+    import tempfile
+    import getpass
+    user=getpass.getuser()
+    directory=os.environ.get('XDG_RUNTIME_DIR')
+    if directory:
+        return os.path.join(directory,'tin-%s.sock'%user)
+    directory=os.path.join(tempfile.gettempdir(),'tin-%s'%user)
+    try:
+        os.mkdir(directory,0o700)
+    except FileExistsError:
+        pass
+    if hasattr(os,'getuid'):
+        st=os.lstat(directory)
+        if not stat.S_ISDIR(st.st_mode) or st.st_uid!=os.getuid() \
+            or st.st_mode&0o077:
+            raise Exception('"%s" is not a private directory'%directory)
+    return os.path.join(directory,'tin.sock')
+
+
+def _checkOwner(socketPath:str)->None:
+    """
+    Make sure a socket belongs to the current user, so that someone
+    else cannot pretend to be the daemon (eg, by getting to the
+    socket's name first)
+
+    :raises Exception: if it belongs to someone else
+    """
+    if not hasattr(os,'getuid'):
+        return
+    try:
+        st=os.lstat(socketPath)
+    except OSError:
+        return
+    if st.st_uid!=os.getuid():
+        raise Exception('"%s" belongs to another user'%socketPath)
+
+
+def _makeServer(socketPath:str,
+    daemon:'TinDaemon'
+    )->'socketserver.UnixStreamServer':
+    """
+    Create the socket server
+
+    (socketserver is only imported here, since clients never need it)
+    """
+    import socketserver
+
+    class RequestHandler(socketserver.StreamRequestHandler):
+        """
+        Answers every request line on a connection
+        """
+
+        def handle(self):
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+                try:
+                    request=json.loads(line.decode('utf-8'))
+                    reply={'ok':True,'result':daemon.handle(request)}
+                except Exception as e:
+                    reply={'ok':False,'error':str(e)}
+                self.wfile.write(json.dumps(reply).encode('utf-8')+b'\n')
+                self.wfile.flush()
+                if reply['ok'] and request.get('cmd')=='shutdown':
+                    break
+
+    class Server(socketserver.ThreadingMixIn,socketserver.UnixStreamServer):
+        daemon_threads=True
+
+    return Server(socketPath,RequestHandler)
+
+
+class TinDaemon:
+    """
+    Serves a TinFinder over a unix domain socket
+    """
+
+    def __init__(self,
+        finder:'tin.TinFinder',
+        socketPath:typing.Optional[str]=None,
+        watch:bool=True):
+        """
+        :param finder: what to serve (already configured)
+        :param socketPath: where to listen (default=defaultSocketPath())
+        :param watch: keep the projects up to date with a tin.Watcher
+            rather than rescanning
+        """
+        if socketPath is None:
+            socketPath=defaultSocketPath()
+        self.finder:tin.TinFinder=finder
+        self.socketPath:str=socketPath
+        self.useWatcher:bool=watch
+        self._watcher:typing.Optional[tin.Watcher]=None
+        self._server:typing.Optional['socketserver.UnixStreamServer']=None
+        self._thread:typing.Optional[threading.Thread]=None
+        # the finder is not built for concurrent use, so one at a time
+        self._lock=threading.Lock()
+
+    def handle(self,request:typing.Dict[str,typing.Any])->typing.Any:
+        """
+        Carry out a single request
+
+        :return: the result to send back
+        """
+        cmd=request.get('cmd')
+        with self._lock:
+            finder=self.finder
+            if cmd=='ping':
+                return os.getpid()
+            if cmd=='all':
+                return str(finder)
+            if cmd=='summary':
+                return tin.summaryTable(finder.updateSummaries())
+            if cmd=='projects':
+                return sorted(finder.projects.keys())
+            if cmd=='editFilename':
+                project=finder.projects.get(request.get('project',''))
+                if project is None:
+                    raise Exception('No project by that name')
+                return project.editFilename(request.get('tin','todo'))
+            if cmd=='search':
+                return [p.name for p in finder.search(request.get('query',''))]
+            if cmd=='reload':
+                return len(finder.reload())
+            if cmd=='shutdown':
+                threading.Thread(target=self.stop,daemon=True).start()
+                return True
+        raise Exception('unknown command "%s"'%cmd)
+
+    def warm(self)->None:
+        """
+        Load everything once, so the first query is as quick as the rest
+        """
+        with self._lock:
+            if self.useWatcher and self._watcher is None:
+                self._watcher=self.finder.watch()
+            str(self.finder)
+
+    def _checkNotRunning(self)->None:
+        """
+        Make sure no other daemon is using the socket, and remove it
+        if it was left behind by one that is no longer running
+        """
+        if not os.path.exists(self.socketPath):
+            return
+        client=TinClient.connect(self.socketPath)
+        if client is not None:
+            client.close()
+            raise Exception('a daemon is already running on "%s"'%
+                self.socketPath)
+        os.unlink(self.socketPath)
+
+    def _listen(self)->'socketserver.UnixStreamServer':
+        """
+        Open the socket
+        """
+        # so that nobody else can connect, even before the chmod
+        oldUmask=os.umask(0o177)
+        try:
+            server=_makeServer(self.socketPath,self)
+        finally:
+            os.umask(oldUmask)
+        os.chmod(self.socketPath,0o600)
+        return server
+
+    def start(self)->'TinDaemon':
+        """
+        Start serving on a background thread
+
+        :return: self
+        """
+        self._checkNotRunning()
+        self.warm()
+        self._server=self._listen()
+        self._thread=threading.Thread(target=self._server.serve_forever,
+            name='tin-daemon',daemon=True)
+        self._thread.start()
+        return self
+
+    def serveForever(self)->None:
+        """
+        Serve until a shutdown request (or ctrl+c)
+        """
+        self._checkNotRunning()
+        self.warm()
+        self._server=self._listen()
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._cleanup()
+
+    def stop(self)->None:
+        """
+        Stop serving
+        """
+        server=self._server
+        if server is not None:
+            server.shutdown()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread=None
+            self._cleanup()
+
+    def _cleanup(self)->None:
+        if self._server is not None:
+            self._server.server_close()
+            self._server=None
+            try:
+                os.unlink(self.socketPath)
+            except OSError:
+                pass
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher=None
+
+    def __enter__(self)->'TinDaemon':
+        return self.start()
+
+    def __exit__(self,*args)->None:
+        self.stop()
+
+
+class TinClient:
+    """
+    Talks to a running TinDaemon
+    """
+
+    def __init__(self,sock:socket.socket):
+        """
+        (use TinClient.connect() to make one)
+        """
+        self._socket:socket.socket=sock
+        self._file=sock.makefile('rb')
+
+    @classmethod
+    def connect(cls,
+        socketPath:typing.Optional[str]=None,
+        timeout:float=DEFAULT_CLIENT_TIMEOUT
+        )->typing.Optional['TinClient']:
+        """
+        Connect to a daemon
+
+        :return: the client, or None if no daemon is running
+        :raises Exception: if the socket belongs to another user
+        """
+        if not hasattr(socket,'AF_UNIX'):
+            return None
+        if socketPath is None:
+            socketPath=defaultSocketPath()
+        _checkOwner(socketPath)
+        sock=socket.socket(socket.AF_UNIX,socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(socketPath)
+        except OSError:
+            sock.close()
+            return None
+        return cls(sock)
+
+    def request(self,cmd:str,**args:typing.Any)->typing.Any:
+        """
+        Send a request and wait for the result
+
+        :raises Exception: if the daemon could not do it
+        """
+        args['cmd']=cmd
+        self._socket.sendall(json.dumps(args).encode('utf-8')+b'\n')
+        line=self._file.readline()
+        if not line:
+            raise Exception('the daemon closed the connection')
+        reply=json.loads(line.decode('utf-8'))
+        if not reply.get('ok'):
+            raise Exception(reply.get('error','unknown error'))
+        return reply.get('result')
+
+    def close(self)->None:
+        """
+        Close the connection
+        """
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self)->'TinClient':
+        return self
+
+    def __exit__(self,*args)->None:
+        self.close()
+
+
+def clientCmdline(args:typing.Iterable[str])->typing.Optional[int]:
+    """
+    Run the command line through a daemon, if one is running
+    and the command line only asks for things it can answer
+
+    :return: what cmdline() should return, or None if it needs
+        to run in-process instead
+    """
+    socketPath:typing.Optional[str]=None
+    parsed:typing.List[typing.List[str]]=[]
+    for arg in args:
+        av=[a.strip() for a in arg.split('=',1)]
+        if av[0] not in CLIENT_OPTIONS \
+            or len(av)<2 and av[0] not in ('--all','--summary'):
+            return None
+        if av[0]=='--socket':
+            socketPath=av[1]
+        else:
+            parsed.append(av)
+    if not parsed:
+        return None
+    client=TinClient.connect(socketPath)
+    if client is None:
+        return None
+    with client:
+        for av in parsed:
+            if av[0]=='--all':
+                print(client.request('all'))
+            elif av[0]=='--summary':
+                print(client.request('summary'))
+            elif av[0]=='--edit':
+                nameTin=av[1].split('/')
+                tin.openInEditor(client.request('editFilename',
+                    project=nameTin[0],tin=nameTin[1]))
+            elif av[0]=='--search':
+                for name in client.request('search',query=av[1]):
+                    print(name)
+    return 0
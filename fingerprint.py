@@ -0,0 +1,204 @@
+"""
+Fingerprints of file contents, for spotting copies
+
+A file is only hashed when its (dev,inode,size,mtime) key is new, so
+symlinks and hard links to the same file share one fingerprint without
+being read again, and an unchanged file is never re-read.  Copies (which
+are different files with the same contents) are read once each, but
+come out with the same fingerprint.
+"""
+import typing
+import os
+import hashlib
+import threading
+from paths import URLCompatible
+import tin
+
+
+# (st_dev,st_ino,st_size,st_mtime_ns)
+FileKey=typing.Tuple[int,int,int,int]
+
+# bytes of blake2b to keep (plenty to tell contents apart)
+DIGEST_SIZE=16
+
+
+def fileKey(filename:URLCompatible)->typing.Optional[FileKey]:
+    """
+    What identifies a particular version of a particular file
+
+    :return: None if the file is not there
+    """
+    stats=tin.activeStats()
+    if stats is not None:
+        stats.count('stats')
+    try:
+        st=os.stat(str(filename))
+    except OSError:
+        return None
+    return (st.st_dev,st.st_ino,st.st_size,st.st_mtime_ns)
+
+
+def contentHash(data:bytes)->bytes:
+    """
+    A fingerprint of some contents
+    """
+    stats=tin.activeStats()
+    if stats is not None:
+        stats.count('filesHashed')
+    return hashlib.blake2b(data,digest_size=DIGEST_SIZE).digest()
+
+
+class Fingerprints:
+    """
+    Remembers the fingerprint of every file it has seen
+
+    eg:
+        fingerprints=Fingerprints()
+        for filename in filenames:
+            fingerprints.fingerprint(filename)
+        for copies in fingerprints.duplicates():
+            print(copies)
+    """
+
+    def __init__(self):
+        """ """
+        # {key:digest}
+        self._digests:typing.Dict[FileKey,bytes]={}
+        # {key:how many of _files have it}
+        self._users:typing.Dict[FileKey,int]={}
+        # {filename:(key,digest)}
+        self._files:typing.Dict[str,typing.Tuple[FileKey,bytes]]={}
+        self._lock=threading.Lock()
+
+    def known(self,key:FileKey)->typing.Optional[bytes]:
+        """
+        The fingerprint of a file, if this version of it has been seen
+        """
+        return self._digests.get(key)
+
+    def note(self,
+        filename:URLCompatible,
+        key:FileKey,
+        digest:bytes
+        )->typing.Optional[bytes]:
+        """
+        Remember the fingerprint of a file
+
+        :return: the fingerprint it had before (None if it is new)
+        """
+        filename=str(filename)
+        with self._lock:
+            previous=self._files.get(filename)
+            if previous is not None and previous[0]==key:
+                return previous[1]
+            self._files[filename]=(key,digest)
+            self._digests[key]=digest
+            self._users[key]=self._users.get(key,0)+1
+            if previous is None:
+                return None
+            self._release(previous[0])
+            return previous[1]
+
+    def _release(self,key:FileKey)->None:
+        """
+        A file no longer has a key, so forget the key if nothing else does
+        """
+        users=self._users.get(key,0)-1
+        if users>0:
+            self._users[key]=users
+        else:
+            self._users.pop(key,None)
+            self._digests.pop(key,None)
+
+    def add(self,
+        filename:URLCompatible,
+        key:FileKey,
+        data:bytes
+        )->typing.Tuple[bytes,typing.Optional[bytes]]:
+        """
+        Fingerprint the contents of a file that have just been read
+
+        :return: (fingerprint,the fingerprint it had before)
+        """
+        digest=contentHash(data)
+        return digest,self.note(filename,key,digest)
+
+    def fingerprint(self,filename:URLCompatible)->typing.Optional[bytes]:
+        """
+        The fingerprint of a file, only reading it if it is new
+        or has changed
+
+        :return: None if the file cannot be read
+        """
+        filename=str(filename)
+        key=fileKey(filename)
+        if key is None:
+            self.forget(filename)
+            return None
+        digest=self.known(key)
+        if digest is not None:
+            self.note(filename,key,digest)
+            return digest
+        data=tin.readData(filename)
+        if data is None:
+            self.forget(filename)
+            return None
+        return self.add(filename,key,data)[0]
+
+    def digestOf(self,filename:URLCompatible)->typing.Optional[bytes]:
+        """
+        The fingerprint a file had the last time it was seen
+        (without checking whether it has changed since)
+        """
+        found=self._files.get(str(filename))
+        if found is None:
+            return None
+        return found[1]
+
+    def forget(self,filename:URLCompatible)->typing.Optional[bytes]:
+        """
+        Forget a file
+
+        :return: the fingerprint it had (None if it was not known)
+        """
+        with self._lock:
+            found=self._files.pop(str(filename),None)
+            if found is None:
+                return None
+            self._release(found[0])
+            return found[1]
+
+    def duplicates(self,
+        filenames:typing.Optional[typing.Iterable[URLCompatible]]=None
+        )->typing.List[typing.List[str]]:
+        """
+        Groups of files that have the same contents
+        (whether they are copies, or links to the same file)
+
+        NOTE: empty files are left out, since they are all the same
+
+        :param filenames: only look at these (default=every file seen)
+        :return: a list of groups, each a sorted list of filenames
+        """
+        with self._lock:
+            if filenames is None:
+                files=list(self._files.items())
+            else:
+                files=[]
+                for filename in filenames:
+                    found=self._files.get(str(filename))
+                    if found is not None:
+                        files.append((str(filename),found))
+        groups:typing.Dict[bytes,typing.List[str]]={}
+        for filename,(key,digest) in files:
+            if key[2]==0:
+                continue
+            groups.setdefault(digest,[]).append(filename)
+        return sorted([sorted(group) for group in groups.values()
+            if len(group)>1])
+
+    def __contains__(self,filename:object)->bool:
+        return str(filename) in self._files
+
+    def __len__(self)->int:
+        return len(self._files)
@@ -0,0 +1,392 @@
+"""
+Full-text inverted index over the contents of tin files,
+with boolean and phrase queries.
+
+Query syntax:
+    word word       both words (AND is implied, but can be written)
+    word OR word    either word
+    NOT word, -word without the word
+    "some words"    the words, in that order
+    todo:word       only look in todo files (or ideas:, notes:, shopping:)
+    todo:( ... )    only look in todo files for all of it
+    ( ... )         grouping
+"""
+import typing
+import os
+import re
+import json
+import threading
+from paths import URLCompatible
+
+
+TOKEN_RE=re.compile(r"""\w+""")
+# the tin kinds that are indexed, each as its own field
+FIELDS=('todo','ideas','notes','shopping')
+
+_QUERY_TOKEN_RE=re.compile(
+    r"""\s*(?:(?P<lp>\()|(?P<rp>\))|(?P<field>\w+):(?=\S)"""
+    r"""|"(?P<phrase>[^"]*)"?|(?P<word>[^\s()"]+))""")
+
+# term->{docId:{field:[positions]}}
+Postings=typing.Dict[str,typing.Dict[int,typing.Dict[str,typing.List[int]]]]
+
+
+def tokenize(text:str)->typing.List[str]:
+    """
+    Split text into lower case terms
+    """
+    return [t.lower() for t in TOKEN_RE.findall(text)]
+
+
+class FullTextIndex:
+    """
+    Inverted index of terms in tin files, kept per document (project)
+    and field (tin kind), with the position of every occurrence so that
+    phrases can be found.
+
+    Files are only re-indexed when their (mtime,size) changes.
+    """
+
+    VERSION=2
+
+    def __init__(self,filename:typing.Optional[URLCompatible]=None):
+        """
+        :param filename: where to keep the index on disk
+            (if it exists, it is loaded)
+        """
+        self.filename:typing.Optional[str]= \
+            None if filename is None else str(filename)
+        self._lock=threading.RLock()
+        self._docIds:typing.Dict[str,int]={}
+        self._docNames:typing.Dict[int,str]={}
+        self._nextDocId:int=0
+        # (docId,field)->(mtime,size)
+        self._stamps:typing.Dict[typing.Tuple[int,str],
+            typing.Tuple[int,int]]={}
+        # (docId,field)->terms, so they can be removed again
+        self._fieldTerms:typing.Dict[typing.Tuple[int,str],
+            typing.List[str]]={}
+        self._postings:Postings={}
+        self.dirty:bool=False
+        if self.filename is not None and os.path.exists(self.filename):
+            self.load()
+
+    @property
+    def documents(self)->typing.Iterable[str]:
+        """
+        All indexed documents
+        """
+        return self._docIds.keys()
+
+    def load(self,filename:typing.Optional[URLCompatible]=None)->None:
+        """
+        Load the index from disk
+
+        A file that cannot be read, is outdated, or is not what save()
+        writes at all is ignored, so that the index gets rebuilt.
+        """
+        if filename is None:
+            filename=self.filename
+        try:
+            with open(str(filename),'rb') as f:
+                data=json.loads(f.read().decode('utf-8'))
+            if data.get('version')!=self.VERSION:
+                return
+            docIds={str(k):int(v) for k,v in data['docIds'].items()}
+            nextDocId=int(data['nextDocId'])
+            stamps:typing.Dict[typing.Tuple[int,str],
+                typing.Tuple[int,int]]={}
+            fieldTerms:typing.Dict[typing.Tuple[int,str],
+                typing.List[str]]={}
+            for docId,field,stamp,terms in data['fields']:
+                key=(int(docId),str(field))
+                if stamp is not None:
+                    stamps[key]=(int(stamp[0]),int(stamp[1]))
+                fieldTerms[key]=[str(term) for term in terms]
+            postings:Postings={}
+            for term,docs in data['postings'].items():
+                postings[str(term)]={int(docId):{str(field):
+                    [int(p) for p in positions]
+                    for field,positions in fields.items()}
+                    for docId,fields in docs}
+        except Exception: # pylint: disable=broad-except
+            # missing, damaged, or something else entirely
+            return
+        with self._lock:
+            self._docIds=docIds
+            self._docNames={v:k for k,v in docIds.items()}
+            self._nextDocId=nextDocId
+            self._stamps=stamps
+            self._fieldTerms=fieldTerms
+            self._postings=postings
+            self.dirty=False
+
+    def save(self,filename:typing.Optional[URLCompatible]=None)->None:
+        """
+        Save the index to disk (as json)
+        """
+        if filename is None:
+            filename=self.filename
+        if filename is None:
+            return
+        with self._lock:
+            keys=set(self._fieldTerms.keys())|set(self._stamps.keys())
+            data={
+                'version':self.VERSION,
+                'docIds':self._docIds,
+                'nextDocId':self._nextDocId,
+                'fields':[[docId,field,self._stamps.get((docId,field)),
+                    self._fieldTerms.get((docId,field),[])]
+                    for docId,field in sorted(keys)],
+                'postings':{term:[[docId,fields]
+                    for docId,fields in docs.items()]
+                    for term,docs in self._postings.items()}}
+            tmp='%s.tmp'%filename
+            with open(tmp,'wb') as f:
+                f.write(json.dumps(data,separators=(',',':')).encode('utf-8'))
+            os.replace(tmp,str(filename))
+            self.dirty=False
+
+    def _docId(self,doc:str)->int:
+        docId=self._docIds.get(doc)
+        if docId is None:
+            docId=self._nextDocId
+            self._nextDocId+=1
+            self._docIds[doc]=docId
+            self._docNames[docId]=doc
+        return docId
+
+    def isCurrent(self,
+        doc:str,
+        field:str,
+        stamp:typing.Optional[typing.Tuple[int,int]]
+        )->bool:
+        """
+        Whether the index already has this version of a file
+        """
+        docId=self._docIds.get(doc)
+        if docId is None:
+            return stamp is None
+        return self._stamps.get((docId,field))==stamp
+
+    def _removeField(self,docId:int,field:str)->None:
+        key=(docId,field)
+        for term in self._fieldTerms.pop(key,[]):
+            docs=self._postings.get(term)
+            if docs is None:
+                continue
+            fields=docs.get(docId)
+            if fields is not None:
+                fields.pop(field,None)
+                if not fields:
+                    del docs[docId]
+            if not docs:
+                del self._postings[term]
+        self._stamps.pop(key,None)
+
+    def update(self,
+        doc:str,
+        field:str,
+        text:typing.Optional[str],
+        stamp:typing.Optional[typing.Tuple[int,int]]=None
+        )->None:
+        """
+        (Re)index the contents of a single file
+
+        :param doc: the document (project) it belongs to
+        :param field: the kind of tin file
+        :param text: the contents, or None if there is no such file
+        :param stamp: (mtime,size) of the file
+        """
+        with self._lock:
+            docId=self._docId(doc)
+            self._removeField(docId,field)
+            self.dirty=True
+            if text is None:
+                return
+            positions:typing.Dict[str,typing.List[int]]={}
+            for i,term in enumerate(tokenize(text)):
+                positions.setdefault(term,[]).append(i)
+            for term,termPositions in positions.items():
+                self._postings.setdefault(term,{}).setdefault(
+                    docId,{})[field]=termPositions
+            self._fieldTerms[(docId,field)]=list(positions.keys())
+            if stamp is not None:
+                self._stamps[(docId,field)]=stamp
+
+    def remove(self,doc:str)->None:
+        """
+        Remove a document entirely
+        """
+        with self._lock:
+            docId=self._docIds.pop(doc,None)
+            if docId is None:
+                return
+            for field in FIELDS:
+                self._removeField(docId,field)
+            del self._docNames[docId]
+            self.dirty=True
+
+    def _termDocs(self,
+        term:str,
+        fields:typing.Optional[typing.Iterable[str]]
+        )->typing.Set[int]:
+        docs=self._postings.get(term)
+        if not docs:
+            return set()
+        if fields is None:
+            return set(docs.keys())
+        return {docId for docId,docFields in docs.items()
+            if any(f in docFields for f in fields)}
+
+    def _phraseDocs(self,
+        terms:typing.List[str],
+        fields:typing.Optional[typing.Iterable[str]]
+        )->typing.Set[int]:
+        if not terms:
+            return set()
+        if len(terms)==1:
+            return self._termDocs(terms[0],fields)
+        candidates=self._termDocs(terms[0],fields)
+        for term in terms[1:]:
+            candidates&=self._termDocs(term,fields)
+        ret=set()
+        for docId in candidates:
+            first=self._postings[terms[0]][docId]
+            for field in first:
+                if fields is not None and field not in fields:
+                    continue
+                starts=set(first[field])
+                for i,term in enumerate(terms[1:],1):
+                    positions=self._postings[term][docId].get(field,())
+                    starts&={p-i for p in positions}
+                    if not starts:
+                        break
+                if starts:
+                    ret.add(docId)
+                    break
+        return ret
+
+    def query(self,query:str)->typing.List[str]:
+        """
+        Find all documents matching a query (see the module for syntax)
+
+        :return: matching document names, sorted
+        """
+        with self._lock:
+            docIds=_QueryParser(self,query).parse()
+            return sorted([self._docNames[d] for d in docIds])
+
+
+class _QueryParser:
+    """
+    Recursive descent parser that evaluates a query as it goes
+    """
+
+    def __init__(self,index:FullTextIndex,query:str):
+        self.index:FullTextIndex=index
+        self.tokens:typing.List[typing.Tuple[str,str]]=[]
+        for m in _QUERY_TOKEN_RE.finditer(query):
+            kind=m.lastgroup
+            if kind is not None:
+                self.tokens.append((kind,m.group(kind)))
+        self.i:int=0
+        # the fields to look in, if inside of a field:( ... ) group
+        self.fields:typing.Optional[typing.List[str]]=None
+
+    def _peek(self)->typing.Optional[typing.Tuple[str,str]]:
+        if self.i<len(self.tokens):
+            return self.tokens[self.i]
+        return None
+
+    def _isOperator(self,op:str)->bool:
+        token=self._peek()
+        return token is not None and token==('word',op)
+
+    def parse(self)->typing.Set[int]:
+        """
+        :return: the ids of matching documents
+        """
+        ret=self._or()
+        while self._peek() is not None:
+            # stray closing parenthesis, so skip it and carry on
+            self.i+=1
+            if self._peek() is not None:
+                ret=ret&self._or()
+        return ret
+
+    def _or(self)->typing.Set[int]:
+        ret=self._and()
+        while self._isOperator('OR'):
+            self.i+=1
+            ret=ret|self._and()
+        return ret
+
+    def _and(self)->typing.Set[int]:
+        ret:typing.Optional[typing.Set[int]]=None
+        while True:
+            token=self._peek()
+            if token is None or token[0]=='rp' or self._isOperator('OR'):
+                break
+            if self._isOperator('AND'):
+                self.i+=1
+                continue
+            docs=self._not()
+            ret=docs if ret is None else ret&docs
+        if ret is None:
+            return set()
+        return ret
+
+    def _not(self)->typing.Set[int]:
+        token=self._peek()
+        negate=False
+        if token==('word','NOT'):
+            self.i+=1
+            negate=True
+        elif token is not None and token[0]=='word' \
+            and len(token[1])>1 and token[1][0]=='-':
+            # strip off the - and look at the rest
+            self.tokens[self.i]=('word',token[1][1:])
+            negate=True
+        if negate:
+            return set(self.index._docNames.keys())-self._not()
+        return self._primary()
+
+    def _primary(self)->typing.Set[int]:
+        token=self._peek()
+        if token is None:
+            return set()
+        self.i+=1
+        kind,value=token
+        if kind=='lp':
+            ret=self._or()
+            token=self._peek()
+            if token is not None and token[0]=='rp':
+                self.i+=1
+            return ret
+        if kind=='rp':
+            return set()
+        fields:typing.Optional[typing.List[str]]=self.fields
+        if kind=='field':
+            if value.lower() in FIELDS:
+                fields=[value.lower()]
+                token=self._peek()
+                if token is None:
+                    return set()
+                if token[0]=='lp':
+                    # the field applies to the whole group
+                    outerFields=self.fields
+                    self.fields=fields
+                    try:
+                        return self._primary()
+                    finally:
+                        self.fields=outerFields
+                self.i+=1
+                kind,value=token
+            else:
+                # not a field after all, so it is part of the text
+                nextToken=self._peek()
+                if nextToken is not None and nextToken[0] in ('word','phrase'):
+                    self.i+=1
+                    value='%s %s'%(value,nextToken[1])
+        return self.index._phraseDocs(tokenize(value),fields)
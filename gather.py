@@ -4,9 +4,9 @@ Gather information by scanning a directory
 import typing
 import os
 import re
-import json
-from paths import LoadAndSave, URLCompatible, URL, asURL
-from tin import IsMatchParam,MatchBase,asMatch
+from paths import LoadAndSave, URLCompatible, URL
+import tin
+from tin import IsMatchParam,MatchBase,asMatch,KeywordMatch
 
 
 class DirectoriesSet(LoadAndSave):
@@ -31,11 +31,27 @@ class DirectoriesSet(LoadAndSave):
         LoadAndSave.__init__(self,filename)
         self._ignore:typing.Set[str]=set()
         self._isDefaultIgnore:bool=False
+        # gitignore-style rules and limits on top of the ignore names
+        # (see ignore.py), compiled into self.pruner when first needed
+        self._ignoreRules:typing.List[str]=[]
+        self._maxDepth:typing.Optional[int]=None
+        self._followSymlinks:bool=True
+        self._useIgnoreFiles:bool=True
+        self._pruner:typing.Optional['tin.IgnoreMatcher']=None
         if ignore is not None:
             self.ignore=ignore # type: ignore
         self._directories:typing.Set[str]=set()
         self._recursiveDirectories:typing.Set[str]=set()
         self.addDirectories(directories,includeSubdirs)
+        # number of threads to scan with, and whether multi-threaded
+        # results must come out in the same order as a single thread
+        self.workers:int=1
+        self.ordered:bool=True
+        # if set, used to avoid relisting directories that have not changed
+        self.index:typing.Optional['tin.ScanIndex']=None
+        # if set, no more than this many bytes of any one file are
+        # looked at when matching file contents
+        self.contentByteBudget:typing.Optional[int]=None
 
     @property
     def isDefaultIgnore(self)->bool:
@@ -52,6 +68,14 @@ class DirectoriesSet(LoadAndSave):
         ret:typing.Dict[str,typing.Any]={}
         if not self._isDefaultIgnore:
             ret['ignore']=[s for s in self._ignore]
+        if self._ignoreRules:
+            ret['ignoreRules']=list(self._ignoreRules)
+        if self._maxDepth is not None:
+            ret['maxDepth']=self._maxDepth
+        if not self._followSymlinks:
+            ret['followSymlinks']=False
+        if not self._useIgnoreFiles:
+            ret['useIgnoreFiles']=False
         dirs:typing.List[typing.Dict[str,typing.Any]]=[]
         for d in self._directories:
             dirs.append({'d':d})
@@ -62,6 +86,11 @@ class DirectoriesSet(LoadAndSave):
     @jsonObj.setter
     def jsonObj(self,obj:typing.Dict):
         self.ignore=obj.get('ignore',None)
+        self._ignoreRules=list(obj.get('ignoreRules',[]))
+        self._maxDepth=obj.get('maxDepth',None)
+        self._followSymlinks=obj.get('followSymlinks',True)
+        self._useIgnoreFiles=obj.get('useIgnoreFiles',True)
+        self._pruner=None
         self._directories=set()
         self._recursiveDirectories=set()
         for d in obj.get('directories',[]):
@@ -75,9 +104,11 @@ class DirectoriesSet(LoadAndSave):
         """
         Get the directories as a json string
         """
+        import json
         return json.dumps(self.jsonObj)
     @json.setter
     def json(self,data:str):
+        import json
         self.jsonObj=json.loads(data)
 
     def _decode(self,data:str)->None:
@@ -105,6 +136,94 @@ class DirectoriesSet(LoadAndSave):
             ignore=self.DEFAULT_IGNORE
         self._ignore=set(ignore)
 
+    @property
+    def ignoreRules(self)->typing.List[str]:
+        """
+        gitignore-style rules for directories to leave out
+        (in addition to the ignore names and any .tinignore files)
+        """
+        return list(self._ignoreRules)
+    @ignoreRules.setter
+    def ignoreRules(self,rules:typing.Iterable[str]):
+        self._ignoreRules=list(rules)
+        self._pruner=None
+
+    def addIgnoreRule(self,rule:str)->None:
+        """
+        Add a gitignore-style rule (see ignore.py for the syntax)
+        """
+        self._ignoreRules.append(rule)
+        self._pruner=None
+
+    @property
+    def maxDepth(self)->typing.Optional[int]:
+        """
+        How many levels below each recursive directory to scan
+        (None=no limit)
+        """
+        return self._maxDepth
+    @maxDepth.setter
+    def maxDepth(self,maxDepth:typing.Optional[int]):
+        self._maxDepth=maxDepth
+        self._pruner=None
+
+    @property
+    def followSymlinks(self)->bool:
+        """
+        Whether to scan into symlinked directories
+        """
+        return self._followSymlinks
+    @followSymlinks.setter
+    def followSymlinks(self,followSymlinks:bool):
+        self._followSymlinks=followSymlinks
+        self._pruner=None
+
+    @property
+    def useIgnoreFiles(self)->bool:
+        """
+        Whether to use the rules in a .tinignore file at the top
+        of each recursive directory
+        """
+        return self._useIgnoreFiles
+    @useIgnoreFiles.setter
+    def useIgnoreFiles(self,useIgnoreFiles:bool):
+        self._useIgnoreFiles=useIgnoreFiles
+        self._pruner=None
+
+    @property
+    def pruner(self)->'tin.IgnoreMatcher':
+        """
+        The compiled ignore rules
+        """
+        pruner=self._pruner
+        if pruner is None:
+            pruner=self._compilePruner()
+        return pruner
+
+    def _compilePruner(self)->'tin.IgnoreMatcher':
+        pruner=tin.IgnoreMatcher(self._recursiveDirectories,
+            self._ignoreRules,self._maxDepth,self._followSymlinks,
+            self._useIgnoreFiles)
+        self._pruner=pruner
+        return pruner
+
+    def reloadIgnoreRules(self)->None:
+        """
+        Recompile the ignore rules (rereading .tinignore files)
+        and reset the pruneStats
+
+        This is done at the start of every scan (before any scanning
+        threads start, so that they all share the same one).
+        """
+        self._compilePruner()
+
+    @property
+    def pruneStats(self)->typing.Dict[str,int]:
+        """
+        How many subtrees each rule has pruned during the last scan
+        """
+        return dict(self.pruner.stats)
+
     def addDirectories(self,
         directories:typing.Union[None,str,typing.Iterable[str]],
         includeSubdirs:bool):
@@ -140,6 +259,172 @@ class DirectoriesSet(LoadAndSave):
             self._recursiveDirectories.add(dirname)
         else:
             self._directories.add(dirname)
+        self._pruner=None
+
+    def useIndex(self,filename:typing.Optional[URLCompatible])->None:
+        """
+        Keep a persistent index of scanned directories in the given file
+        so that later scans only need to list directories that changed
+
+        :param filename: the index file, or None to stop using an index
+        """
+        if self.index is not None:
+            self.index.close()
+            self.index=None
+        if filename is not None:
+            self.index=tin.ScanIndex(filename)
+
+    def watch(self,
+        callback:typing.Optional['tin.WatchCallback']=None,
+        debounce:float=0.5,
+        interval:float=2.0,
+        polling:typing.Optional[bool]=None,
+        fileFilter:typing.Optional[typing.Callable[[str],bool]]=None
+        )->'tin.Watcher':
+        """
+        Start watching all of the directories for changes
+
+        :param callback: called with each debounced batch of WatchEvents
+            (more can be added with the returned Watcher's subscribe())
+        :param debounce: wait for this many seconds of quiet before
+            delivering a batch of changes
+        :param interval: how often to check when polling
+        :param polling: True=always poll, False=always use inotify,
+            None=use inotify if possible
+        :param fileFilter: given a filename, return whether modifications
+            to its contents matter (if None, they all do)
+        :return: the running watcher (call stop() when done)
+        """
+        watcher=tin.Watcher(self,debounce,interval,polling,fileFilter)
+        if callback is not None:
+            watcher.subscribe(callback)
+        return watcher.start()
+
+    def _scanDirectory(self,
+        dd:str
+        )->typing.Tuple[typing.List[str],typing.List[str]]:
+        """
+        List a single directory with os.scandir
+
+        :return: (the names of all children,full paths of subdirectories
+            that are not ignored)
+        """
+        names:typing.List[str]=[]
+        subdirs:typing.List[str]=[]
+        ignore=self.ignore
+        stats=tin.activeStats()
+        if stats is not None:
+            start=stats.start('list')
+        pruner=self.pruner
+        context=None
+        wantSubdirs=True
+        # whether maxDepth kept any subdirectories out
+        tooDeep=False
+        if not pruner.trivial:
+            context=pruner.context(dd)
+            # too deep means no subdirectories are wanted at all
+            wantSubdirs=pruner.allowChildren(context)
+        try:
+            with os.scandir(dd) as it:
+                for entry in it:
+                    name=entry.name
+                    names.append(name)
+                    if tooDeep:
+                        continue
+                    try:
+                        # DirEntry caches the type from the listing itself,
+                        # so this does not cost a stat on most systems
+                        isDir=entry.is_dir()
+                    except OSError:
+                        isDir=False
+                    if isDir:
+                        if not wantSubdirs:
+                            tooDeep=True
+                            continue
+                        if name in ignore:
+                            pruner.countPrune(name)
+                            continue
+                        if context is not None \
+                            and pruner.prune(context,entry):
+                            continue
+                        subdirs.append(entry.path)
+        except OSError:
+            # unreadable (permissions, vanished, etc) so treat as empty
+            pass
+        if tooDeep:
+            pruner.countPrune(tin.MAX_DEPTH_RULE)
+        if stats is not None:
+            stats.end('list',start)
+            stats.count('directoriesVisited')
+            stats.count('entriesListed',len(names))
+        return names,subdirs
+
+    def _subdirectories(self,
+        dd:str,
+        entries:typing.Iterable[os.DirEntry]
+        )->typing.List[str]:
+        """
+        Pick the subdirectories that are not ignored out of a listing
+        someone else already made (by the same rules as _scanDirectory)
+
+        :param entries: what os.scandir(dd) gave
+        :return: full paths of the subdirectories
+        """
+        subdirs:typing.List[str]=[]
+        ignore=self.ignore
+        pruner=self.pruner
+        context=None
+        if not pruner.trivial:
+            context=pruner.context(dd)
+        wantSubdirs=pruner.allowChildren(context)
+        for entry in entries:
+            try:
+                isDir=entry.is_dir()
+            except OSError:
+                isDir=False
+            if isDir:
+                if not wantSubdirs:
+                    pruner.countPrune(tin.MAX_DEPTH_RULE)
+                    break
+                if entry.name in ignore:
+                    pruner.countPrune(entry.name)
+                    continue
+                if context is not None and pruner.prune(context,entry):
+                    continue
+                subdirs.append(entry.path)
+        return subdirs
+
+    def walk(self)->typing.Generator[
+        typing.Tuple[URL,typing.List[str]],None,None]:
+        """
+        Iterates through all directories/subdirectories
+        and yields (full path,names of children) for each.
+
+        The child names come from the same listing used to find
+        subdirectories, so there is no need to list the directory again.
+
+        NOTE: has recursion protection built in
+        NOTE: is not itself recursive, so any depth is fine
+        """
+        yield from tin.ScanCursor(self,tin.SCAN_DFS).scan()
+
+    def scanCursor(self,
+        order:str='bfs',
+        priority:typing.Optional['tin.ScanPriority']=None,
+        matching:typing.Optional[IsMatchParam]=None
+        )->'tin.ScanCursor':
+        """
+        Get a cursor to scan a piece at a time, in a chosen order
+        and within budgets (see tin.ScanCursor)
+
+        :param order: 'bfs' (shallowest first), 'dfs' (the same as walk())
+            or 'recent' (most recently modified first)
+        :param priority: given a directory, lower numbers are scanned
+            first (instead of the order)
+        :param matching: only yield directories that match this,
+            the same as directoriesContaining()
+        """
+        return tin.ScanCursor(self,order,priority,matching)
 
     @property
     def allDirectories(self)->typing.Generator[URL,None,None]:
@@ -151,56 +436,120 @@ class DirectoriesSet(LoadAndSave):
             https://www.python.org/dev/peps/pep-0484/#annotating-generator-functions-and-coroutines
         NOTE: has recursion protection built in
         """
-        ignore=set()
-        def r(dd:str)->typing.Generator[URL,None,None]:
-            if dd in ignore:
-                return
-            ignore.add(dd)
-            yield asURL(dd)
-            for d in os.listdir(dd):
-                if d in self.ignore:
-                    continue
-                d='%s%s%s'%(dd,os.sep,d)
-                if os.path.isdir(d):
-                    yield from r(d)
-        for d in self._recursiveDirectories:
-            yield from r(os.path.abspath(d))
-        # do the simple dirs last
-        # just in case they were already found by recursion
-        for d in self._directories:
-            if d in self.ignore:
-                continue
-            d=os.path.abspath(d)
-            if d in ignore:
-                continue
-            ignore.add(d)
-            yield asURL(d)
+        for d,_ in self.walk():
+            yield d
 
     def _checkDirectory(self,
         d:URL,
         cleanMatches:typing.List[typing.Union[
             MatchBase,
-            typing.Tuple[MatchBase,MatchBase]]]
+            typing.Tuple[MatchBase,MatchBase]]],
+        filenames:typing.Optional[typing.Iterable[str]]=None
         )->bool:
         """
         check to see if a single directory matches true
         against a clean set of matches
-        """
-        filenames=d.children
+
+        :param filenames: the names of the children of d, if already known
+            (if not, the directory will be listed)
+        """
+        if filenames is None:
+            filenames=d.children
+        stats=tin.activeStats()
+        if stats is not None:
+            start=stats.start('match')
+            try:
+                return self._checkDirectoryCounted(d,cleanMatches,
+                    filenames,stats)
+            finally:
+                stats.end('match',start)
         for m in cleanMatches:
             if isinstance(m,tuple):
                 for f in filenames:
                     if m[0].matches(f):
                         filename="%s%s%s"%(d,os.sep,f)
-                        data=open(filename,'rb').read().decode('utf-8')
-                        if m[0].matches(data):
+                        budget=self.contentByteBudget
+                        if tin.contentsMatch(filename,m[1],budget):
+                            return True
+            else:
+                matches=m.matches
+                for f in filenames:
+                    if matches(f):
+                        return True
+        return False
+
+    def _checkDirectoryCounted(self,
+        d:URL,
+        cleanMatches:typing.List[typing.Union[
+            MatchBase,
+            typing.Tuple[MatchBase,MatchBase]]],
+        filenames:typing.Iterable[str],
+        stats:'tin.ScanStats'
+        )->bool:
+        """
+        The same as _checkDirectory(), only counting match evaluations
+        and timing content matches (kept separate so that the usual
+        case pays nothing for it)
+        """
+        for m in cleanMatches:
+            if isinstance(m,tuple):
+                matches=stats.counted('matchEvaluations',m[0].matches)
+                for f in filenames:
+                    if matches(f):
+                        filename="%s%s%s"%(d,os.sep,f)
+                        budget=self.contentByteBudget
+                        start=stats.start('content')
+                        found=tin.contentsMatch(filename,m[1],budget)
+                        stats.end('content',start)
+                        if found:
                             return True
             else:
+                matches=stats.counted('matchEvaluations',m.matches)
                 for f in filenames:
-                    if m.matches(f):
+                    if matches(f):
                         return True
         return False
 
+    def _cleanMatches(self,
+        matching:typing.Union[
+            IsMatchParam,
+            typing.Tuple[IsMatchParam,IsMatchParam],
+            typing.Iterable[typing.Union[
+                IsMatchParam,
+                typing.Tuple[IsMatchParam,IsMatchParam]]]
+        ])->typing.List[typing.Union[
+            MatchBase,
+            typing.Tuple[MatchBase,MatchBase]]]:
+        """
+        massage input so it is ALWAYS an iterable of
+        MatchBase or (MatchBase,MatchBase)
+
+        Every matcher is compiled for speed along the way.
+
+        (see directoriesContaining() for what matching can be)
+        """
+        cleanMatches:typing.List[typing.Union[
+            MatchBase,
+            typing.Tuple[MatchBase,MatchBase]]]=[]
+        if matching is None:
+            pass
+        elif isinstance(matching,(str,MatchBase,re.Pattern)):
+            cleanMatches=[asMatch(matching).compile()]
+        elif isinstance(matching,tuple) and len(matching)==2:
+            cleanMatches=[(
+                asMatch(matching[0]).compile(),
+                asMatch(matching[1]).compile())]
+        else:
+            for m in matching:
+                if isinstance(m,tuple):
+                    if len(m)<2:
+                        continue
+                    m=(asMatch(m[0]).compile(),asMatch(m[1]).compile())
+                else:
+                    m=asMatch(m).compile()
+                cleanMatches.append(m)
+        return cleanMatches
+
     def directoriesContaining(self,
         matching:typing.Union[
             IsMatchParam,
@@ -208,7 +557,10 @@ class DirectoriesSet(LoadAndSave):
             typing.Iterable[typing.Union[
                 IsMatchParam,
                 typing.Tuple[IsMatchParam,IsMatchParam]]]
-        ]):
+        ],
+        workers:typing.Optional[int]=None,
+        ordered:typing.Optional[bool]=None
+        )->typing.Generator[URL,None,None]:
         """
         Search given a set of search parameters and yield the directory names
 
@@ -218,37 +570,167 @@ class DirectoriesSet(LoadAndSave):
             or any mixed iterable of these things,
             wherein only one entry has to match
 
+        NOTE: fileContents matches if it is found anywhere in the file
+            (see MatchBase.search())
+
         NOTE: if a tuple of exactly 2 items, it is always assumed to be
             (filenameMatch,fileContentsMath)
             but if an array of 2 items is given, it is assumed to be
             [filenameMatch,filenameMatch]
             therefore:
               PREFER LISTS FOR FILENAME LISTS AND TUPLES FOR FILENAME+CONTENTS
+
+        NOTE: if self.index is set, it is used and workers is ignored
+
+        :param workers: number of threads to scan with
+            (if None, use self.workers)
+        :param ordered: if False, when multi-threaded, results are yielded
+            as soon as they are found rather than in walk order
+            (if None, use self.ordered)
+        """
+        for d,_ in self._matchingDirectories(matching,workers,ordered):
+            yield d
+
+    def _matchingDirectories(self,
+        matching:typing.Union[
+            IsMatchParam,
+            typing.Tuple[IsMatchParam,IsMatchParam],
+            typing.Iterable[typing.Union[
+                IsMatchParam,
+                typing.Tuple[IsMatchParam,IsMatchParam]]]
+        ],
+        workers:typing.Optional[int]=None,
+        ordered:typing.Optional[bool]=None
+        )->typing.Generator[typing.Tuple[URL,typing.List[str]],None,None]:
+        """
+        The same as directoriesContaining(), only yields
+        (directory,names of its children)
         """
-        # massage input so it is ALWAYS an iterable of
-        # MatchBase or (MatchBase,MatchBase)
-        cleanMatches:typing.List[typing.Union[
-            MatchBase,
-            typing.Tuple[MatchBase,MatchBase]]]=[]
         if matching is None:
             return
-        elif isinstance(matching,(str,MatchBase,re.Pattern)):
-            cleanMatches=[asMatch(matching)]
-        elif isinstance(matching,tuple) and len(matching)==2:
-            cleanMatches=[(asMatch(matching[0]),asMatch(matching[1]))]
-        else:
-            for m in matching:
-                if isinstance(m,tuple):
-                    if len(m)<2:
-                        continue
-                    m=(asMatch(m[0]),asMatch(m[1]))
-                else:
-                    m=asMatch(m)
-                cleanMatches.append(m)
+        cleanMatches=self._cleanMatches(matching)
+        if workers is None:
+            workers=self.workers
+        if ordered is None:
+            ordered=self.ordered
         # now do the search
-        for d in self.allDirectories:
-            if self._checkDirectory(d,cleanMatches):
-                yield d
+        self.reloadIgnoreRules()
+        if self.index is not None:
+            # the index makes each directory so cheap that
+            # there is nothing to gain from threads
+            yield from self.index.scan(self,cleanMatches)
+            return
+        if workers>1:
+            yield from tin.ParallelScanner(self,cleanMatches,workers,ordered)
+            return
+        for d,filenames in self.walk():
+            if self._checkDirectory(d,cleanMatches,filenames):
+                yield d,filenames
+
+    def adirectoriesContaining(self,
+        matching:typing.Union[
+            IsMatchParam,
+            typing.Tuple[IsMatchParam,IsMatchParam],
+            typing.Iterable[typing.Union[
+                IsMatchParam,
+                typing.Tuple[IsMatchParam,IsMatchParam]]]
+        ],
+        timeout:typing.Optional[float]=None,
+        batchSize:int=64
+        )->typing.AsyncGenerator[URL,None]:
+        """
+        asyncio version of directoriesContaining()
+
+        eg:
+            async for d in search.adirectoriesContaining('.git'):
+
+        The scan runs in the shared executor, batchSize results at
+        a time.  Cancelling or breaking out of the loop stops it.
+
+        :param timeout: give up if a single batch takes longer than this
+        """
+        return tin.iterateBlocking(
+            self.directoriesContaining(matching),batchSize,timeout)
+
+    def directoriesMentioning(self,
+        filenameMatching:IsMatchParam,
+        keywords:typing.Union[KeywordMatch,typing.Iterable[str]]
+        )->typing.Generator[
+            typing.Tuple[URL,typing.Dict[str,typing.List[str]]],None,None]:
+        """
+        Look for many keywords at once in the contents of files
+
+        Each file whose name matches is only read and scanned once,
+        no matter how many keywords there are.
+
+        :param filenameMatching: which files to look in
+            (anything IsMatchParam supports)
+        :param keywords: the keywords to look for
+        :yield: (directory,{keyword:[names of files it is in]})
+            for each directory where any keyword was found
+        """
+        if not isinstance(keywords,KeywordMatch):
+            keywords=KeywordMatch(keywords)
+        filenameMatches=asMatch(filenameMatching).compile().matches
+        for d,filenames in self.walk():
+            hits:typing.Dict[str,typing.List[str]]={}
+            for f in filenames:
+                if not filenameMatches(f):
+                    continue
+                filename="%s%s%s"%(d,os.sep,f)
+                data=tin.readText(filename,self.contentByteBudget)
+                if data is None:
+                    continue
+                for keyword in keywords.findAll(data):
+                    hits.setdefault(keyword,[]).append(f)
+            if hits:
+                yield d,hits
+
+
+def matchingJsonObj(matching:typing.Any)->typing.Any:
+    """
+    Turn what a DirectoriesSearch is matching into a json-compatible
+    object (see matchingFromJsonObj() for the reverse)
+
+    Strings stay as they are, and lists stay lists, but:
+        regex           {"regex":pattern,"flags":flags}
+        tuple           {"contents":[filenameMatch,contentsMatch]}
+        Match           {"anyOf":[...],"allOf":[...],"noneOf":[...]}
+    """
+    if matching is None or isinstance(matching,str):
+        return matching
+    if isinstance(matching,re.Pattern):
+        return {'regex':matching.pattern,'flags':matching.flags}
+    if isinstance(matching,tuple):
+        return {'contents':[matchingJsonObj(m) for m in matching]}
+    if isinstance(matching,tin.CompiledMatch):
+        matching=matching.match
+    if isinstance(matching,tin.Match):
+        return {
+            'anyOf':[matchingJsonObj(m) for m in matching.anyOf],
+            'allOf':[matchingJsonObj(m) for m in matching.allOf],
+            'noneOf':[matchingJsonObj(m) for m in matching.noneOf]}
+    if isinstance(matching,MatchBase):
+        raise Exception('cannot save a %s'%matching.__class__.__name__)
+    return [matchingJsonObj(m) for m in matching]
+
+
+def matchingFromJsonObj(obj:typing.Any)->typing.Any:
+    """
+    The reverse of matchingJsonObj()
+    """
+    if obj is None or isinstance(obj,str):
+        return obj
+    if isinstance(obj,dict):
+        if 'regex' in obj:
+            return re.compile(obj['regex'],obj.get('flags',0))
+        if 'contents' in obj:
+            return tuple([matchingFromJsonObj(m) for m in obj['contents']])
+        return tin.Match(
+            [matchingFromJsonObj(m) for m in obj.get('anyOf',[])],
+            [matchingFromJsonObj(m) for m in obj.get('allOf',[])],
+            [matchingFromJsonObj(m) for m in obj.get('noneOf',[])])
+    return [matchingFromJsonObj(m) for m in obj]
 
 
 class DirectoriesSearch(DirectoriesSet):
@@ -277,7 +759,9 @@ class DirectoriesSearch(DirectoriesSet):
             typing.Iterable[typing.Union[str,typing.Tuple[
                 IsMatchParam,
                 IsMatchParam]]]]=matching
-        self._results:typing.Optional[typing.List[str]]=None
+        # (along with the names of the children of each)
+        self._results:typing.Optional[tin.CompactResults]=None
+        self._areload:tin.SharedCall=tin.SharedCall(self.reload)
         self.name:str=name
 
     @property
@@ -289,28 +773,113 @@ class DirectoriesSearch(DirectoriesSet):
     @matching.setter
     def matching(self,matching):
         self._matching=matching
-        self._results=[]
+        # the old results are for something else, so search again
+        self._results=None
 
-    def reload(self)->typing.List[str]:
+    def reload(self,
+        workers:typing.Optional[int]=None,
+        ordered:typing.Optional[bool]=None
+        )->'tin.CompactResults':
         """
         force a reload
-        """
-        self._results=[r for r in self.directoriesContaining(self.matching)]
+
+        :param workers: number of threads to scan with
+            (if None, use self.workers)
+        :param ordered: if False, when multi-threaded, results are kept
+            in the order they were found rather than in walk order
+            (if None, use self.ordered)
+        """
+        stats=tin.activeStats()
+        if stats is not None:
+            start=stats.start('reload')
+        for _ in self.iterReload(workers,ordered):
+            pass
+        if stats is not None:
+            stats.end('reload',start)
         return self._results
 
+    def iterReload(self,
+        workers:typing.Optional[int]=None,
+        ordered:typing.Optional[bool]=None
+        )->typing.Generator[typing.Tuple[URL,typing.List[str]],None,None]:
+        """
+        The same as reload(), only yields (directory,names of its
+        children) for each result as soon as it is found
+
+        The results (and listings) are only replaced once the
+        scan is finished.
+        """
+        results=tin.CompactResults()
+        found=self._matchingDirectories(self.matching,workers,ordered)
+        for d,names in found:
+            results.append(d,names)
+            yield d,names
+        self._results=results
+
+    async def areload(self,
+        timeout:typing.Optional[float]=None
+        )->'tin.CompactResults':
+        """
+        asyncio version of reload()
+
+        If a reload is already in flight, this waits for that one
+        rather than starting another.
+
+        :param timeout: stop waiting after this many seconds
+            (the reload carries on for anyone else waiting)
+        """
+        return await self._areload(timeout)
+
+    def listing(self,
+        directory:URLCompatible
+        )->typing.Optional[typing.List[str]]:
+        """
+        The names of the children of a result directory,
+        as of when it was found
+
+        :return: None if it is not known
+        """
+        results=self._results
+        if not results:
+            return None
+        return results.listing(directory)
+
     @property
     def jsonObj(self)->typing.Dict:
         """
         the search critera as a json-compatible object
         """
         ret=DirectoriesSet.__dict__['jsonObj'].fget(self)
-        ret['matching']=self.matching
-        print(ret.items())
+        ret['name']=self.name
+        ret['matching']=matchingJsonObj(self.matching)
         return ret
     @jsonObj.setter
     def jsonObj(self,obj:typing.Dict):
-        DirectoriesSet.jsonObj(self)
-        self.matching=obj['matching']
+        DirectoriesSet.__dict__['jsonObj'].fset(self,obj)
+        self.name=obj.get('name',self.name)
+        if 'matching' in obj:
+            self.matching=matchingFromJsonObj(obj['matching'])
+        else:
+            self._results=None
+
+    def load(self,filename:typing.Optional[URLCompatible]=None)->None:
+        """
+        Load the search from a json file, or from a snapshot
+        (which brings back the results and index too)
+        """
+        if filename is None:
+            filename=self.filename
+        if filename is not None and tin.isSnapshot(filename):
+            tin.loadSnapshot(filename,self)
+        else:
+            DirectoriesSet.load(self,filename)
+
+    def saveSnapshot(self,filename:URLCompatible)->None:
+        """
+        Save the search, its results and its index (if it has one)
+        in a binary snapshot that load() can read back quickly
+        """
+        tin.saveSnapshot(self,filename)
 
     @property
     def results(self):
@@ -360,21 +929,41 @@ def cmdline(args:typing.Iterable[str])->int:
     else:
         ds=DirectoriesSet(r"c:\backed_up")
         didSomething=False
+        # [(name,matching)] for searches that come one after another,
+        # which are run together with a single walk
+        searches:typing.List[typing.Tuple[str,IsMatchParam]]=[]
+
+        def runSearches()->None:
+            """
+            Run the searches so far (before anything else changes the
+            settings, so everything still happens in order)
+            """
+            if not searches:
+                return
+            multi=tin.MultiSearch()
+            for name,matching in searches:
+                search=DirectoriesSearch(name,matching)
+                DirectoriesSet.__dict__['jsonObj'].fset(search,ds.jsonObj)
+                multi.add(search)
+            for name,results in multi.reload().items():
+                print('%s projects:'%name)
+                for d in results:
+                    print('   %s'%d)
+            searches.clear()
+
         for arg in args:
             if arg.startswith('-'):
                 av=[a.strip() for a in arg.split('=',1)]
+                if av[0] not in ['--git','--projecto']:
+                    runSearches()
                 if av[0] in ['-h','--help']:
                     printhelp=True
                 elif av[0]=='--git':
                     didSomething=True
-                    print('git projects:')
-                    for d in ds.directoriesContaining(".git"):
-                        print('   %s'%d)
+                    searches.append(('git',".git"))
                 elif av[0]=='--projecto':
-                    print('projecto projects:')
                     reg=re.compile(r"""project\.[x]?htm[l]?""")
-                    for d in ds.directoriesContaining(reg):
-                        print('   %s'%d)
+                    searches.append(('projecto',reg))
                 elif av[0]=='--save':
                     didSomething=True
                     ds.save(av[1])
@@ -383,7 +972,9 @@ def cmdline(args:typing.Iterable[str])->int:
                 else:
                     print('ERR: unknown argument "'+av[0]+'"')
             else:
+                runSearches()
                 ds.load(arg)
+        runSearches()
         if not didSomething:
             print('WARN: Did not do anything.')
             printhelp=True
@@ -0,0 +1,290 @@
+"""
+gitignore-style rules for pruning directories out of a scan
+
+Rules are checked against subdirectories as they come out of a
+listing, so an ignored subtree is never listed at all.
+
+Rule syntax (one per line in a .tinignore file):
+    # comment
+    name        any directory with this name, at any depth
+    *.egg-info  globs (*, ?, [abc]) match within a single name
+    /build      a leading / anchors a rule to the root being scanned
+    docs/build  so does a / in the middle
+    a/**/b      ** matches any number of directories
+    !keep       a leading ! un-ignores something an earlier rule ignored
+    name/       a trailing / is allowed (only directories are checked anyway)
+"""
+import typing
+import os
+import re
+import threading
+import tin
+
+
+# the name of the file in the root of a scan that holds extra rules
+IGNORE_FILENAME='.tinignore'
+
+# pseudo-rules for limits, as they appear in IgnoreMatcher.stats
+MAX_DEPTH_RULE='<maxDepth>'
+SYMLINK_RULE='<symlink>'
+
+
+def globToRegex(glob:str)->str:
+    """
+    Convert a gitignore-style glob into a regex string
+    (that must match the whole path)
+    """
+    ret=[]
+    i=0
+    n=len(glob)
+    while i<n:
+        c=glob[i]
+        if c=='*':
+            if glob.startswith('**',i):
+                if glob.startswith('**/',i):
+                    # any number of directories, including none
+                    ret.append('(?:.*/)?')
+                    i+=3
+                    continue
+                ret.append('.*')
+                i+=2
+                continue
+            ret.append('[^/]*')
+        elif c=='?':
+            ret.append('[^/]')
+        elif c=='[':
+            end=glob.find(']',i+2)
+            if end<0:
+                ret.append(re.escape(c))
+            else:
+                chars=glob[i+1:end]
+                if chars[0] in '!^':
+                    chars='^'+chars[1:]
+                ret.append('[%s]'%chars)
+                i=end
+        elif c=='\\' and i+1<n:
+            i+=1
+            ret.append(re.escape(glob[i]))
+        else:
+            ret.append(re.escape(c))
+        i+=1
+    return ''.join(ret)
+
+
+class IgnoreRule:
+    """
+    A single compiled ignore rule
+    """
+    __slots__=('text','negate','anchored','regex')
+
+    def __init__(self,text:str):
+        """
+        :param text: the rule, as it would appear in a .tinignore file
+        """
+        self.text:str=text
+        pattern=text
+        self.negate:bool=pattern.startswith('!')
+        if self.negate:
+            pattern=pattern[1:]
+        pattern=pattern.rstrip('/')
+        self.anchored:bool='/' in pattern
+        pattern=pattern.lstrip('/')
+        self.regex:str=globToRegex(pattern)
+
+    def __repr__(self)->str:
+        return 'IgnoreRule(%r)'%self.text
+
+
+def parseIgnoreRules(text:str)->typing.List[str]:
+    """
+    Get the rules out of the contents of a .tinignore file
+    """
+    ret=[]
+    for line in text.split('\n'):
+        line=line.strip()
+        if line and not line.startswith('#'):
+            ret.append(line)
+    return ret
+
+
+class _RuleSet:
+    """
+    Rules compiled together for speed
+    """
+
+    def __init__(self,rules:typing.List[IgnoreRule]):
+        self.rules:typing.List[IgnoreRule]=rules
+        self.hasNegation:bool=any(r.negate for r in rules)
+        self.names:typing.Dict[str,str]={}
+        nameParts=[]
+        pathParts=[]
+        self.groups:typing.Dict[str,str]={}
+        for i,rule in enumerate(rules):
+            group='r%d'%i
+            self.groups[group]=rule.text
+            if rule.anchored:
+                pathParts.append('(?P<%s>%s)'%(group,rule.regex))
+            elif rule.regex==re.escape(rule.text.rstrip('/')) \
+                and not rule.negate:
+                # a plain name, which is quicker to look up
+                self.names.setdefault(rule.text.rstrip('/'),rule.text)
+            else:
+                nameParts.append('(?P<%s>%s)'%(group,rule.regex))
+        self.nameRe:typing.Optional[typing.Pattern]=None
+        self.pathRe:typing.Optional[typing.Pattern]=None
+        if nameParts:
+            self.nameRe=re.compile('|'.join(nameParts))
+        if pathParts:
+            self.pathRe=re.compile('|'.join(pathParts))
+        self.regexes:typing.List[typing.Tuple[IgnoreRule,typing.Pattern]]=[
+            (r,re.compile(r.regex)) for r in rules]
+
+    def match(self,name:str,relpath:str)->typing.Optional[str]:
+        """
+        :return: the text of the rule that ignores this, or None
+        """
+        if self.hasNegation:
+            # the last rule that matches decides
+            for rule,regex in reversed(self.regexes):
+                if regex.fullmatch(relpath if rule.anchored else name):
+                    if rule.negate:
+                        return None
+                    return rule.text
+            return None
+        ret=self.names.get(name)
+        if ret is not None:
+            return ret
+        if self.nameRe is not None:
+            m=self.nameRe.fullmatch(name)
+            if m is not None:
+                return self.groups[m.lastgroup] # type: ignore
+        if self.pathRe is not None:
+            m=self.pathRe.fullmatch(relpath)
+            if m is not None:
+                return self.groups[m.lastgroup] # type: ignore
+        return None
+
+
+class IgnoreMatcher:
+    """
+    Decides which subdirectories to prune during a scan, and keeps
+    count of how many subtrees each rule pruned.
+    """
+
+    def __init__(self,
+        roots:typing.Iterable[str],
+        rules:typing.Iterable[str]=(),
+        maxDepth:typing.Optional[int]=None,
+        followSymlinks:bool=True,
+        useIgnoreFiles:bool=True):
+        """
+        :param roots: the directories the scan starts from
+        :param rules: gitignore-style rules that apply to all roots
+        :param maxDepth: how many levels below a root to go
+            (None=no limit, 0=only the root itself)
+        :param followSymlinks: whether to go into symlinked directories
+        :param useIgnoreFiles: whether to add the rules from each
+            root's .tinignore file
+        """
+        self.rules:typing.List[str]=list(rules)
+        self.maxDepth:typing.Optional[int]=maxDepth
+        self.followSymlinks:bool=followSymlinks
+        self.stats:typing.Dict[str,int]={}
+        self._statsLock=threading.Lock()
+        common=[IgnoreRule(r) for r in self.rules]
+        # longest first, so that nested roots are found first
+        self._roots:typing.List[typing.Tuple[str,_RuleSet]]=[]
+        roots=sorted(set(os.path.abspath(r) for r in roots),
+            key=len,reverse=True)
+        for root in roots:
+            rootRules=list(common)
+            if useIgnoreFiles:
+                try:
+                    with open(os.path.join(root,IGNORE_FILENAME),
+                        encoding='utf-8',errors='replace') as f:
+                        rootRules.extend([IgnoreRule(r)
+                            for r in parseIgnoreRules(f.read())])
+                except OSError:
+                    pass
+            self._roots.append((root,_RuleSet(rootRules)))
+        self.trivial:bool=maxDepth is None and followSymlinks \
+            and not any(ruleSet.rules for _,ruleSet in self._roots)
+
+    @property
+    def key(self)->str:
+        """
+        Identifies everything that affects what gets pruned
+        """
+        return repr((self.maxDepth,self.followSymlinks,
+            [(root,[r.text for r in ruleSet.rules])
+            for root,ruleSet in self._roots]))
+
+    def countPrune(self,rule:str)->None:
+        """
+        Record that a rule pruned a subtree
+        """
+        with self._statsLock:
+            self.stats[rule]=self.stats.get(rule,0)+1
+        stats=tin.activeStats()
+        if stats is not None:
+            stats.count('subtreesPruned')
+
+    def context(self,directory:str
+        )->typing.Optional[typing.Tuple[str,int,_RuleSet]]:
+        """
+        Work out where a directory is relative to its root
+
+        :return: (path relative to the root using /,depth,rules)
+            or None if it is not under any root
+        """
+        for root,ruleSet in self._roots:
+            if directory==root:
+                return '',0,ruleSet
+            if directory.startswith(root+os.sep):
+                rel=directory[len(root)+1:].replace(os.sep,'/')
+                return rel,rel.count('/')+1,ruleSet
+        return None
+
+    def allowChildren(self,
+        context:typing.Optional[typing.Tuple[str,int,_RuleSet]]
+        )->bool:
+        """
+        Whether subdirectories of the directory with this context
+        should be visited at all
+
+        NOTE: if not, it is up to the caller to count a MAX_DEPTH_RULE
+        prune, and only if the directory turns out to have any
+        """
+        if context is None or self.maxDepth is None:
+            return True
+        return context[1]<self.maxDepth
+
+    def prune(self,
+        context:typing.Optional[typing.Tuple[str,int,_RuleSet]],
+        entry:os.DirEntry
+        )->bool:
+        """
+        Whether to skip a subdirectory (counts a prune if so)
+
+        :param context: the context() of the directory it is in
+        """
+        if not self.followSymlinks:
+            try:
+                if entry.is_symlink():
+                    self.countPrune(SYMLINK_RULE)
+                    return True
+            except OSError:
+                pass
+        if context is None:
+            return False
+        rel,_,ruleSet=context
+        name=entry.name
+        if rel:
+            rel='%s/%s'%(rel,name)
+        else:
+            rel=name
+        rule=ruleSet.match(name,rel)
+        if rule is None:
+            return False
+        self.countPrune(rule)
+        return True
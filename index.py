@@ -0,0 +1,389 @@
+"""
+Persistent on-disk index of scanned directories
+
+Remembers, for every directory visited, its mtime, the names of its
+children, its (non-ignored) subdirectories and whether it matched.
+On the next scan a directory whose mtime has not changed does not need
+to be listed again, which turns a full rescan into one stat per directory.
+
+It can also hold a summary of each project (see tin.summary), so that
+they do not need to be worked out again after a restart.
+"""
+import typing
+import os
+import time
+import threading
+import sqlite3
+from paths import URLCompatible, URL, asURL
+import tin
+from tin import MatchBase
+if typing.TYPE_CHECKING:
+    from tin import DirectoriesSet
+
+
+# (path,mtime,child names,subdirectory names,matched) for one directory,
+# where the names are separated by \0
+IndexRow=typing.Tuple[str,int,str,str,typing.Optional[bool]]
+
+# filesystems only keep mtimes to a certain resolution, so a directory
+# modified this close to when it was scanned could change again without
+# its mtime changing.  Those get relisted next time.
+RACY_NS=2*1000*1000*1000
+
+
+class _IndexEntry:
+    """
+    What the index knows about a single directory
+    """
+    __slots__=('mtime','names','subdirs','matched')
+
+    def __init__(self,
+        mtime:int,
+        names:str,
+        subdirs:str,
+        matched:typing.Optional[bool]):
+        self.mtime:int=mtime
+        self.names:str=names
+        self.subdirs:str=subdirs
+        self.matched:typing.Optional[bool]=matched
+
+
+class ScanIndex:
+    """
+    Persistent on-disk index of scanned directories, stored in sqlite
+
+    NOTE: directory mtimes only change when entries are added, removed,
+        or renamed, so every directory is still stat'ed to see if it
+        changed, but unchanged ones are never listed.
+    NOTE: match verdicts are only kept while the search criteria and
+        ignore list stay the same (as identified by their repr()).
+        Verdicts that depend on file contents are always re-evaluated,
+        since editing a file does not change its directory's mtime.
+    """
+
+    def __init__(self,filename:URLCompatible):
+        """ """
+        self.filename:str=str(filename)
+        self._db:typing.Optional[sqlite3.Connection]=None
+        self._entries:typing.Optional[typing.Dict[str,_IndexEntry]]=None
+        self._matchKey:typing.Optional[str]=None
+        # gets the entries from somewhere other than the database
+        # (see restoreRows()) the next time they are needed
+        self._restore:typing.Optional[typing.Callable[[],
+            typing.Iterable[IndexRow]]]=None
+        self._lock=threading.RLock()
+        self.listed:int=0
+        self.reused:int=0
+
+    @property
+    def db(self)->sqlite3.Connection:
+        """
+        the database connection (opens it if necessary)
+        """
+        if self._db is None:
+            self._db=sqlite3.connect(self.filename,check_same_thread=False)
+            self._db.execute("""CREATE TABLE IF NOT EXISTS meta(
+                key TEXT PRIMARY KEY,value TEXT)""")
+            self._db.execute("""CREATE TABLE IF NOT EXISTS dirs(
+                path TEXT PRIMARY KEY,mtime INTEGER,
+                names TEXT,subdirs TEXT,matched INTEGER)""")
+            self._db.execute("""CREATE TABLE IF NOT EXISTS summaries(
+                path TEXT PRIMARY KEY,summary TEXT)""")
+            self._db.commit()
+        return self._db
+
+    def close(self)->None:
+        """
+        Close the database
+        """
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db=None
+            self._entries=None
+            self._restore=None
+
+    def clear(self)->None:
+        """
+        Forget everything in the index
+        """
+        with self._lock:
+            self.db.execute('DELETE FROM dirs')
+            self.db.execute('DELETE FROM summaries')
+            self.db.commit()
+            self._entries={}
+            self._restore=None
+
+    def _getMeta(self,key:str)->typing.Optional[str]:
+        row=self.db.execute('SELECT value FROM meta WHERE key=?',
+            (key,)).fetchone()
+        if row is None:
+            return None
+        return row[0]
+
+    def _setMeta(self,key:str,value:str)->None:
+        self.db.execute('INSERT OR REPLACE INTO meta(key,value) VALUES(?,?)',
+            (key,value))
+
+    def _load(self,
+        matchKey:str,
+        ignoreKey:str
+        )->typing.Dict[str,_IndexEntry]:
+        """
+        Load all entries into memory
+
+        Discards match verdicts if the matchKey is not what they
+        were created with, and forces everything to be relisted if
+        the ignoreKey has changed (since that changes which
+        subdirectories are recorded)
+        """
+        matchChanged=self._matchKey!=matchKey \
+            and self._getMeta('matchKey')!=matchKey
+        if matchChanged:
+            self.db.execute('UPDATE dirs SET matched=NULL')
+            self._setMeta('matchKey',matchKey)
+            self._entries=None
+        ignoreChanged=self._getMeta('ignoreKey')!=ignoreKey
+        if ignoreChanged:
+            self.db.execute('UPDATE dirs SET mtime=0')
+            self._setMeta('ignoreKey',ignoreKey)
+            self._entries=None
+        self.db.commit()
+        self._matchKey=matchKey
+        if self._entries is None:
+            entries:typing.Dict[str,_IndexEntry]={}
+            if self._restore is not None:
+                rows=self._restore()
+                self._restore=None
+            else:
+                rows=self.db.execute(
+                    'SELECT path,mtime,names,subdirs,matched FROM dirs')
+            for path,mtime,names,subdirs,matched in rows:
+                if matched is not None:
+                    matched=bool(matched)
+                if matchChanged:
+                    matched=None
+                if ignoreChanged:
+                    mtime=0
+                entries[path]=_IndexEntry(mtime,names,subdirs,matched)
+            self._entries=entries
+        return self._entries
+
+    def exportRows(self)->typing.Optional[
+        typing.Tuple[str,str,typing.List[IndexRow]]]:
+        """
+        Everything in the index, eg, to save in a snapshot
+
+        :return: (matchKey,ignoreKey,rows) or None if nothing has
+            been loaded (ie, there has not been a scan)
+        """
+        with self._lock:
+            if self._entries is None and self._restore is not None:
+                self._entries={path:_IndexEntry(mtime,names,subdirs,matched)
+                    for path,mtime,names,subdirs,matched in self._restore()}
+                self._restore=None
+            if self._entries is None or self._matchKey is None:
+                return None
+            ignoreKey=self._getMeta('ignoreKey') or ''
+            return self._matchKey,ignoreKey,[
+                (path,e.mtime,e.names,e.subdirs,e.matched)
+                for path,e in self._entries.items()]
+
+    def restoreRows(self,
+        matchKey:str,
+        ignoreKey:str,
+        rows:typing.Callable[[],typing.Iterable[IndexRow]]
+        )->None:
+        """
+        Replace what is in memory with rows from elsewhere,
+        eg, from a snapshot
+
+        NOTE: the database itself is not filled in, so this is meant
+            for an index that is only kept in memory (ScanIndex(':memory:'))
+
+        :param rows: gets the rows (only called when they are needed)
+        """
+        with self._lock:
+            self._setMeta('matchKey',matchKey)
+            self._setMeta('ignoreKey',ignoreKey)
+            self.db.commit()
+            self._matchKey=matchKey
+            self._entries=None
+            self._restore=rows
+
+    def loadSummaries(self)->typing.Dict[str,str]:
+        """
+        Get the project summaries kept in the index
+
+        :return: {directory:summary json}
+        """
+        with self._lock:
+            return dict(self.db.execute('SELECT path,summary FROM summaries'))
+
+    def storeSummaries(self,
+        summaries:typing.Dict[str,typing.Optional[str]]
+        )->None:
+        """
+        Add, replace or remove project summaries
+
+        :param summaries: {directory:summary json, or None to remove it}
+        """
+        if not summaries:
+            return
+        with self._lock:
+            db=self.db
+            db.executemany(
+                'INSERT OR REPLACE INTO summaries(path,summary) VALUES(?,?)',
+                [(path,summary) for path,summary in summaries.items()
+                    if summary is not None])
+            db.executemany('DELETE FROM summaries WHERE path=?',
+                [(path,) for path,summary in summaries.items()
+                    if summary is None])
+            db.commit()
+
+    def listing(self,path:str)->typing.Optional[typing.List[str]]:
+        """
+        Get the names of the children of a directory
+        as of the last time it was scanned
+
+        :return: None if the directory is not in the index
+        """
+        with self._lock:
+            if self._entries is None:
+                return None
+            entry=self._entries.get(path)
+        if entry is None:
+            return None
+        return entry.names.split('\0') if entry.names else []
+
+    def scan(self,
+        directoriesSet:'DirectoriesSet',
+        cleanMatches:typing.List[typing.Union[
+            MatchBase,
+            typing.Tuple[MatchBase,MatchBase]]]
+        )->typing.Generator[
+            typing.Tuple[URL,typing.List[str]],None,None]:
+        """
+        Walk the directories in the same order as directoriesSet.walk()
+        and yield (directory,names of its children) for the ones that
+        match, updating the index as we go.
+
+        Directories that are gone are removed from the index
+        once a scan has run to completion.
+
+        NOTE: the lock is only held while looking at each directory,
+            never while yielding, since whoever is iterating may carry
+            on from a different thread (eg, iterateBlocking()) or stop
+            part way through
+        """
+        yield from self._scan(directoriesSet,cleanMatches)
+
+    def _scan(self,
+        ds:'DirectoriesSet',
+        cleanMatches:typing.List[typing.Union[
+            MatchBase,
+            typing.Tuple[MatchBase,MatchBase]]]
+        )->typing.Generator[
+            typing.Tuple[URL,typing.List[str]],None,None]:
+        with self._lock:
+            entries=self._load(repr(cleanMatches),
+                repr(sorted(ds.ignore))+ds.pruner.key)
+        db=self.db
+        hasContents=any(isinstance(m,tuple) for m in cleanMatches)
+        notRacy=time.time_ns()-RACY_NS
+        visited:typing.Set[str]=set()
+        self.listed=0
+        self.reused=0
+        stats=tin.activeStats()
+
+        def check(dd:str)->typing.Tuple[bool,typing.List[str]]:
+            """
+            :return: (matched,subdirectories)
+            """
+            with self._lock:
+                return _check(dd)
+
+        def _check(dd:str)->typing.Tuple[bool,typing.List[str]]:
+            try:
+                if stats is not None:
+                    stats.count('stats')
+                mtime=os.stat(dd).st_mtime_ns
+            except OSError:
+                mtime=0
+            entry=entries.get(dd)
+            if entry is not None and mtime and entry.mtime==mtime:
+                self.reused+=1
+                matched=entry.matched
+                if matched is None or hasContents:
+                    names=entry.names.split('\0') if entry.names else []
+                    matched=ds._checkDirectory(asURL(dd),cleanMatches,names)
+                    if matched!=entry.matched:
+                        entry.matched=matched
+                        db.execute('UPDATE dirs SET matched=? WHERE path=?',
+                            (int(matched),dd))
+                if not entry.subdirs:
+                    return matched,[]
+                return matched,[os.path.join(dd,s)
+                    for s in entry.subdirs.split('\0')]
+            self.listed+=1
+            names,fullSubdirs=ds._scanDirectory(dd)
+            matched=ds._checkDirectory(asURL(dd),cleanMatches,names)
+            if mtime>=notRacy:
+                # don't trust it next time
+                mtime=0
+            entry=_IndexEntry(mtime,'\0'.join(names),
+                '\0'.join([os.path.basename(s) for s in fullSubdirs]),
+                matched)
+            entries[dd]=entry
+            db.execute("""INSERT OR REPLACE INTO dirs(
+                path,mtime,names,subdirs,matched) VALUES(?,?,?,?,?)""",
+                (dd,entry.mtime,entry.names,entry.subdirs,int(matched)))
+            return matched,fullSubdirs
+
+        def found(dd:str)->typing.Tuple[URL,typing.List[str]]:
+            with self._lock:
+                names=entries[dd].names
+            return asURL(dd),names.split('\0') if names else []
+
+        def r(root:str)->typing.Generator[
+            typing.Tuple[URL,typing.List[str]],None,None]:
+            # depth first, with a stack rather than recursion, so that
+            # there is no limit to how deep the directories can go
+            stack=[root]
+            while stack:
+                dd=stack.pop()
+                if dd in visited:
+                    continue
+                visited.add(dd)
+                matched,subdirs=check(dd)
+                if matched:
+                    yield found(dd)
+                # so that the first one comes off the stack first
+                stack.extend(reversed(subdirs))
+
+        completed=False
+        try:
+            for d in ds._recursiveDirectories:
+                yield from r(os.path.abspath(d))
+            # do the simple dirs last
+            # just in case they were already found by recursion
+            for d in ds._directories:
+                if d in ds.ignore:
+                    continue
+                d=os.path.abspath(d)
+                if d in visited:
+                    continue
+                visited.add(d)
+                matched,_=check(d)
+                if matched:
+                    yield found(d)
+            completed=True
+        finally:
+            with self._lock:
+                if completed:
+                    gone=[d for d in entries if d not in visited]
+                    for d in gone:
+                        del entries[d]
+                    db.executemany('DELETE FROM dirs WHERE path=?',
+                        [(d,) for d in gone])
+                db.commit()
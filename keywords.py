@@ -0,0 +1,138 @@
+"""
+Match many literal keywords at once, in a single pass over the data,
+using an Aho-Corasick automaton.
+"""
+import typing
+from tin import MatchBase
+
+
+class KeywordMatch(MatchBase):
+    """
+    Matches if any of a set of keywords appears anywhere in the string.
+
+    Unlike testing each keyword separately, the whole string is only
+    scanned once no matter how many keywords there are, and findAll()
+    reports which keywords were found, so one scan can answer
+    many queries.
+    """
+
+    def __init__(self,
+        keywords:typing.Iterable[str],
+        ignoreCase:bool=False):
+        """
+        :param keywords: the literal strings to look for
+        :param ignoreCase: whether to ignore upper/lower case
+        """
+        self.ignoreCase:bool=ignoreCase
+        self.keywords:typing.List[str]=[]
+        seen:typing.Set[str]=set()
+        for keyword in keywords:
+            if keyword and keyword not in seen:
+                seen.add(keyword)
+                self.keywords.append(keyword)
+        self._build()
+
+    def _build(self)->None:
+        """
+        Build the automaton
+        """
+        # state 0 is the root
+        goto:typing.List[typing.Dict[str,int]]=[{}]
+        outputs:typing.List[typing.Tuple[int,...]]=[()]
+        for i,keyword in enumerate(self.keywords):
+            if self.ignoreCase:
+                keyword=keyword.lower()
+            state=0
+            for ch in keyword:
+                nextState=goto[state].get(ch)
+                if nextState is None:
+                    nextState=len(goto)
+                    goto[state][ch]=nextState
+                    goto.append({})
+                    outputs.append(())
+                state=nextState
+            outputs[state]=outputs[state]+(i,)
+        # breadth-first to fill in the failure links, merging the outputs
+        # of each failure state into the state that fails to it
+        fail:typing.List[int]=[0]*len(goto)
+        queue:typing.List[int]=list(goto[0].values())
+        qi=0
+        while qi<len(queue):
+            state=queue[qi]
+            qi+=1
+            for ch,nextState in goto[state].items():
+                queue.append(nextState)
+                f=fail[state]
+                while f and ch not in goto[f]:
+                    f=fail[f]
+                target=goto[f].get(ch,0)
+                if target==nextState:
+                    target=0
+                fail[nextState]=target
+                if outputs[target]:
+                    outputs[nextState]=outputs[nextState]+outputs[target]
+        self._goto=goto
+        self._fail=fail
+        self._outputs=outputs
+        self._maxLength=max([len(k) for k in self.keywords],default=0)
+
+    @property
+    def maxMatchLength(self)->int:
+        """
+        The length of the longest keyword
+        """
+        return self._maxLength
+
+    @property
+    def streamable(self)->bool:
+        return True
+
+    def iterHits(self,
+        x:str
+        )->typing.Generator[typing.Tuple[int,str],None,None]:
+        """
+        Yield (start index,keyword) for every keyword occurrence in x,
+        in order of where they end
+        """
+        if self.ignoreCase:
+            x=x.lower()
+        goto=self._goto
+        fail=self._fail
+        outputs=self._outputs
+        keywords=self.keywords
+        state=0
+        for i,ch in enumerate(x):
+            while state and ch not in goto[state]:
+                state=fail[state]
+            state=goto[state].get(ch,0)
+            if outputs[state]:
+                for k in outputs[state]:
+                    keyword=keywords[k]
+                    yield i-len(keyword)+1,keyword
+
+    def findAll(self,x:str)->typing.Dict[str,int]:
+        """
+        Find out which keywords are in x
+
+        :return: {keyword:number of times it was found}
+        """
+        ret:typing.Dict[str,int]={}
+        for _,keyword in self.iterHits(x):
+            ret[keyword]=ret.get(keyword,0)+1
+        return ret
+
+    def matches(self,x:str)->bool:
+        """
+        check to see if any keyword is anywhere in x
+
+        :param x: [description]
+        :type x: str
+        :return: [description]
+        :rtype: bool
+        """
+        for _ in self.iterHits(x):
+            return True
+        return False
+
+    def __repr__(self)->str:
+        return 'KeywordMatch(%r,ignoreCase=%r)'%(self.keywords,self.ignoreCase)
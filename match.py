@@ -5,6 +5,7 @@ can build up like
     Match(and=(Match(("this","or this")),Match("but always this")))
 """
 import typing
+import re
 from abc import abstractmethod
 
 
@@ -49,6 +50,46 @@ class MatchBase:
         :rtype: bool
         """
 
+    def search(self,x:str)->bool:
+        """
+        check to see if anything within the string x matches our criteria
+
+        (by default, the same as matches())
+        """
+        return self.matches(x)
+
+    @property
+    def streamable(self)->bool:
+        """
+        Whether search() of a long string can be done as searches of
+        overlapping pieces of it, stopping at the first hit
+        """
+        return False
+
+    @property
+    def maxMatchLength(self)->typing.Optional[int]:
+        """
+        The longest string search() could ever find, if known
+
+        (used to decide how much to overlap pieces when streaming)
+        """
+        return None
+
+    def compile(self)->'MatchBase':
+        """
+        Get a faster, equivalent, version of this matcher
+
+        (by default, the matcher itself)
+        """
+        return self
+
+
+def _isSingleMatchable(m:typing.Any)->bool:
+    """
+    Whether m is a single matchable item, rather than a list of them
+    """
+    return isinstance(m,(str,MatchBase,re.Pattern))
+
 
 class Match(MatchBase):
     """
@@ -92,13 +133,21 @@ class Match(MatchBase):
     def append(self,anyOf,allOf,noneOf):
         """
         Add more match criteria
+
+        Each can be a single matchable item or an iterable of them
         """
-        if anyOf is not None:
-            self.anyOf.append(anyOf)
-        if allOf is not None:
-            self.anyOf.append(allOf)
-        if noneOf is not None:
-            self.anyOf.append(noneOf)
+        toLists=[self.anyOf,self.allOf,self.noneOf]
+        for items,toList in zip((anyOf,allOf,noneOf),toLists):
+            if items is None:
+                continue
+            if _isSingleMatchable(items):
+                toList.append(items)
+            else:
+                toList.extend(items)
+
+    def __repr__(self)->str:
+        return 'Match(anyOf=%r,allOf=%r,noneOf=%r)'%(
+            self.anyOf,self.allOf,self.noneOf)
 
     def _matchItem(self,m:IsMatchable,x:str):
         """
@@ -116,26 +165,334 @@ class Match(MatchBase):
         # must be a regex
         return m.match(x) is not None
 
-    def matches(self,x:str)->bool:
+    def _searchItem(self,m:IsMatchable,x:str):
         """
-        check to see if the string x matches our criteria
+        search for a single matchable item anywhere in x
+        """
+        if isinstance(m,str):
+            return m in x
+        if isinstance(m,MatchBase):
+            return m.search(x)
+        # must be a regex
+        return m.search(x) is not None
 
-        :param x: [description]
-        :type x: str
-        :return: [description]
-        :rtype: bool
+    def _evaluate(self,
+        x:str,
+        itemFn:typing.Callable[[IsMatchable,str],bool]
+        )->bool:
+        """
+        combine the results of itemFn for all of our items
         """
         defaultReturn=False
         for m in self.noneOf:
-            if self._matchItem(m,x):
+            if itemFn(m,x):
                 return False
             defaultReturn=True
         for m in self.anyOf:
-            if self._matchItem(m,x):
+            if itemFn(m,x):
                 return True
             defaultReturn=False
         for m in self.allOf:
-            if not self._matchItem(m,x):
+            if not itemFn(m,x):
                 return False
             defaultReturn=True
         return defaultReturn
+
+    def matches(self,x:str)->bool:
+        """
+        check to see if the string x matches our criteria
+
+        :param x: [description]
+        :type x: str
+        :return: [description]
+        :rtype: bool
+        """
+        return self._evaluate(x,self._matchItem)
+
+    def search(self,x:str)->bool:
+        """
+        check to see if anything within the string x matches our criteria
+
+        (strings are found anywhere, regexes are searched for rather
+        than matched at the start)
+        """
+        return self._evaluate(x,self._searchItem)
+
+    @property
+    def streamable(self)->bool:
+        """
+        Whether search() of a long string can be done as searches of
+        overlapping pieces of it, stopping at the first hit
+
+        (only true for a pure "any of" match)
+        """
+        if self.allOf or self.noneOf:
+            return False
+        for m in self.anyOf:
+            if isinstance(m,MatchBase) and not m.streamable:
+                return False
+        return True
+
+    @property
+    def maxMatchLength(self)->typing.Optional[int]:
+        """
+        The longest string search() could ever find, if known
+        """
+        longest=0
+        for m in self.anyOf+self.allOf:
+            if isinstance(m,str):
+                length:typing.Optional[int]=len(m)
+            elif isinstance(m,MatchBase):
+                length=m.maxMatchLength
+            else:
+                length=None
+            if length is None:
+                return None
+            longest=max(longest,length)
+        return longest
+
+    def compile(self)->'CompiledMatch':
+        """
+        Flatten this match tree into a single fast predicate
+
+        Literal strings are merged into set lookups and regexes
+        are merged into a single alternation
+        """
+        return CompiledMatch(self)
+
+
+# if a regex refers back to its own groups by number or name
+# (including as the condition of a (?(group)yes|no)),
+# merging it with others would break it
+_BACKREF_RE=re.compile(r"""\\[1-9]|\(\?P=|\(\?\(""")
+
+# flags that can be given to part of a regex, as (?flags:...)
+_INLINE_FLAGS=((re.IGNORECASE,'i'),(re.MULTILINE,'m'),(re.DOTALL,'s'),
+    (re.VERBOSE,'x'))
+_INLINE_FLAG_MASK=re.IGNORECASE|re.MULTILINE|re.DOTALL|re.VERBOSE
+
+
+def _mergeRegexes(regexes:typing.List[typing.Pattern]
+    )->typing.List[typing.Pattern]:
+    """
+    Merge what regexes we can into alternations
+
+    Regexes are only merged with others that have the same flags apart
+    from those that can be written inline (eg, re.ASCII changes what
+    \\w means, so those are kept apart from unicode ones).
+    """
+    # {flags that cannot be inline:[regexes]}
+    groups:typing.Dict[int,typing.List[typing.Pattern]]={}
+    for r in regexes:
+        if isinstance(r.pattern,str) and _BACKREF_RE.search(r.pattern) is None:
+            groups.setdefault(r.flags&~_INLINE_FLAG_MASK,[]).append(r)
+    merged:typing.Dict[int,typing.Pattern]={}
+    for groupFlags,group in groups.items():
+        if len(group)<2:
+            continue
+        parts=[]
+        for r in group:
+            flags=''.join([c for flag,c in _INLINE_FLAGS if r.flags&flag])
+            if flags:
+                parts.append('(?%s:%s)'%(flags,r.pattern))
+            else:
+                parts.append('(?:%s)'%r.pattern)
+        try:
+            combined=re.compile('|'.join(parts),groupFlags)
+        except re.error:
+            continue
+        for r in group:
+            merged[id(r)]=combined
+    # keep the original order, with each merged one where its first was
+    ret:typing.List[typing.Pattern]=[]
+    for r in regexes:
+        r=merged.get(id(r),r)
+        if not any(r is x for x in ret):
+            ret.append(r)
+    return ret
+
+def _anyOfPredicate(items:typing.Iterable[IsMatchable],
+    search:bool=False
+    )->typing.Optional[typing.Callable[[str],bool]]:
+    """
+    Build a single predicate that returns whether any of the items match
+
+    :param search: build one like search() rather than matches()
+    :return: None if there are no items
+    """
+    literals:typing.Set[str]=set()
+    regexes:typing.List[typing.Pattern]=[]
+    others:typing.List[typing.Callable[[str],bool]]=[]
+    def flatten(items:typing.Iterable[IsMatchable])->None:
+        for m in items:
+            if isinstance(m,str):
+                literals.add(m)
+            elif isinstance(m,re.Pattern):
+                regexes.append(m)
+            elif isinstance(m,Match) and m.anyOf and \
+                not m.allOf and not m.noneOf:
+                # a pure "any of" nested inside an "any of"
+                # (an empty Match is a leaf, since it still counts as an item)
+                flatten(m.anyOf)
+            elif isinstance(m,MatchBase):
+                if search:
+                    others.append(m.compile().search)
+                else:
+                    others.append(m.compile().matches)
+    flatten(items)
+    if search and literals:
+        # when searching, a literal is the same as an escaped regex
+        regexes.insert(0,re.compile('|'.join(
+            [re.escape(literal) for literal in sorted(literals)])))
+        literals=set()
+    regexes=_mergeRegexes(regexes)
+    checks:typing.List[typing.Callable[[str],bool]]=[]
+    if literals:
+        checks.append(frozenset(literals).__contains__)
+    for r in regexes:
+        rmatch=r.search if search else r.match
+        checks.append(lambda x,rmatch=rmatch:rmatch(x) is not None)
+    checks.extend(others)
+    if not checks:
+        return None
+    if len(checks)==1:
+        return checks[0]
+    checkTuple=tuple(checks)
+    def anyOf(x:str)->bool:
+        for check in checkTuple:
+            if check(x):
+                return True
+        return False
+    return anyOf
+
+
+def _allOfPredicate(items:typing.Iterable[IsMatchable],
+    search:bool=False
+    )->typing.Optional[typing.Callable[[str],bool]]:
+    """
+    Build a single predicate that returns whether all of the items match
+
+    :param search: build one like search() rather than matches()
+    :return: None if there are no items
+    """
+    checks:typing.List[typing.Callable[[str],bool]]=[]
+    def flatten(items:typing.Iterable[IsMatchable])->None:
+        for m in items:
+            if isinstance(m,Match) and m.allOf and \
+                not m.anyOf and not m.noneOf:
+                # a pure "all of" nested inside an "all of"
+                # (an empty Match is a leaf, since it never matches)
+                flatten(m.allOf)
+            else:
+                check=_anyOfPredicate([m],search)
+                if check is not None:
+                    checks.append(check)
+    flatten(items)
+    if not checks:
+        return None
+    if len(checks)==1:
+        return checks[0]
+    checkTuple=tuple(checks)
+    def allOf(x:str)->bool:
+        for check in checkTuple:
+            if not check(x):
+                return False
+        return True
+    return allOf
+
+
+class CompiledMatch(MatchBase):
+    """
+    A Match that has been flattened into a single fast predicate
+
+    Use Match.compile() to create one.
+    """
+
+    def __init__(self,match:Match):
+        """ """
+        self.match:Match=match
+        self._predicate:typing.Callable[[str],bool]=self._build(False)
+        self._searchPredicate:typing.Optional[
+            typing.Callable[[str],bool]]=None
+
+    def _build(self,search:bool)->typing.Callable[[str],bool]:
+        """
+        Build the predicate function
+
+        :param search: build one like search() rather than matches()
+        """
+        match=self.match
+        noneOf=_anyOfPredicate(match.noneOf,search)
+        anyOf=_anyOfPredicate(match.anyOf,search)
+        allOf=_allOfPredicate(match.allOf,search)
+        # the default when nothing else decides it
+        # (this follows the same logic as Match.matches)
+        if allOf is not None:
+            fallback=allOf
+        elif anyOf is not None:
+            fallback=None
+        elif noneOf is not None:
+            fallback=True
+        else:
+            fallback=None
+        # build the simplest possible function for the situation
+        predicate:typing.Callable[[str],bool]
+        if noneOf is None and allOf is None:
+            if anyOf is None:
+                def predicate(x:str)->bool:
+                    return False
+            else:
+                predicate=anyOf
+        else:
+            def predicate(x:str)->bool:
+                if noneOf is not None and noneOf(x):
+                    return False
+                if anyOf is not None and anyOf(x):
+                    return True
+                if fallback is None:
+                    return False
+                if fallback is True:
+                    return True
+                return fallback(x)
+        return predicate
+
+    def matches(self,x:str)->bool:
+        """
+        check to see if the string x matches our criteria
+
+        :param x: [description]
+        :type x: str
+        :return: [description]
+        :rtype: bool
+        """
+        return bool(self._predicate(x))
+
+    def search(self,x:str)->bool:
+        """
+        check to see if anything within the string x matches our criteria
+        """
+        if self._searchPredicate is None:
+            self._searchPredicate=self._build(True)
+        return bool(self._searchPredicate(x))
+
+    @property
+    def streamable(self)->bool:
+        return self.match.streamable
+
+    @property
+    def maxMatchLength(self)->typing.Optional[int]:
+        return self.match.maxMatchLength
+
+    @property
+    def predicate(self)->typing.Callable[[str],bool]:
+        """
+        The raw predicate function (fastest, but may return
+        a truthy value rather than exactly True)
+        """
+        return self._predicate
+
+    def compile(self)->'CompiledMatch':
+        return self
+
+    def __repr__(self)->str:
+        return 'CompiledMatch(%r)'%self.match
@@ -0,0 +1,225 @@
+"""
+Run many DirectoriesSearch objects with a single walk
+
+Every directory is listed once, however many searches cover it,
+and each search still only sees what its own directories, ignore
+names and ignore rules allow.
+
+eg:
+    multi=MultiSearch([gitSearch,projectoSearch,finder.directorySearch])
+    for name,found in multi.reload().items():
+        ...
+"""
+import typing
+import os
+from paths import URL, asURL
+import tin
+if typing.TYPE_CHECKING:
+    from tin import DirectoriesSearch,CleanMatches
+
+
+def _mergeOrders(orders:typing.List[typing.List[str]]
+    )->typing.List[typing.Tuple[str,int]]:
+    """
+    Merge several lists of directories (one per search) into a single
+    list of (directory,bitmask of the searches it is for)
+
+    Each search's own directories still come in its own order, and a
+    directory is only in the list once wherever that does not change
+    anybody's order.
+    """
+    merged:typing.List[typing.List[typing.Any]]=[]
+    # {directory:where it was last put in merged}
+    latest:typing.Dict[str,int]={}
+    for i,order in enumerate(orders):
+        bit=1<<i
+        # this search's directories must go after here
+        pos=0
+        for path in order:
+            j=latest.get(path)
+            if j is None or j<pos:
+                j=len(merged)
+                merged.append([path,0])
+                latest[path]=j
+            merged[j][1]|=bit
+            pos=j+1
+    return [(path,mask) for path,mask in merged]
+
+
+class MultiSearch:
+    """
+    A collection of named searches that are reloaded together
+
+    NOTE: the searches' index and workers settings are not used,
+        since the point is to share a single walk
+    """
+
+    def __init__(self,
+        searches:typing.Optional[typing.Iterable['DirectoriesSearch']]=None):
+        """
+        :param searches: the searches (each is known by its name)
+        """
+        self._searches:typing.Dict[str,'DirectoriesSearch']={}
+        if searches is not None:
+            for search in searches:
+                self.add(search)
+
+    def add(self,search:'DirectoriesSearch')->None:
+        """
+        Add a search (replacing any other search with the same name)
+        """
+        self._searches[search.name]=search
+
+    def remove(self,name:str)->None:
+        """
+        Remove a search by name
+        """
+        if name in self._searches:
+            del self._searches[name]
+
+    @property
+    def searches(self)->typing.Dict[str,'DirectoriesSearch']:
+        """
+        {name:search}
+        """
+        return self._searches
+
+    def reload(self)->typing.Dict[str,'tin.CompactResults']:
+        """
+        Run every search
+
+        Afterwards, each search's results and listings are the same
+        as if it had been reloaded by itself.
+
+        :return: {name:results}
+        """
+        stats=tin.activeStats()
+        if stats is not None:
+            start=stats.start('reload')
+        for _ in self.iterReload():
+            pass
+        if stats is not None:
+            stats.end('reload',start)
+        return self.results
+
+    @property
+    def results(self)->typing.Dict[str,'tin.CompactResults']:
+        """
+        {name:results} for every search
+        (any that have not been run yet are run on their own)
+        """
+        return {name:search.results for name,search in self._searches.items()}
+
+    def iterReload(self)->typing.Generator[
+        typing.Tuple['DirectoriesSearch',URL,typing.List[str]],None,None]:
+        """
+        The same as reload(), only yields (search,directory,names of
+        its children) for each result as soon as it is found
+
+        A directory is yielded once for every search it matches.
+
+        The results (and listings) of each search are only replaced
+        once the walk is finished.
+
+        NOTE: what is yielded for one search comes in the same order as
+            reloading it on its own, but may be interleaved with other
+            searches' results
+        """
+        searches:typing.List['DirectoriesSearch']=[]
+        cleanMatches:typing.List['CleanMatches']=[]
+        for search in self._searches.values():
+            if search.matching is None:
+                continue
+            search.reloadIgnoreRules()
+            searches.append(search)
+            cleanMatches.append(search._cleanMatches(search.matching))
+        bits=[(i,1<<i) for i in range(len(searches))]
+        # the paths are shared, since the searches cover the same tree
+        table=tin.PathTable()
+        results=[tin.CompactResults(table) for _ in searches]
+        # where each search starts, in the order it would on its own
+        roots=_mergeOrders([[os.path.abspath(d)
+            for d in search._recursiveDirectories] for search in searches])
+        # which searches have already seen each directory
+        visited:typing.Dict[str,int]={}
+
+        def check(path:str,mask:int,names:typing.List[str]
+            )->typing.Generator[
+                typing.Tuple['DirectoriesSearch',URL,typing.List[str]],
+                None,None]:
+            url=asURL(path)
+            for i,bit in bits:
+                if mask&bit and searches[i]._checkDirectory(
+                    url,cleanMatches[i],names):
+                    results[i].append(path,names)
+                    yield searches[i],url,names
+
+        # depth first, with a single stack, so that looking at only
+        # the entries for any one search, it is the same as that
+        # search's own walk (and its results come out in the same order)
+        stack:typing.List[typing.Tuple[str,int]]=list(reversed(roots))
+        while stack:
+            path,mask=stack.pop()
+            mask&=~visited.get(path,0)
+            if not mask:
+                continue
+            visited[path]=visited.get(path,0)|mask
+            entries,names=self._list(path)
+            # {subdirectory:mask of the searches that go into it}
+            children:typing.Dict[str,int]={}
+            for i,bit in bits:
+                if mask&bit:
+                    for d in searches[i]._subdirectories(path,entries):
+                        children[d]=children.get(d,0)|bit
+            # in the order they were listed, which is each search's order
+            stack.extend(reversed([(entry.path,children[entry.path])
+                for entry in entries if entry.path in children]))
+            yield from check(path,mask,names)
+        # do the simple dirs last
+        # just in case they were already found by recursion
+        simple=_mergeOrders([[os.path.abspath(d)
+            for d in search._directories if d not in search.ignore]
+            for search in searches])
+        for path,mask in simple:
+            mask&=~visited.get(path,0)
+            if not mask:
+                continue
+            visited[path]=visited.get(path,0)|mask
+            _,names=self._list(path)
+            yield from check(path,mask,names)
+        for i,search in enumerate(searches):
+            search._results=results[i]
+
+    def _list(self,
+        path:str
+        )->typing.Tuple[typing.List[os.DirEntry],typing.List[str]]:
+        """
+        List a directory once for all of the searches
+
+        :return: (entries,names)
+        """
+        entries:typing.List[os.DirEntry]=[]
+        stats=tin.activeStats()
+        if stats is not None:
+            start=stats.start('list')
+        try:
+            with os.scandir(path) as it:
+                entries=list(it)
+        except OSError:
+            # unreadable (permissions, vanished, etc) so treat as empty
+            pass
+        names=[entry.name for entry in entries]
+        if stats is not None:
+            stats.end('list',start)
+            stats.count('directoriesVisited')
+            stats.count('entriesListed',len(names))
+        return entries,names
+
+    def __getitem__(self,name:str)->'DirectoriesSearch':
+        return self._searches[name]
+
+    def __len__(self)->int:
+        return len(self._searches)
+
+    def __iter__(self)->typing.Iterator['DirectoriesSearch']:
+        return iter(self._searches.values())
@@ -0,0 +1,282 @@
+"""
+Multi-threaded, work-stealing directory scanner
+
+Listing directories on network shares and spinning disks is
+dominated by latency rather than cpu, so having several listings
+in flight at once makes a big difference even with the GIL.
+"""
+import typing
+import os
+import threading
+import collections
+import queue
+from paths import URL, asURL
+from tin import MatchBase
+if typing.TYPE_CHECKING:
+    from tin import DirectoriesSet
+
+
+CleanMatches=typing.List[typing.Union[
+    MatchBase,
+    typing.Tuple[MatchBase,MatchBase]]]
+
+
+class _Node:
+    """
+    A single directory in the scan tree
+    """
+    __slots__=('path','children','matched','done','names')
+
+    def __init__(self,path:str):
+        self.path:str=path
+        self.children:typing.List['_Node']=[]
+        self.matched:bool=False
+        self.done:bool=False
+        # only kept if it matched
+        self.names:typing.Optional[typing.List[str]]=None
+
+
+class ParallelScanner:
+    """
+    Scans the recursive directories of a DirectoriesSet using
+    a pool of worker threads.
+
+    Each worker keeps its own deque of directories to visit, works
+    depth-first off the end of it, and when it runs dry steals from
+    the front of another worker's deque (where the biggest
+    unexplored subtrees are).
+
+    Results are yielded as (directory,names of its children) as soon
+    as they become available.  When ordered
+    is True, they come out in exactly the same order as the
+    single-threaded walk.  When ordered is False, they come out
+    as soon as any worker finds them.
+    """
+
+    def __init__(self,
+        directoriesSet:'DirectoriesSet',
+        cleanMatches:CleanMatches,
+        workers:int=4,
+        ordered:bool=True):
+        """ """
+        self.directoriesSet:'DirectoriesSet'=directoriesSet
+        self.cleanMatches:CleanMatches=cleanMatches
+        self.workers:int=max(1,workers)
+        self.ordered:bool=ordered
+        self._deques:typing.List[typing.Deque[_Node]]=[]
+        self._visited:typing.Set[str]=set()
+        self._visitedLock=threading.Lock()
+        self._pending:int=0
+        self._workCond=threading.Condition()
+        self._doneCond=threading.Condition()
+        self._output:queue.Queue=queue.Queue()
+        self._stop:bool=False
+        self._error:typing.Optional[BaseException]=None
+
+    def _roots(self)->typing.List[typing.List[str]]:
+        """
+        All recursive roots as absolute paths, in the order the
+        single-threaded walk goes through them
+
+        :return: batches of roots to scan one after another
+            (a root inside an earlier root of the same batch starts a
+            new batch, since whether the walk reaches it from above
+            or on its own depends on what gets pruned on the way down)
+        """
+        batches:typing.List[typing.List[str]]=[[]]
+        seen:typing.Set[str]=set()
+        for d in self.directoriesSet._recursiveDirectories:
+            d=os.path.abspath(d)
+            if d in seen:
+                continue
+            seen.add(d)
+            for other in batches[-1]:
+                if d.startswith(other.rstrip(os.sep)+os.sep):
+                    batches.append([])
+                    break
+            batches[-1].append(d)
+        return [batch for batch in batches if batch]
+
+    def _markVisited(self,path:str)->bool:
+        """
+        :return: False if the path was already visited
+        """
+        with self._visitedLock:
+            if path in self._visited:
+                return False
+            self._visited.add(path)
+            return True
+
+    def _push(self,worker:int,nodes:typing.List[_Node])->None:
+        """
+        Add nodes to a worker's deque
+        """
+        if not nodes:
+            return
+        with self._workCond:
+            self._pending+=len(nodes)
+            # reversed, so that popping off the end goes in listing order
+            self._deques[worker].extend(reversed(nodes))
+            self._workCond.notify(len(nodes))
+
+    def _take(self,worker:int)->typing.Optional[_Node]:
+        """
+        Get the next node to work on, stealing if necessary
+        """
+        try:
+            return self._deques[worker].pop()
+        except IndexError:
+            pass
+        for i in range(1,self.workers):
+            try:
+                return self._deques[(worker+i)%self.workers].popleft()
+            except IndexError:
+                pass
+        return None
+
+    def _finished(self,node:_Node)->None:
+        """
+        Called after a node is completely processed
+        """
+        if self.ordered:
+            with self._doneCond:
+                node.done=True
+                self._doneCond.notify_all()
+        elif node.matched:
+            self._output.put((asURL(node.path),node.names))
+        with self._workCond:
+            self._pending-=1
+            if self._pending<=0:
+                self._workCond.notify_all()
+                if not self.ordered:
+                    self._output.put(None)
+
+    def _process(self,worker:int,node:_Node)->None:
+        """
+        List a directory, check it, and queue its children
+        """
+        ds=self.directoriesSet
+        names,subdirs=ds._scanDirectory(node.path)
+        node.matched=ds._checkDirectory(
+            asURL(node.path),self.cleanMatches,names)
+        if node.matched:
+            node.names=names
+        node.children=[_Node(d) for d in subdirs if self._markVisited(d)]
+        self._push(worker,node.children)
+
+    def _work(self,worker:int)->None:
+        """
+        The main loop of a worker thread
+        """
+        while not self._stop:
+            node=self._take(worker)
+            if node is None:
+                with self._workCond:
+                    if self._pending<=0 or self._stop:
+                        return
+                    self._workCond.wait(0.05)
+                continue
+            try:
+                self._process(worker,node)
+            except BaseException as e: # pylint: disable=broad-except
+                self._error=e
+                self.stop()
+                return
+            self._finished(node)
+
+    def stop(self)->None:
+        """
+        Ask all workers to stop as soon as possible
+        """
+        self._stop=True
+        with self._workCond:
+            self._workCond.notify_all()
+        with self._doneCond:
+            self._doneCond.notify_all()
+        if not self.ordered:
+            self._output.put(None)
+
+    def _waitFor(self,node:_Node)->None:
+        with self._doneCond:
+            while not node.done and not self._stop:
+                self._doneCond.wait()
+
+    def _results(self,roots:typing.List[_Node])->typing.Generator[
+        typing.Tuple[URL,typing.List[str]],None,None]:
+        """
+        yield (directory,names of its children) from the running workers
+        """
+        if self.ordered:
+            stack=list(reversed(roots))
+            while stack:
+                node=stack.pop()
+                self._waitFor(node)
+                if self._stop:
+                    return
+                if node.matched:
+                    yield asURL(node.path),node.names or []
+                stack.extend(reversed(node.children))
+        else:
+            while True:
+                d=self._output.get()
+                if d is None:
+                    return
+                yield d
+
+    def _scanRoots(self,paths:typing.List[str])->typing.Generator[
+        typing.Tuple[URL,typing.List[str]],None,bool]:
+        """
+        Scan some roots (and everything under them) with the workers
+
+        :return: False if it was stopped before finishing
+        """
+        self._deques=[collections.deque() for _ in range(self.workers)]
+        self._output=queue.Queue()
+        self._pending=0
+        self._stop=False
+        roots=[_Node(d) for d in paths if self._markVisited(d)]
+        if not roots:
+            # (nothing would ever end the unordered output)
+            return True
+        # deal the roots out so that every worker starts on something
+        for i,node in enumerate(roots):
+            self._push(i%self.workers,[node])
+        threads=[]
+        for i in range(self.workers):
+            t=threading.Thread(target=self._work,args=(i,),daemon=True)
+            threads.append(t)
+            t.start()
+        try:
+            yield from self._results(roots)
+        finally:
+            stopped=self._stop
+            self.stop()
+            for t in threads:
+                t.join()
+        if self._error is not None:
+            raise self._error
+        return not stopped
+
+    def __iter__(self)->typing.Generator[
+        typing.Tuple[URL,typing.List[str]],None,None]:
+        """
+        yields (directory,names of its children) for every match
+        """
+        self._visited=set()
+        self._error=None
+        for batch in self._roots():
+            finished=yield from self._scanRoots(batch)
+            if not finished:
+                return
+        # do the simple dirs last
+        # just in case they were already found by recursion
+        ds=self.directoriesSet
+        for d in ds._directories:
+            if d in ds.ignore:
+                continue
+            d=os.path.abspath(d)
+            if not self._markVisited(d):
+                continue
+            names,_=ds._scanDirectory(d)
+            if ds._checkDirectory(asURL(d),self.cleanMatches,names):
+                yield asURL(d),names
@@ -0,0 +1,450 @@
+"""
+Parse TIN files into sections and items
+
+Supports plain text, markdown, and html (the same formats as
+ACCEPTABLE_EXTENSIONS).  A heading index makes looking up
+any section a single dict lookup.
+"""
+import typing
+import re
+import sys
+import functools
+from html.parser import HTMLParser
+
+
+# bullet, optional checkbox, and the rest of the line
+_ITEM_RE=re.compile(
+    r"""^(?P<indent>\s*)(?:(?:[-*+•]|\d+[.)])\s+)?"""
+    r"""(?:\[(?P<check>[ xX])\]\s*)?(?P<text>.*?)\s*$""")
+_MD_HEADING_RE=re.compile(r"""^(#{1,6})\s+(.*?)\s*#*\s*$""")
+_UNDERLINE_RE=re.compile(r"""^\s*(={3,}|-{3,})\s*$""")
+_HTML_HEADINGS=('h1','h2','h3','h4','h5','h6')
+
+
+def normalizeHeading(heading:str)->str:
+    """
+    The form headings are indexed by
+    (lower case, no surrounding space, no trailing colon)
+    """
+    heading=heading.strip().lower()
+    if heading.endswith(':'):
+        heading=heading[:-1].rstrip()
+    return heading
+
+
+def _noteHeadingLine(
+    headingLines:typing.Dict[str,int],
+    i:int,
+    line:str,
+    lastLine:str
+    )->None:
+    """
+    Add line i to a dict of heading->line number if it is one that
+    findHeadingLine() would find (and no earlier line already was)
+
+    :param line: the line, stripped
+    :param lastLine: the line before it, stripped
+    """
+    if not line:
+        return
+    if line[-1]==':':
+        key=line.lower()
+        if key not in headingLines:
+            headingLines[key]=i
+    if line.startswith('---') or line.startswith('==='):
+        # it's a separator, so the previous line could be a heading
+        key=lastLine.lower()
+        if key not in headingLines:
+            headingLines[key]=i
+
+
+@functools.lru_cache(maxsize=16)
+def headingLines(text:str)->typing.Dict[str,int]:
+    """
+    Every heading findHeadingLine() can find in the text,
+    as {lower case heading:line number}
+
+    NOTE: the result is cached, so do not change it
+    """
+    ret:typing.Dict[str,int]={}
+    lastLine=''
+    for i,line in enumerate(text.split('\n')):
+        line=line.strip()
+        _noteHeadingLine(ret,i,line,lastLine)
+        lastLine=line
+    return ret
+
+
+def findHeadingLine(text:str,heading:str)->int:
+    """
+    Find a heading by looking at the lines of the text
+
+    A line matches if it ends with a colon and is the heading
+    (ignoring case and surrounding space), or if it is an underline
+    and the line before it is the heading.
+
+    :return: the line number of the matching line (the underline,
+        for an underlined heading) or -1 if not found
+    """
+    return headingLines(text).get(heading.strip().lower(),-1)
+
+
+class TinItem:
+    """
+    A single item (usually a line) in a tin file
+    """
+    __slots__=('text','checked','indent','line','offset')
+
+    def __init__(self,
+        text:str,
+        checked:typing.Optional[bool],
+        indent:int,
+        line:int,
+        offset:int):
+        """
+        :param checked: True/False for a checkbox, None if there is not one
+        :param line: the line number it is on
+        :param offset: the character offset of the start of that line
+        """
+        self.text:str=text
+        self.checked:typing.Optional[bool]=checked
+        self.indent:int=indent
+        self.line:int=line
+        self.offset:int=offset
+
+    def __repr__(self)->str:
+        return 'TinItem(%r,%r,%r,%r,%r)'%(
+            self.text,self.checked,self.indent,self.line,self.offset)
+
+
+class TinSection:
+    """
+    A heading and the items under it
+
+    The first section of every document has no heading, and
+    holds anything that comes before the first real heading.
+    """
+    __slots__=('heading','level','line','offset','end','items')
+
+    def __init__(self,
+        heading:typing.Optional[str],
+        level:int,
+        line:int,
+        offset:int):
+        """
+        :param level: 1 is the biggest heading
+        :param line: the line number of the heading
+        :param offset: the character offset of the start of that line
+        """
+        self.heading:typing.Optional[str]=heading
+        self.level:int=level
+        self.line:int=line
+        self.offset:int=offset
+        # the line after the end of this section
+        self.end:int=line
+        self.items:typing.List[TinItem]=[]
+
+    def __repr__(self)->str:
+        return 'TinSection(%r,%d items)'%(self.heading,len(self.items))
+
+
+class TinDocument:
+    """
+    A parsed tin file
+    """
+    __slots__=('format','text','sections','headingIndex','headingLines')
+
+    def __init__(self,text:str,fileFormat:str='txt'):
+        """
+        :param fileFormat: txt, md, htm or html
+        """
+        self.format:str=fileFormat.lower()
+        self.text:str=text
+        self.sections:typing.List[TinSection]=[]
+        self.headingIndex:typing.Dict[str,int]={}
+        # what findHeading() looks in (see findHeadingLine())
+        self.headingLines:typing.Dict[str,int]={}
+        if self.isHtml:
+            self._parseHtml()
+        else:
+            self._parseLines(text.split('\n'),0,0)
+
+    @property
+    def isHtml(self)->bool:
+        """
+        whether this is an html document
+        """
+        return self.format in ('htm','html')
+
+    def _addSection(self,section:TinSection)->None:
+        if section.heading is not None:
+            key=normalizeHeading(section.heading)
+            if key not in self.headingIndex:
+                self.headingIndex[key]=len(self.sections)
+        self.sections.append(section)
+
+    def _parseLines(self,
+        lines:typing.List[str],
+        startLine:int,
+        startOffset:int
+        )->None:
+        """
+        Parse plain text or markdown, from startLine on,
+        adding to the existing sections
+        """
+        markdown=self.format=='md'
+        offset=startOffset
+        if not self.sections:
+            self._addSection(TinSection(None,0,0,0))
+        section=self.sections[-1]
+        # the last item, if it was on the previous line
+        # (since an underline could turn it into a heading)
+        lastItem:typing.Optional[TinItem]=None
+        headingLines=self.headingLines
+        lastLine=lines[startLine-1].strip() if startLine>0 else ''
+        for i in range(startLine,len(lines)):
+            line=lines[i]
+            stripped=line.strip()
+            _noteHeadingLine(headingLines,i,stripped,lastLine)
+            lastLine=stripped
+            heading:typing.Optional[str]=None
+            level=0
+            headingLine=i
+            headingOffset=offset
+            mdHeading=None
+            if markdown and stripped.startswith('#'):
+                mdHeading=_MD_HEADING_RE.match(stripped)
+            if not stripped:
+                lastItem=None
+            elif _UNDERLINE_RE.match(line) and lastItem is not None:
+                # the previous line was a heading all along
+                section.items.pop()
+                heading=lastItem.text
+                level=1 if stripped[0]=='=' else 2
+                headingLine=lastItem.line
+                headingOffset=lastItem.offset
+            elif mdHeading is not None:
+                heading=mdHeading.group(2)
+                level=len(mdHeading.group(1))
+            elif stripped[-1]==':' and stripped[0] not in '-*+[':
+                heading=stripped
+                level=1
+            else:
+                m=_ITEM_RE.match(line)
+                check=m.group('check') # type: ignore
+                checked=None if check is None else check!=' '
+                lastItem=TinItem(m.group('text'),checked, # type: ignore
+                    len(m.group('indent')),i,offset) # type: ignore
+                section.items.append(lastItem)
+            if heading is not None:
+                lastItem=None
+                section.end=headingLine
+                section=TinSection(heading,level,headingLine,headingOffset)
+                self._addSection(section)
+            offset+=len(line)+1
+            section.end=i+1
+
+    def _parseHtml(self)->None:
+        """
+        Parse html (headings are h1-h6 and items are li)
+        """
+        doc=self
+        lineOffsets=[0]
+        lastLine=''
+        for i,line in enumerate(self.text.split('\n')):
+            lineOffsets.append(lineOffsets[-1]+len(line)+1)
+            line=line.strip()
+            _noteHeadingLine(self.headingLines,i,line,lastLine)
+            lastLine=line
+
+        class Parser(HTMLParser):
+            def __init__(self):
+                HTMLParser.__init__(self)
+                self.section=TinSection(None,0,0,0)
+                doc._addSection(self.section)
+                self.heading:typing.Optional[typing.List[typing.Any]]=None
+                self.item:typing.Optional[typing.List[typing.Any]]=None
+                self.depth=0
+
+            def handle_starttag(self,tag,attrs):
+                line=self.getpos()[0]-1
+                if tag in _HTML_HEADINGS:
+                    self.heading=[int(tag[1]),line,[]]
+                elif tag in ('ul','ol'):
+                    self.depth+=1
+                elif tag=='li':
+                    self.flushItem()
+                    self.item=[None,line,[],max(0,self.depth-1)]
+                elif tag=='input' and self.item is not None:
+                    attrs=dict(attrs)
+                    if attrs.get('type','').lower()=='checkbox':
+                        self.item[0]='checked' in attrs
+
+            def handle_endtag(self,tag):
+                line=self.getpos()[0]-1
+                if tag in _HTML_HEADINGS and self.heading is not None:
+                    self.flushItem()
+                    level,start,text=self.heading
+                    self.heading=None
+                    self.section.end=start
+                    self.section=TinSection(' '.join(''.join(text).split()),
+                        level,start,lineOffsets[start])
+                    doc._addSection(self.section)
+                elif tag=='li':
+                    self.flushItem()
+                elif tag in ('ul','ol'):
+                    self.flushItem()
+                    self.depth=max(0,self.depth-1)
+                self.section.end=line+1
+
+            def handle_data(self,data):
+                if self.heading is not None:
+                    self.heading[2].append(data)
+                elif self.item is not None:
+                    self.item[2].append(data)
+
+            def flushItem(self):
+                if self.item is None:
+                    return
+                checked,line,text,depth=self.item
+                self.item=None
+                text=' '.join(''.join(text).split())
+                if text or checked is not None:
+                    self.section.items.append(TinItem(text,checked,
+                        depth,line,lineOffsets[line]))
+
+        parser=Parser()
+        parser.feed(self.text)
+        parser.close()
+        parser.flushItem()
+
+    def update(self,text:str)->'TinDocument':
+        """
+        Get a document for a new version of the text, only re-parsing
+        from the section where it starts to differ from this one
+
+        (html is always fully re-parsed)
+        """
+        if text==self.text:
+            return self
+        if self.isHtml:
+            return TinDocument(text,self.format)
+        oldLines=self.text.split('\n')
+        newLines=text.split('\n')
+        n=min(len(oldLines),len(newLines))
+        firstDiff=0
+        while firstDiff<n and oldLines[firstDiff]==newLines[firstDiff]:
+            firstDiff+=1
+        # keep sections that finish before the line ahead of the change
+        # (since a changed line could be an underline for the one before)
+        keep=0
+        for section in self.sections:
+            if section.end>=firstDiff-1:
+                break
+            keep+=1
+        if keep==0:
+            return TinDocument(text,self.format)
+        ret=TinDocument.__new__(TinDocument)
+        ret.format=self.format
+        ret.text=text
+        ret.sections=[]
+        ret.headingIndex={}
+        ret.headingLines={}
+        for section in self.sections[0:keep]:
+            ret._addSection(section)
+        # the last kept section might pick up more items, so copy it
+        last=ret.sections[-1]
+        copy=TinSection(last.heading,last.level,last.line,last.offset)
+        copy.end=last.end
+        copy.items=list(last.items)
+        ret.sections[-1]=copy
+        startLine=copy.end
+        startOffset=sum([len(line)+1 for line in newLines[0:startLine]])
+        # the lines before startLine are the same, and so are their headings
+        ret.headingLines={key:line
+            for key,line in self.headingLines.items() if line<startLine}
+        ret._parseLines(newLines,startLine,startOffset)
+        return ret
+
+    def compact(self)->typing.Tuple[typing.Any,...]:
+        """
+        Everything but the text, as plain tuples, which are much
+        smaller and faster to pickle (eg, to send between processes)
+
+        Use fromCompact() to turn it back into a TinDocument.
+        """
+        return (self.format,[
+            (s.heading,s.level,s.line,s.offset,s.end,
+                [(i.text,i.checked,i.indent,i.line,i.offset) for i in s.items])
+            for s in self.sections],dict(self.headingLines))
+
+    @classmethod
+    def fromCompact(cls,
+        text:str,
+        compact:typing.Tuple[typing.Any,...]
+        )->'TinDocument':
+        """
+        Recreate a document from its text and the result of compact()
+        """
+        ret=cls.__new__(cls)
+        ret.format=compact[0]
+        ret.text=text
+        ret.sections=[]
+        ret.headingIndex={}
+        ret.headingLines=dict(compact[2])
+        for heading,level,line,offset,end,items in compact[1]:
+            section=TinSection(heading,level,line,offset)
+            section.end=end
+            section.items=[TinItem(*item) for item in items]
+            ret._addSection(section)
+        return ret
+
+    def section(self,heading:str)->typing.Optional[TinSection]:
+        """
+        Find a section by its heading (case insensitive)
+        """
+        idx=self.headingIndex.get(normalizeHeading(heading))
+        if idx is None:
+            return None
+        return self.sections[idx]
+
+    def findHeading(self,heading:str)->int:
+        """
+        returns the line number where the heading is located,
+        or -1 if not found
+
+        NOTE: this goes by the lines of the text, the same as
+        findHeadingLine(), not by the parsed sections
+        """
+        return self.headingLines.get(heading.strip().lower(),-1)
+
+    @property
+    def items(self)->typing.Iterable[TinItem]:
+        """
+        All items in all sections
+        """
+        for section in self.sections:
+            yield from section.items
+
+    @property
+    def approximateSize(self)->int:
+        """
+        Roughly how many bytes of memory this takes up
+        (not counting the text itself)
+        """
+        size=sys.getsizeof(self)+sys.getsizeof(self.headingIndex)
+        size+=sys.getsizeof(self.headingLines)
+        for section in self.sections:
+            size+=sys.getsizeof(section)+sys.getsizeof(section.items)
+            for item in section.items:
+                size+=sys.getsizeof(item)+sys.getsizeof(item.text)
+        return size
+
+
+def parseTin(text:str,fileFormat:str='txt')->TinDocument:
+    """
+    Parse the text of a tin file
+
+    :param fileFormat: txt, md, htm, or html (usually the file extension)
+    """
+    return TinDocument(text,fileFormat)
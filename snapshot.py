@@ -0,0 +1,321 @@
+"""
+Versioned binary snapshots of a DirectoriesSearch
+
+A snapshot holds the search's settings, its results (with the listing
+each was found with) and its ScanIndex, so that a cold start can carry
+on from the last scan rather than doing it all again.
+
+The file is read through mmap.  Numbers are kept in arrays that are
+copied straight out of the mapping without any parsing, and the parts
+that are not needed straight away (listings and index rows) are only
+decoded the first time something asks for them.
+
+Layout (little-endian):
+    MAGIC, version:uint32, number of sections:uint32
+    for each section: name:16s, offset:uint64, length:uint64
+    the sections themselves, each starting on an 8 byte boundary
+
+Sections:
+    config          json settings (see saveSnapshot())
+    pathNames       \\0 separated names of every PathTable entry
+    pathParents     int64 parent id of every PathTable entry
+    results         int64 path id of each result
+    names           \\0 separated table of names found in listings
+    listingOffsets  int64 where each result's listing starts in
+                    listingNames (plus where the last one ends)
+    listingNames    uint32 indexes into names
+    listingMtimes   int64 mtime of each result when its listing was
+                    taken (0 if not known, so it gets listed again)
+    indexPaths      int64 path id of each index row
+    indexMtimes     int64 mtime of each index row
+    indexMatched    int8 whether each index row matched (-1=unknown)
+    indexOffsets    int64 where each row's child names, then its
+                    subdirectory names, start in indexNames
+    indexNames      uint32 indexes into names
+"""
+import typing
+import os
+import sys
+import json
+import mmap
+import array
+import struct
+from paths import URLCompatible
+import tin
+if typing.TYPE_CHECKING:
+    from tin import DirectoriesSearch
+
+
+MAGIC=b'TINSNAP\0'
+
+# bump this when the layout changes
+# (older versions are refused rather than misread)
+SNAPSHOT_VERSION=1
+
+_HEADER=struct.Struct('<8sII')
+_SECTION=struct.Struct('<16sQQ')
+
+
+def isSnapshot(filename:URLCompatible)->bool:
+    """
+    Whether a file is a snapshot (as opposed to, eg, a json config)
+    """
+    try:
+        with open(str(filename),'rb') as f:
+            return f.read(len(MAGIC))==MAGIC
+    except OSError:
+        return False
+
+
+def _encodeNames(names:typing.List[str])->bytes:
+    return '\0'.join(names).encode('utf-8','surrogateescape')
+
+
+def _decodeNames(data:typing.Union[bytes,memoryview])->typing.List[str]:
+    if not len(data):
+        return []
+    return bytes(data).decode('utf-8','surrogateescape').split('\0')
+
+
+def _arrayBytes(a:array.array)->bytes:
+    if sys.byteorder!='little':
+        a=array.array(a.typecode,a)
+        a.byteswap()
+    return a.tobytes()
+
+
+class _NameTable:
+    """
+    Gives each distinct name a number, for saving
+    """
+
+    def __init__(self):
+        self.names:typing.List[str]=[]
+        self._ids:typing.Dict[str,int]={}
+
+    def ids(self,names:typing.Iterable[str])->typing.List[int]:
+        """
+        The numbers of some names (adding any new ones)
+        """
+        ret:typing.List[int]=[]
+        for name in names:
+            i=self._ids.get(name)
+            if i is None:
+                i=len(self.names)
+                self.names.append(name)
+                self._ids[name]=i
+            ret.append(i)
+        return ret
+
+
+class Snapshot:
+    """
+    An open snapshot file
+    """
+
+    def __init__(self,filename:URLCompatible):
+        """
+        :raises Exception: if it is not a snapshot this can read
+        """
+        self.filename:str=str(filename)
+        with open(self.filename,'rb') as f:
+            # (the mapping stays valid after the file is closed)
+            self._mmap=mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+        magic,version,count=_HEADER.unpack_from(self._mmap,0)
+        if magic!=MAGIC:
+            raise Exception('"%s" is not a snapshot'%self.filename)
+        if version!=SNAPSHOT_VERSION:
+            raise Exception('"%s" is snapshot version %d, not %d'%(
+                self.filename,version,SNAPSHOT_VERSION))
+        self.version:int=version
+        # {name:(offset,length)}
+        self._sections:typing.Dict[str,typing.Tuple[int,int]]={}
+        for i in range(count):
+            name,offset,length=_SECTION.unpack_from(self._mmap,
+                _HEADER.size+i*_SECTION.size)
+            self._sections[name.rstrip(b'\0').decode('ascii')]= \
+                (offset,length)
+        self._names:typing.Optional[typing.List[str]]=None
+
+    def section(self,name:str)->memoryview:
+        """
+        The raw bytes of a section (empty if there is no such section)
+        """
+        offset,length=self._sections.get(name,(0,0))
+        return memoryview(self._mmap)[offset:offset+length]
+
+    def array(self,name:str,typecode:str)->array.array:
+        """
+        A section as an array
+        """
+        ret=array.array(typecode)
+        ret.frombytes(self.section(name))
+        if sys.byteorder!='little':
+            ret.byteswap()
+        return ret
+
+    def strings(self,name:str)->typing.List[str]:
+        """
+        A section of \\0 separated names
+        """
+        return _decodeNames(self.section(name))
+
+    @property
+    def config(self)->typing.Dict[str,typing.Any]:
+        """
+        The settings saved with the snapshot
+        """
+        return json.loads(bytes(self.section('config')).decode('utf-8'))
+
+    def names(self)->typing.List[str]:
+        """
+        The table of names used by listings and the index
+        (decoded the first time it is needed)
+        """
+        if self._names is None:
+            self._names=self.strings('names')
+        return self._names
+
+    def indexRows(self,
+        table:'tin.PathTable'
+        )->typing.Generator['tin.IndexRow',None,None]:
+        """
+        The saved ScanIndex rows
+        """
+        names=self.names()
+        paths=self.array('indexPaths','q')
+        mtimes=self.array('indexMtimes','q')
+        matched=self.array('indexMatched','b')
+        offsets=self.array('indexOffsets','q')
+        flat=self.array('indexNames','I')
+
+        def joined(start:int,end:int)->str:
+            return '\0'.join([names[flat[j]] for j in range(start,end)])
+
+        for i,pathId in enumerate(paths):
+            m=matched[i]
+            yield (table.path(pathId),mtimes[i],
+                joined(offsets[2*i],offsets[2*i+1]),
+                joined(offsets[2*i+1],offsets[2*i+2]),
+                None if m<0 else bool(m))
+
+
+def saveSnapshot(search:'DirectoriesSearch',filename:URLCompatible)->None:
+    """
+    Save a search, its results and its index
+
+    The file is written alongside and then moved into place, so that
+    anyone reading the old one is unaffected.
+    """
+    table=tin.PathTable()
+    names=_NameTable()
+    config:typing.Dict[str,typing.Any]={'search':search.jsonObj}
+    sections:typing.Dict[str,bytes]={}
+    exported=None
+    if search.index is not None:
+        exported=search.index.exportRows()
+    # {path:mtime when it was listed} as far as the index knows
+    indexMtimes:typing.Dict[str,int]={}
+    if exported is not None:
+        indexMtimes={row[0]:row[1] for row in exported[2]}
+    results=search._results
+    if results is not None:
+        config['results']=len(results)
+        ids=array.array('q')
+        offsets=array.array('q',[0])
+        flat=array.array('I')
+        mtimes=array.array('q')
+        for i in range(len(results)):
+            path=results.path(i)
+            ids.append(table.add(path))
+            flat.extend(names.ids(results.listingAt(i) or ()))
+            offsets.append(len(flat))
+            mtime=results.listingMtime(i)
+            if mtime is None:
+                mtime=indexMtimes.get(path,0)
+            mtimes.append(mtime)
+        sections['results']=_arrayBytes(ids)
+        sections['listingOffsets']=_arrayBytes(offsets)
+        sections['listingNames']=_arrayBytes(flat)
+        sections['listingMtimes']=_arrayBytes(mtimes)
+    if exported is not None:
+        matchKey,ignoreKey,rows=exported
+        config['index']={'matchKey':matchKey,'ignoreKey':ignoreKey}
+        paths=array.array('q')
+        mtimes=array.array('q')
+        matched=array.array('b')
+        offsets=array.array('q',[0])
+        flat=array.array('I')
+        for path,mtime,childNames,subdirs,m in rows:
+            paths.append(table.add(path))
+            mtimes.append(mtime)
+            matched.append(-1 if m is None else int(m))
+            for joined in (childNames,subdirs):
+                if joined:
+                    flat.extend(names.ids(joined.split('\0')))
+                offsets.append(len(flat))
+        sections['indexPaths']=_arrayBytes(paths)
+        sections['indexMtimes']=_arrayBytes(mtimes)
+        sections['indexMatched']=_arrayBytes(matched)
+        sections['indexOffsets']=_arrayBytes(offsets)
+        sections['indexNames']=_arrayBytes(flat)
+    sections['pathNames']=_encodeNames(table._names)
+    sections['pathParents']=_arrayBytes(table._parents)
+    sections['names']=_encodeNames(names.names)
+    sections['config']=json.dumps(config).encode('utf-8')
+    # lay it out
+    offset=_HEADER.size+len(sections)*_SECTION.size
+    header=[_HEADER.pack(MAGIC,SNAPSHOT_VERSION,len(sections))]
+    body:typing.List[bytes]=[]
+    for name,data in sections.items():
+        padding=-offset%8
+        body.append(b'\0'*padding)
+        offset+=padding
+        header.append(_SECTION.pack(name.encode('ascii'),offset,len(data)))
+        body.append(data)
+        offset+=len(data)
+    filename=str(filename)
+    temporary=filename+'.tmp'
+    with open(temporary,'wb') as f:
+        f.write(b''.join(header))
+        f.write(b''.join(body))
+    os.replace(temporary,filename)
+
+
+def loadSnapshot(filename:URLCompatible,
+    search:typing.Optional['DirectoriesSearch']=None
+    )->'DirectoriesSearch':
+    """
+    Load a search from a snapshot
+
+    If the search has no index of its own, it gets an in-memory one
+    filled from the snapshot, so that the next reload only needs to
+    relist what changed.  (A search with an index file keeps using it.)
+
+    :param search: load into this search (default=a new one)
+    :return: the search
+    """
+    snapshot=Snapshot(filename)
+    config=snapshot.config
+    if search is None:
+        search=tin.DirectoriesSearch('',None)
+    search.jsonObj=config['search']
+    table=tin.PathTable.fromArrays(snapshot.array('pathParents','q'),
+        snapshot.strings('pathNames'))
+    if 'results' in config:
+        listings=tin.PackedListings(snapshot.array('listingOffsets','q'),
+            snapshot.array('listingNames','I'),snapshot.names)
+        search._results=tin.CompactResults.fromArrays(table,
+            snapshot.array('results','q'),listings)
+        # the listings are as old as the snapshot, so each is checked
+        # against the directory's mtime before it is trusted
+        mtimes=snapshot.array('listingMtimes','q')
+        if len(mtimes)!=len(search._results):
+            mtimes=array.array('q',bytes(8*len(search._results)))
+        search._results.listingMtimes=mtimes
+    index=config.get('index')
+    if index is not None and search.index is None:
+        search.index=tin.ScanIndex(':memory:')
+        search.index.restoreRows(index['matchKey'],index['ignoreKey'],
+            lambda:snapshot.indexRows(table))
+    return search
@@ -0,0 +1,229 @@
+"""
+Optional instrumentation of scanning and reading
+
+Turn it on with enableStats().  While it is off, each instrumented
+place only costs a check for None.
+
+Phases that are timed:
+    list        listing a directory
+    stat        checking whether something changed
+    match       matching filenames
+    content     matching file contents (including reading them)
+    read        getting tin file data
+    reload      a whole reload
+
+Counters:
+    directoriesVisited,entriesListed,subtreesPruned,stats,
+    filesOpened,bytesRead,matchEvaluations,tinReads
+"""
+import typing
+import time
+import threading
+
+
+# a hook is called as hook(event,phase,stats) where event is
+# 'start' or 'end' (eg, to turn a profiler on and off around reloads)
+StatsHook=typing.Callable[[str,str,'ScanStats'],None]
+
+
+class Histogram:
+    """
+    Durations, bucketed by powers of two (of microseconds)
+    """
+    __slots__=('count','total','min','max','buckets')
+
+    def __init__(self):
+        self.count:int=0
+        self.total:float=0.0
+        self.min:float=0.0
+        self.max:float=0.0
+        # {bucket:count} where bucket n holds durations under 2**n us
+        self.buckets:typing.Dict[int,int]={}
+
+    def add(self,seconds:float)->None:
+        """
+        Add a duration
+        """
+        if self.count==0 or seconds<self.min:
+            self.min=seconds
+        if seconds>self.max:
+            self.max=seconds
+        self.count+=1
+        self.total+=seconds
+        bucket=int(seconds*1000000).bit_length()
+        self.buckets[bucket]=self.buckets.get(bucket,0)+1
+
+    @property
+    def mean(self)->float:
+        """
+        The average duration
+        """
+        if not self.count:
+            return 0.0
+        return self.total/self.count
+
+    def percentile(self,p:float)->float:
+        """
+        Roughly where the given percentile falls
+        (the top of the bucket it is in, so never an underestimate)
+
+        :param p: 0..100
+        """
+        if not self.count:
+            return 0.0
+        wanted=self.count*p/100.0
+        seen=0
+        for bucket in sorted(self.buckets):
+            seen+=self.buckets[bucket]
+            if seen>=wanted:
+                return min(self.max,(1<<bucket)/1000000.0)
+        return self.max
+
+    @property
+    def jsonObj(self)->typing.Dict[str,typing.Any]:
+        """
+        the histogram as a general Json object
+        """
+        return {'count':self.count,'total':self.total,'min':self.min,
+            'max':self.max,'mean':self.mean,
+            'p50':self.percentile(50),'p90':self.percentile(90),
+            'p99':self.percentile(99),
+            'buckets':{str(k):v for k,v in sorted(self.buckets.items())}}
+
+
+class ScanStats:
+    """
+    Counters and timing histograms collected while stats are enabled
+    """
+
+    def __init__(self):
+        self.counters:typing.Dict[str,int]={}
+        self.histograms:typing.Dict[str,Histogram]={}
+        self._hooks:typing.List[StatsHook]=[]
+        self._lock=threading.Lock()
+
+    def reset(self)->None:
+        """
+        Forget everything collected so far (hooks are kept)
+        """
+        with self._lock:
+            self.counters={}
+            self.histograms={}
+
+    def addHook(self,hook:StatsHook)->None:
+        """
+        Call a function at the start and end of every phase
+        """
+        self._hooks.append(hook)
+
+    def removeHook(self,hook:StatsHook)->None:
+        """
+        Stop calling a function added with addHook()
+        """
+        if hook in self._hooks:
+            self._hooks.remove(hook)
+
+    def count(self,name:str,n:int=1)->None:
+        """
+        Add to a counter
+        """
+        with self._lock:
+            self.counters[name]=self.counters.get(name,0)+n
+
+    def counted(self,name:str,fn:typing.Callable)->typing.Callable:
+        """
+        Wrap a function so that every call adds one to a counter
+        """
+        def wrapper(*args):
+            self.count(name)
+            return fn(*args)
+        return wrapper
+
+    def start(self,phase:str)->float:
+        """
+        Start timing a phase
+
+        :return: the start time, to pass to end()
+        """
+        for hook in self._hooks:
+            hook('start',phase,self)
+        return time.perf_counter()
+
+    def end(self,phase:str,start:float)->None:
+        """
+        Finish timing a phase
+        """
+        elapsed=time.perf_counter()-start
+        with self._lock:
+            histogram=self.histograms.get(phase)
+            if histogram is None:
+                histogram=Histogram()
+                self.histograms[phase]=histogram
+            histogram.add(elapsed)
+        for hook in self._hooks:
+            hook('end',phase,self)
+
+    @property
+    def jsonObj(self)->typing.Dict[str,typing.Any]:
+        """
+        the stats as a general Json object
+        """
+        with self._lock:
+            return {'counters':dict(self.counters),
+                'phases':{k:v.jsonObj for k,v in self.histograms.items()}}
+
+    def report(self)->str:
+        """
+        The stats as readable text
+        """
+        ret=['counters:']
+        with self._lock:
+            for name in sorted(self.counters):
+                ret.append('   %-20s %12d'%(name,self.counters[name]))
+            ret.append('phases:                  count    total ms'
+                '     mean ms      p90 ms      max ms')
+            for name in sorted(self.histograms):
+                h=self.histograms[name]
+                ret.append('   %-20s %8d %11.2f %11.3f %11.3f %11.3f'%(
+                    name,h.count,h.total*1000,h.mean*1000,
+                    h.percentile(90)*1000,h.max*1000))
+        return '\n'.join(ret)
+
+    def __str__(self)->str:
+        return self.report()
+
+
+_activeStats:typing.Optional[ScanStats]=None
+
+
+def activeStats()->typing.Optional[ScanStats]:
+    """
+    The stats being collected, or None if stats are not enabled
+    """
+    return _activeStats
+
+
+def enableStats(stats:typing.Optional[ScanStats]=None)->ScanStats:
+    """
+    Start collecting stats
+
+    :param stats: where to collect them (default=a new ScanStats)
+    :return: the stats being collected
+    """
+    global _activeStats
+    if stats is None:
+        stats=ScanStats()
+    _activeStats=stats
+    return stats
+
+
+def disableStats()->typing.Optional[ScanStats]:
+    """
+    Stop collecting stats
+
+    :return: what was collected, if anything
+    """
+    global _activeStats
+    ret=_activeStats
+    _activeStats=None
+    return ret
@@ -0,0 +1,419 @@
+"""
+Summaries of projects (how much is left to do, how long it has been
+waiting, how big their files are) worked out from their tin files
+
+Each file is summarised in a single pass over its parsed items, and
+is only looked at again when its (mtime,size) changes, so keeping the
+summaries of thousands of projects up to date costs a stat per tin
+file.  Given a ScanIndex, they are kept there so that they survive
+a restart.
+
+eg:
+    summaries=ProjectSummaries(finder.directorySearch.index)
+    summaries.update(finder.results)
+    print(summaryTable(summaries.values()))
+"""
+import typing
+import os
+import re
+import time
+import json
+import threading
+import tin
+if typing.TYPE_CHECKING:
+    from tin import Tin,TinDocument,ScanIndex
+
+
+# the kinds of tin files whose items are counted
+COUNTED_KINDS=('todo',)
+
+# items under headings like these are closed, even without a checkbox
+DONE_HEADINGS=('done','completed','finished','closed')
+
+_DATE_RE=re.compile(r"""\b(\d{4})-(\d{2})-(\d{2})\b""")
+
+
+def itemDate(text:str)->typing.Optional[int]:
+    """
+    The date written in an item (as yyyy-mm-dd), if there is one
+
+    :return: local midnight of that date in ns since the epoch
+    """
+    m=_DATE_RE.search(text)
+    if m is None:
+        return None
+    year,month,day=[int(g) for g in m.groups()]
+    if not 1<=month<=12 or not 1<=day<=31:
+        return None
+    try:
+        return int(time.mktime((year,month,day,0,0,0,0,0,-1)))*1000000000
+    except (OverflowError,ValueError):
+        return None
+
+
+class FileSummary:
+    """
+    The summary of a single tin file
+    """
+    __slots__=('filename','mtime','size','openItems','closedItems',
+        'firstSeen')
+
+    def __init__(self,filename:str='',mtime:int=0,size:int=0):
+        """
+        :param filename: its name within the project directory
+        :param mtime: in ns
+        """
+        self.filename:str=filename
+        self.mtime:int=mtime
+        self.size:int=size
+        self.openItems:int=0
+        self.closedItems:int=0
+        # {open item text:when it was first seen, in ns}
+        self.firstSeen:typing.Dict[str,int]={}
+
+    @property
+    def oldestOpen(self)->typing.Optional[int]:
+        """
+        When the oldest open item was first seen (in ns)
+
+        :return: None if nothing is open
+        """
+        if not self.firstSeen:
+            return None
+        return min(self.firstSeen.values())
+
+    @property
+    def jsonObj(self)->typing.Dict[str,typing.Any]:
+        """
+        this object as json-compatible data
+        """
+        return {
+            'filename':self.filename,
+            'mtime':self.mtime,
+            'size':self.size,
+            'open':self.openItems,
+            'closed':self.closedItems,
+            'firstSeen':self.firstSeen}
+    @jsonObj.setter
+    def jsonObj(self,jsonObj:typing.Dict[str,typing.Any]):
+        self.filename=jsonObj['filename']
+        self.mtime=jsonObj['mtime']
+        self.size=jsonObj['size']
+        self.openItems=jsonObj.get('open',0)
+        self.closedItems=jsonObj.get('closed',0)
+        self.firstSeen=jsonObj.get('firstSeen',{})
+
+
+def summarizeDocument(doc:'TinDocument',
+    filename:str,
+    mtime:int,
+    size:int,
+    previous:typing.Optional[FileSummary]=None
+    )->FileSummary:
+    """
+    Count the open and closed items of a parsed tin file
+
+    An item is closed if its checkbox is checked, or if it has no
+    checkbox and is under a heading in DONE_HEADINGS.
+
+    An open item counts as first seen on the date written in it,
+    otherwise when the previous summary saw it, otherwise at the
+    file's mtime (which is the latest it could have been added).
+
+    :param previous: the summary of the file before it changed
+    """
+    ret=FileSummary(filename,mtime,size)
+    seenBefore:typing.Dict[str,int]={}
+    if previous is not None:
+        seenBefore=previous.firstSeen
+    firstSeen=ret.firstSeen
+    for section in doc.sections:
+        done=section.heading is not None \
+            and tin.normalizeHeading(section.heading) in DONE_HEADINGS
+        for item in section.items:
+            if not item.text:
+                continue
+            if item.checked or (item.checked is None and done):
+                ret.closedItems+=1
+                continue
+            ret.openItems+=1
+            if item.text in firstSeen:
+                continue
+            seen=itemDate(item.text)
+            if seen is None:
+                seen=seenBefore.get(item.text,mtime)
+            firstSeen[item.text]=seen
+    return ret
+
+
+class ProjectSummary:
+    """
+    The summary of a project, made up from those of its tin files
+    """
+    __slots__=('name','path','files')
+
+    def __init__(self,name:str='',path:str=''):
+        """ """
+        self.name:str=name
+        self.path:str=path
+        # {tin kind:summary}
+        self.files:typing.Dict[str,FileSummary]={}
+
+    def _counted(self)->typing.List[FileSummary]:
+        return [self.files[kind] for kind in COUNTED_KINDS
+            if kind in self.files]
+
+    @property
+    def openItems(self)->int:
+        """
+        How many items are still to do
+        """
+        return sum([f.openItems for f in self._counted()])
+
+    @property
+    def closedItems(self)->int:
+        """
+        How many items are done
+        """
+        return sum([f.closedItems for f in self._counted()])
+
+    @property
+    def lastModified(self)->typing.Optional[int]:
+        """
+        The mtime of the most recently changed tin file (in ns)
+
+        :return: None if there are no tin files
+        """
+        if not self.files:
+            return None
+        return max([f.mtime for f in self.files.values()])
+
+    @property
+    def sizes(self)->typing.Dict[str,int]:
+        """
+        {tin kind:file size in bytes}
+        """
+        return {kind:f.size for kind,f in self.files.items()}
+
+    @property
+    def totalBytes(self)->int:
+        """
+        The size of all of the tin files together
+        """
+        return sum([f.size for f in self.files.values()])
+
+    @property
+    def oldestOpen(self)->typing.Optional[int]:
+        """
+        When the oldest open item was first seen (in ns)
+
+        :return: None if nothing is open
+        """
+        oldest=[f.oldestOpen for f in self._counted()
+            if f.oldestOpen is not None]
+        if not oldest:
+            return None
+        return min(oldest)
+
+    def oldestOpenAge(self,now:typing.Optional[float]=None
+        )->typing.Optional[float]:
+        """
+        How long the oldest open item has been waiting, in seconds
+
+        :param now: the time to measure from (default=now)
+        :return: None if nothing is open
+        """
+        oldest=self.oldestOpen
+        if oldest is None:
+            return None
+        if now is None:
+            now=time.time()
+        return max(0.0,now-oldest/1e9)
+
+    @property
+    def jsonObj(self)->typing.Dict[str,typing.Any]:
+        """
+        this object as json-compatible data
+        """
+        return {
+            'name':self.name,
+            'path':self.path,
+            'files':{kind:f.jsonObj for kind,f in self.files.items()}}
+    @jsonObj.setter
+    def jsonObj(self,jsonObj:typing.Dict[str,typing.Any]):
+        self.name=jsonObj['name']
+        self.path=jsonObj['path']
+        self.files={}
+        for kind,fileObj in jsonObj.get('files',{}).items():
+            f=FileSummary()
+            f.jsonObj=fileObj
+            self.files[kind]=f
+
+
+def summarizeProject(project:'Tin',
+    previous:typing.Optional[ProjectSummary]=None
+    )->ProjectSummary:
+    """
+    Summarise a project, only reading the files that have changed
+    since the previous summary
+
+    :return: the previous summary itself if nothing has changed
+    """
+    ret=ProjectSummary(project.name,project.path)
+    previousFiles:typing.Dict[str,FileSummary]={}
+    if previous is not None:
+        previousFiles=previous.files
+    changed=previous is None or previous.name!=project.name
+    tinFiles=project.tinFiles()
+    for kind in tin.FIELDS:
+        filename=project.tinFilename(kind,tinFiles)
+        old=previousFiles.get(kind)
+        if filename is None:
+            changed=changed or old is not None
+            continue
+        filename=str(filename)
+        stats=tin.activeStats()
+        if stats is not None:
+            stats.count('stats')
+        try:
+            st=os.stat(os.path.join(project.path,filename))
+        except OSError:
+            changed=changed or old is not None
+            continue
+        if old is not None and old.filename==filename \
+            and old.mtime==st.st_mtime_ns and old.size==st.st_size:
+            ret.files[kind]=old
+            continue
+        changed=True
+        doc=None
+        if kind in COUNTED_KINDS:
+            doc=project.getTinDocument(kind)
+        if doc is None:
+            ret.files[kind]=FileSummary(filename,st.st_mtime_ns,st.st_size)
+        else:
+            ret.files[kind]=summarizeDocument(doc,filename,
+                st.st_mtime_ns,st.st_size,old)
+    if not changed and previous is not None:
+        return previous
+    return ret
+
+
+class ProjectSummaries(typing.Mapping[str,ProjectSummary]):
+    """
+    The summaries of many projects, by directory, kept up to date
+    incrementally (and in a ScanIndex, if given one)
+    """
+
+    def __init__(self,index:typing.Optional['ScanIndex']=None):
+        """
+        :param index: where to keep the summaries between runs
+            (they are loaded from it the first time they are needed)
+        """
+        self.index:typing.Optional['ScanIndex']=index
+        self._summaries:typing.Optional[typing.Dict[str,ProjectSummary]]=None
+        self._lock=threading.RLock()
+        # how many projects the last update() had to summarise again
+        self.updated:int=0
+
+    def _load(self)->typing.Dict[str,ProjectSummary]:
+        """
+        Get the summaries (loading them from the index if necessary)
+        """
+        if self._summaries is None:
+            summaries:typing.Dict[str,ProjectSummary]={}
+            if self.index is not None:
+                for path,summaryJson in self.index.loadSummaries().items():
+                    summary=ProjectSummary()
+                    try:
+                        summary.jsonObj=json.loads(summaryJson)
+                    except (ValueError,KeyError,TypeError):
+                        # unreadable, so it will be worked out again
+                        continue
+                    summaries[path]=summary
+            self._summaries=summaries
+        return self._summaries
+
+    def update(self,projects:typing.Iterable['Tin'])->int:
+        """
+        Bring the summaries up to date with the projects, only
+        re-reading files that have changed (and forgetting any
+        projects that are gone)
+
+        :return: how many projects had to be summarised again
+        """
+        with self._lock:
+            stats=tin.activeStats()
+            if stats is not None:
+                start=stats.start('summarize')
+            existing=self._load()
+            summaries:typing.Dict[str,ProjectSummary]={}
+            changes:typing.Dict[str,typing.Optional[str]]={}
+            for project in projects:
+                previous=existing.get(project.path)
+                summary=summarizeProject(project,previous)
+                summaries[project.path]=summary
+                if summary is not previous:
+                    changes[project.path]=json.dumps(summary.jsonObj)
+            self.updated=len(changes)
+            for path in existing:
+                if path not in summaries:
+                    changes[path]=None
+            self._summaries=summaries
+            if self.index is not None:
+                self.index.storeSummaries(changes)
+            if stats is not None:
+                stats.end('summarize',start)
+                stats.count('projectsSummarized',self.updated)
+            return self.updated
+
+    def __getitem__(self,path:str)->ProjectSummary:
+        return self._load()[path]
+
+    def __iter__(self)->typing.Iterator[str]:
+        return iter(self._load())
+
+    def __len__(self)->int:
+        return len(self._load())
+
+
+def _formatAge(seconds:typing.Optional[float])->str:
+    if seconds is None:
+        return '-'
+    days=seconds/86400
+    if days>=1:
+        return '%dd'%days
+    return '%dh'%(seconds/3600)
+
+
+def _formatSize(size:int)->str:
+    if size>=1048576:
+        return '%.1fM'%(size/1048576.0)
+    if size>=1024:
+        return '%.1fK'%(size/1024.0)
+    return '%dB'%size
+
+
+def summaryTable(summaries:typing.Iterable[ProjectSummary],
+    now:typing.Optional[float]=None
+    )->str:
+    """
+    Format summaries as a table, one project per line
+
+    :param now: the time to measure ages from (default=now)
+    """
+    if now is None:
+        now=time.time()
+    ret=['%-30s %6s %6s %7s %-10s %8s'%(
+        'project','open','closed','oldest','modified','size')]
+    for summary in summaries:
+        modified=summary.lastModified
+        if modified is None:
+            modifiedDate='-'
+        else:
+            modifiedDate=time.strftime('%Y-%m-%d',
+                time.localtime(modified/1e9))
+        ret.append('%-30s %6d %6d %7s %-10s %8s'%(
+            summary.name,summary.openItems,summary.closedItems,
+            _formatAge(summary.oldestOpenAge(now)),modifiedDate,
+            _formatSize(summary.totalBytes)))
+    return '\n'.join(ret)
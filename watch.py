@@ -0,0 +1,549 @@
+"""
+Watch a DirectoriesSet for changes, so that long-running processes
+can keep up to date without rescanning everything.
+
+Uses inotify where it is available (linux), otherwise falls
+back to polling, which only stats directories (and any files
+we care about) and relists directories whose mtime changed.
+"""
+import typing
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import threading
+import ctypes
+import ctypes.util
+if typing.TYPE_CHECKING:
+    from tin import DirectoriesSet
+
+
+class WatchEvent:
+    """
+    A single change to the filesystem
+    """
+    __slots__=('kind','path','isDir')
+
+    CREATED='created'
+    DELETED='deleted'
+    MODIFIED='modified'
+
+    def __init__(self,kind:str,path:str,isDir:bool=False):
+        self.kind:str=kind
+        self.path:str=path
+        self.isDir:bool=isDir
+
+    @property
+    def directory(self)->str:
+        """
+        The directory this change happened in
+        """
+        return os.path.dirname(self.path)
+
+    def __repr__(self)->str:
+        return 'WatchEvent(%r,%r,%r)'%(self.kind,self.path,self.isDir)
+
+
+WatchCallback=typing.Callable[[typing.List[WatchEvent]],None]
+
+
+class _Inotify:
+    """
+    Minimal ctypes wrapper around the linux inotify api
+    """
+
+    IN_MODIFY=0x00000002
+    IN_CLOSE_WRITE=0x00000008
+    IN_MOVED_FROM=0x00000040
+    IN_MOVED_TO=0x00000080
+    IN_CREATE=0x00000100
+    IN_DELETE=0x00000200
+    IN_DELETE_SELF=0x00000400
+    IN_MOVE_SELF=0x00000800
+    IN_Q_OVERFLOW=0x00004000
+    IN_IGNORED=0x00008000
+    IN_ONLYDIR=0x01000000
+    IN_ISDIR=0x40000000
+    IN_NONBLOCK=0o4000
+    IN_CLOEXEC=0o2000000
+
+    MASK=IN_MODIFY|IN_CLOSE_WRITE|IN_MOVED_FROM|IN_MOVED_TO|IN_CREATE| \
+        IN_DELETE|IN_DELETE_SELF|IN_MOVE_SELF|IN_ONLYDIR
+
+    HEADER=struct.Struct('iIII')
+
+    def __init__(self):
+        """
+        raises OSError if inotify is not available
+        """
+        if not sys.platform.startswith('linux'):
+            raise OSError(errno.ENOSYS,'inotify requires linux')
+        libname=ctypes.util.find_library('c')
+        self._libc=ctypes.CDLL(libname,use_errno=True)
+        self._libc.inotify_add_watch.argtypes=[
+            ctypes.c_int,ctypes.c_char_p,ctypes.c_uint32]
+        self.fd:int=self._libc.inotify_init1(self.IN_NONBLOCK|self.IN_CLOEXEC)
+        if self.fd<0:
+            err=ctypes.get_errno()
+            raise OSError(err,os.strerror(err))
+
+    def addWatch(self,path:str)->int:
+        """
+        :return: the watch descriptor
+
+        raises OSError if it cannot be watched
+        (eg, ENOSPC when out of watches)
+        """
+        wd=self._libc.inotify_add_watch(self.fd,os.fsencode(path),self.MASK)
+        if wd<0:
+            err=ctypes.get_errno()
+            raise OSError(err,os.strerror(err),path)
+        return wd
+
+    def read(self,timeout:float)->typing.List[typing.Tuple[int,int,str]]:
+        """
+        read pending events
+
+        :return: [(wd,mask,name)]
+        """
+        ret:typing.List[typing.Tuple[int,int,str]]=[]
+        readable,_,_=select.select([self.fd],[],[],timeout)
+        if not readable:
+            return ret
+        try:
+            data=os.read(self.fd,65536)
+        except BlockingIOError:
+            return ret
+        i=0
+        headerSize=self.HEADER.size
+        while i+headerSize<=len(data):
+            wd,mask,_,nameLen=self.HEADER.unpack_from(data,i)
+            i+=headerSize
+            name=os.fsdecode(data[i:i+nameLen].rstrip(b'\0'))
+            i+=nameLen
+            ret.append((wd,mask,name))
+        return ret
+
+    def close(self)->None:
+        """
+        close the inotify file descriptor
+        """
+        if self.fd>=0:
+            os.close(self.fd)
+            self.fd=-1
+
+
+class Watcher:
+    """
+    Watches all of the directories in a DirectoriesSet,
+    and calls subscribers with batches of WatchEvents.
+
+    Bursts of changes are debounced, that is, nothing is delivered
+    until there have been no further changes for debounce seconds
+    (or maxLatency seconds have passed since the first one).
+    """
+
+    def __init__(self,
+        directoriesSet:'DirectoriesSet',
+        debounce:float=0.5,
+        interval:float=2.0,
+        polling:typing.Optional[bool]=None,
+        fileFilter:typing.Optional[typing.Callable[[str],bool]]=None,
+        maxLatency:float=5.0):
+        """
+        :param interval: how often to check for changes when polling
+        :param polling: True=always poll, False=always use inotify,
+            None=use inotify if possible
+        :param fileFilter: given a filename, return whether modifications
+            to its contents matter (if None, they all do).  When polling,
+            only files that pass this are stat'ed.
+        """
+        self.directoriesSet:'DirectoriesSet'=directoriesSet
+        self.debounce:float=debounce
+        self.interval:float=interval
+        self.polling:typing.Optional[bool]=polling
+        self.fileFilter:typing.Optional[typing.Callable[[str],bool]]= \
+            fileFilter
+        self.maxLatency:float=maxLatency
+        self._subscribers:typing.List[WatchCallback]=[]
+        # directory->(mtime,child names,{filename:mtime}) where the
+        # filenames are only those that pass fileFilter
+        self._dirs:typing.Dict[str,
+            typing.Tuple[int,typing.Set[str],typing.Dict[str,int]]]={}
+        self._inotify:typing.Optional[_Inotify]=None
+        self._wds:typing.Dict[int,str]={}
+        self._pending:typing.Dict[str,WatchEvent]={}
+        self._pendingCond=threading.Condition()
+        self._firstPending:float=0.0
+        self._lastPending:float=0.0
+        self._threads:typing.List[threading.Thread]=[]
+        self._running:bool=False
+
+    @property
+    def usingInotify(self)->bool:
+        """
+        whether changes are coming from inotify rather than polling
+        """
+        return self._inotify is not None
+
+    def subscribe(self,callback:WatchCallback)->None:
+        """
+        Have callback(events) called with each batch of changes
+
+        NOTE: called on the watcher's thread
+        """
+        self._subscribers.append(callback)
+
+    def unsubscribe(self,callback:WatchCallback)->None:
+        """
+        Stop calling a callback
+        """
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def _wantFile(self,filename:str)->bool:
+        if self.fileFilter is None:
+            return True
+        return self.fileFilter(filename)
+
+    def _stat(self,path:str)->int:
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return 0
+
+    def _record(self,d:str)->typing.List[str]:
+        """
+        (re)list a directory and remember what is in it
+
+        :return: subdirectories that are not ignored
+        """
+        names,subdirs=self.directoriesSet._scanDirectory(d)
+        files={}
+        for name in names:
+            if self._wantFile(name):
+                path=os.path.join(d,name)
+                if not os.path.isdir(path):
+                    files[name]=self._stat(path)
+        self._dirs[d]=(self._stat(d),set(names),files)
+        if self._inotify is not None:
+            try:
+                self._wds[self._inotify.addWatch(d)]=d
+            except OSError:
+                # out of watches, most likely, so poll instead
+                self._inotify.close()
+                self._inotify=None
+                self._wds={}
+        return subdirs
+
+    def _wantSubdirectory(self,d:str,name:str)->bool:
+        """
+        Whether a subdirectory that just appeared is one the
+        DirectoriesSet would go into (ignore names, pruning rules,
+        maxDepth and symlinks, same as _subdirectories)
+        """
+        try:
+            with os.scandir(d) as it:
+                entries=[entry for entry in it if entry.name==name]
+        except OSError:
+            return False
+        return bool(self.directoriesSet._subdirectories(d,entries))
+
+    def _recordTree(self,d:str,events:typing.Optional[
+        typing.List[WatchEvent]]=None)->None:
+        """
+        Record an entire subtree
+
+        :param events: if given, add created events for everything found
+        """
+        stack=[d]
+        while stack:
+            dd=stack.pop()
+            if dd in self._dirs:
+                continue
+            subdirs=self._record(dd)
+            if events is not None:
+                subdirSet=set(subdirs)
+                for name in self._dirs[dd][1]:
+                    path=os.path.join(dd,name)
+                    if path not in subdirSet:
+                        events.append(WatchEvent(WatchEvent.CREATED,path))
+            for s in subdirs:
+                if events is not None:
+                    events.append(WatchEvent(WatchEvent.CREATED,s,True))
+                stack.append(s)
+
+    def _forgetTree(self,d:str,events:typing.List[WatchEvent])->None:
+        """
+        Forget a directory and everything under it
+        """
+        prefix=d+os.sep
+        for dd in [k for k in self._dirs if k==d or k.startswith(prefix)]:
+            del self._dirs[dd]
+        gone=[wd for wd,v in self._wds.items()
+            if v==d or v.startswith(prefix)]
+        for wd in gone:
+            del self._wds[wd]
+        events.append(WatchEvent(WatchEvent.DELETED,d,True))
+
+    def _roots(self)->typing.List[str]:
+        ds=self.directoriesSet
+        return [os.path.abspath(d) for d in ds._recursiveDirectories]
+
+    def _recursive(self,d:str)->bool:
+        """
+        Whether d is under one of the recursive directories
+        (if not, it is only watched itself, like walk() only lists it)
+        """
+        for root in self._roots():
+            if d==root or d.startswith(root+os.sep):
+                return True
+        return False
+
+    def _resync(self)->typing.List[WatchEvent]:
+        """
+        Check every known directory for changes
+
+        (this is what polling does, and what inotify does if
+        its queue overflows)
+        """
+        events:typing.List[WatchEvent]=[]
+        for d in list(self._dirs.keys()):
+            if d not in self._dirs:
+                # went with a parent
+                continue
+            self._checkDirectory(d,events)
+        for d in self._roots():
+            if d not in self._dirs and os.path.isdir(d):
+                self._recordTree(d,events)
+        return events
+
+    def _checkDirectory(self,d:str,events:typing.List[WatchEvent])->None:
+        """
+        See if a known directory changed, and if so, what changed
+        """
+        mtime,names,files=self._dirs[d]
+        newMtime=self._stat(d)
+        if not newMtime:
+            self._forgetTree(d,events)
+            return
+        if newMtime!=mtime:
+            self._dirs.pop(d)
+            subdirs=set(self._record(d))
+            newNames=self._dirs[d][1]
+            for name in names-newNames:
+                path=os.path.join(d,name)
+                if path in self._dirs:
+                    self._forgetTree(path,events)
+                else:
+                    events.append(WatchEvent(WatchEvent.DELETED,path))
+            for name in newNames-names:
+                path=os.path.join(d,name)
+                if path in subdirs:
+                    events.append(WatchEvent(WatchEvent.CREATED,path,True))
+                    if self._recursive(d):
+                        self._recordTree(path,events)
+                else:
+                    events.append(WatchEvent(WatchEvent.CREATED,path))
+            newFiles=self._dirs[d][2]
+        else:
+            newFiles={name:self._stat(os.path.join(d,name)) for name in files}
+            self._dirs[d]=(mtime,names,newFiles)
+        for name,fileMtime in newFiles.items():
+            old=files.get(name)
+            if old is not None and old!=fileMtime:
+                events.append(WatchEvent(WatchEvent.MODIFIED,
+                    os.path.join(d,name)))
+
+    def _handleInotify(self,
+        raw:typing.List[typing.Tuple[int,int,str]]
+        )->typing.List[WatchEvent]:
+        """
+        Turn raw inotify events into WatchEvents
+        """
+        ino=_Inotify
+        events:typing.List[WatchEvent]=[]
+        for wd,mask,name in raw:
+            if mask&ino.IN_Q_OVERFLOW:
+                events.extend(self._resync())
+                continue
+            d=self._wds.get(wd)
+            if d is None:
+                continue
+            if mask&ino.IN_IGNORED:
+                self._wds.pop(wd,None)
+                continue
+            if mask&(ino.IN_DELETE_SELF|ino.IN_MOVE_SELF):
+                if d in self._dirs:
+                    self._forgetTree(d,events)
+                continue
+            if not name:
+                continue
+            path=os.path.join(d,name)
+            isDir=bool(mask&ino.IN_ISDIR)
+            if mask&(ino.IN_CREATE|ino.IN_MOVED_TO):
+                if isDir:
+                    if self._wantSubdirectory(d,name):
+                        events.append(WatchEvent(
+                            WatchEvent.CREATED,path,True))
+                        if self._recursive(d):
+                            self._recordTree(path,events)
+                else:
+                    events.append(WatchEvent(WatchEvent.CREATED,path))
+            elif mask&(ino.IN_DELETE|ino.IN_MOVED_FROM):
+                if isDir:
+                    if path in self._dirs:
+                        self._forgetTree(path,events)
+                    elif not self._recursive(d):
+                        events.append(WatchEvent(
+                            WatchEvent.DELETED,path,True))
+                else:
+                    events.append(WatchEvent(WatchEvent.DELETED,path))
+            elif mask&(ino.IN_MODIFY|ino.IN_CLOSE_WRITE):
+                if not isDir and self._wantFile(name):
+                    events.append(WatchEvent(WatchEvent.MODIFIED,path))
+        return events
+
+    def _queue(self,events:typing.List[WatchEvent])->None:
+        """
+        Add events to the pending batch, merging them with
+        any pending events for the same path
+        """
+        if not events:
+            return
+        with self._pendingCond:
+            now=time.monotonic()
+            if not self._pending:
+                self._firstPending=now
+            self._lastPending=now
+            for event in events:
+                old=self._pending.pop(event.path,None)
+                if old is not None:
+                    if old.kind==WatchEvent.CREATED:
+                        if event.kind==WatchEvent.DELETED:
+                            # came and went, so never mind
+                            continue
+                        event=old
+                    elif old.kind==WatchEvent.DELETED:
+                        if event.kind==WatchEvent.CREATED:
+                            event=WatchEvent(WatchEvent.MODIFIED,
+                                event.path,event.isDir)
+                self._pending[event.path]=event
+            self._pendingCond.notify_all()
+
+    def _dispatchLoop(self)->None:
+        """
+        Deliver debounced batches to the subscribers
+        """
+        while self._running:
+            with self._pendingCond:
+                if not self._pending:
+                    self._pendingCond.wait(self.interval)
+                    continue
+                now=time.monotonic()
+                quietFor=now-self._lastPending
+                waitedFor=now-self._firstPending
+                if quietFor<self.debounce and waitedFor<self.maxLatency:
+                    self._pendingCond.wait(min(
+                        self.debounce-quietFor,
+                        self.maxLatency-waitedFor))
+                    continue
+                batch=list(self._pending.values())
+                self._pending={}
+            self._deliver(batch)
+
+    def _deliver(self,batch:typing.List[WatchEvent])->None:
+        for callback in list(self._subscribers):
+            try:
+                callback(batch)
+            except Exception as e: # pylint: disable=broad-except
+                print('ERR: watch callback failed: %s'%e)
+
+    def _watchLoop(self)->None:
+        """
+        Collect changes from inotify or by polling
+        """
+        while self._running:
+            if self._inotify is not None:
+                try:
+                    raw=self._inotify.read(self.interval)
+                except OSError:
+                    raw=[]
+                    if self._running:
+                        self._inotify.close()
+                        self._inotify=None
+                        self._wds={}
+                self._queue(self._handleInotify(raw))
+            else:
+                time.sleep(self.interval)
+                if self._running:
+                    self._queue(self._resync())
+
+    def poll(self)->typing.List[WatchEvent]:
+        """
+        Check for changes once, right now, and deliver them immediately
+        (mainly useful when the watcher is not started)
+        """
+        if not self._dirs:
+            self._initialScan()
+        events=self._resync()
+        if events:
+            self._deliver(events)
+        return events
+
+    def _initialScan(self)->None:
+        for d in self._roots():
+            if os.path.isdir(d):
+                self._recordTree(d)
+        ds=self.directoriesSet
+        for d in ds._directories:
+            d=os.path.abspath(d)
+            if d not in self._dirs and os.path.isdir(d):
+                # not recursive, but still worth knowing about
+                self._record(d)
+
+    def start(self)->'Watcher':
+        """
+        Start watching in background threads
+        """
+        if self._running:
+            return self
+        if self.polling is not True:
+            try:
+                self._inotify=_Inotify()
+            except OSError:
+                if self.polling is False:
+                    raise
+                self._inotify=None
+        self._dirs={}
+        self._wds={}
+        self._initialScan()
+        self._running=True
+        self._threads=[
+            threading.Thread(target=self._watchLoop,daemon=True),
+            threading.Thread(target=self._dispatchLoop,daemon=True)]
+        for t in self._threads:
+            t.start()
+        return self
+
+    def stop(self)->None:
+        """
+        Stop watching
+        """
+        self._running=False
+        with self._pendingCond:
+            self._pendingCond.notify_all()
+        for t in self._threads:
+            t.join()
+        self._threads=[]
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify=None
+
+    def __enter__(self)->'Watcher':
+        return self.start()
+
+    def __exit__(self,*args)->None:
+        self.stop()